@@ -1,11 +1,22 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
-import os
+import sys
 
+# El parche debe ir antes de cualquier otro import para que pymongo, dnspython
+# y ssl usen sockets verdes y no bloqueen el hub de eventlet
+_PRELOADED = {name for name in ("pymongo",) if name in sys.modules}
 import eventlet
+eventlet.monkey_patch()
+
+import os
+
 import eventlet.wsgi
 from icecream import ic
 
+from app.utils.green_io import ensure_green_io
+
+ensure_green_io(preloaded=_PRELOADED)
+
 from app import create_app
 from app.config import Config
 
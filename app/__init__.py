@@ -1,6 +1,6 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
-from flask import Flask
+from flask import Flask, jsonify
 from app.midleware.security import apply_secure_headers 
 from app.extensions import cors, bootstrap, socketio
 from app.config import Config
@@ -12,6 +12,7 @@ def create_app():
     # Registrar blueprints
     with app.app_context():
         register_blueprints(app)
+    register_error_handlers(app)
 
     apply_secure_headers(app)  # ⬅️ inyectamos aquí
     # Inicializar extensiones
@@ -19,6 +20,14 @@ def create_app():
     socketio.init_app(app,async_mode="eventlet", cors_allowed_origins=Config.CORS_ORIGINS, cors_credentials=True, ping_timeout=25, ping_interval=10)
     bootstrap.init_app(app)
     cors.init_app(app, resources={r"/*": {"origins": Config.CORS_ORIGINS}}, supports_credentials=True)
+    # Cliente MongoDB compartido: se crea al arrancar y no dentro del request
+    from app.utils.db_mongo import MongoClientRegistry
+    MongoClientRegistry.warmup()
+    from app.utils.mongo_metrics import start_metrics_log
+    start_metrics_log(Config.MONGO_METRICS_LOG_INTERVAL)
+    # Revocaciones en memoria para los guards (carga + change stream)
+    from app.utils.revocation_set import start_revocation_sync
+    start_revocation_sync()
     return app
     
 
@@ -28,8 +37,19 @@ def register_blueprints(app):
     from app.frontend.routes import frontend_bp
     from app.utils.db_manager import db_Manager_bp
     from app.web_socket.event_socket import socketio_bp
+    from app.backend.routes_wellknown import wellknown_bp
     app.register_blueprint(backend_bp, url_prefix="/api")
     app.register_blueprint(admin_bp, url_prefix="/api")
     app.register_blueprint(frontend_bp)
     app.register_blueprint(db_Manager_bp)
     app.register_blueprint(socketio_bp)
+    app.register_blueprint(wellknown_bp)
+
+
+def register_error_handlers(app):
+    from app.auth.exceptions.auth_exceptions import AuthException
+
+    @app.errorhandler(AuthException)
+    def handle_auth_exception(e: AuthException):
+        # AuthException no capturada en la ruta (p. ej. CryptoQueueFull → 503)
+        return jsonify({"msg": e.message, "code": e.code}), e.status
@@ -5,12 +5,13 @@ from bson import ObjectId
 from app.dao.audit_dao import AuditLogDAO
 from app.dao.session_dao import SessionDAO
 from app.model.audit_session import AuditLog
+from app.utils.request_container import provide
 
 
 class AuditService:
     def __init__(self):
-        self.audit_log_dao = AuditLogDAO()
-        self.session_dao = SessionDAO()
+        self.audit_log_dao = provide(AuditLogDAO)
+        self.session_dao = provide(SessionDAO)
 
     def update_session_activity(self, user_id: ObjectId, ip_address: str | None, user_agent: str | None):
         """Actualiza actividad de la sesión y registra cambios relevantes"""
@@ -64,5 +65,43 @@ class AuditService:
                 reason=reason
             )
 
+    @staticmethod
+    def activity_audit_logs(session: dict, event_type: str | None, ip_address: str | None,
+                            user_agent: str | None) -> tuple[list[AuditLog], str]:
+        """
+        Eventos de update_session_activity sin escribirlos: cambio de navegador y
+        event_type (la razón de la sesión). Devuelve también la razón que queda en la sesión.
+        session: _id, user_id y browser/ip_address previos.
+        """
+        now_iso = datetime.fromisoformat(datetime.now(timezone.utc).isoformat())
+        event = dict(session_id=str(session["_id"]), user_id=str(session["user_id"]), old_value=session.get("browser") or "",
+                     new_value=user_agent or "", timestamp=now_iso, user_agent=user_agent)
+        logs, reason = [], ""
+        if session.get("browser") != user_agent:
+            logs.append(AuditLog(event_type="user_agent_change", ip_address=ip_address, **event))
+            reason = "user_agent_change"
+        if event_type:
+            logs.append(AuditLog(event_type=event_type, ip_address=session.get("ip_address"), **event))
+            reason = reason or event_type
+        return logs, reason
+
+    def refresh_activity_writes(self, session: dict, token: str, ip_address: str | None, user_agent: str | None,
+                                include_session: bool = True) -> list[tuple]:
+        """
+        Lo mismo que update_session + update_session_activity tras un refresh, como
+        escrituras para MongoDatabase.bulk_write_with_log.
+        include_session=False: la sesión ya se actualizó con el refresh (esquema unificado).
+        """
+        logs, reason = self.activity_audit_logs(session, "refresh_token", ip_address, user_agent)
+        writes = [self.audit_log_dao.audit_write(log) for log in logs]
+        if include_session:
+            writes.insert(0, self.session_dao.refresh_activity_write(session["user_id"], token, ip_address, user_agent, reason))
+        return writes
+
+    def record_login_activity(self, session: dict, ip_address: str | None, user_agent: str | None) -> dict:
+        """Auditoría de update_session_activity cuando la sesión ya se escribió junto al refresh (esquema unificado)"""
+        logs, _ = self.activity_audit_logs(session, session.get("reason"), ip_address, user_agent)
+        return self.audit_log_dao.insert_logs_audit_many(logs, context="Login: auditoría")
+
     def get_logs_audit(self, **kwargs) -> dict:
         return self.audit_log_dao.get_logs_audit(**kwargs)
\ No newline at end of file
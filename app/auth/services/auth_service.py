@@ -1,17 +1,28 @@
 # app/services/auth_service.py
 
 from datetime import datetime, timezone
+import jwt
 from turtle import st
 from app.dao.auth_dao import AuthDao
+from app.dao.user_dao import UserDAO
 from app.utils.db_manager import DbManager
-from app.model.token_generator import TokenGenerator
+from app.model.token_generator import IssuedTokens, TokenGenerator
+from app.utils.request_container import provide
+from app.utils.revocation_set import RevocationSet
+from app.utils.token_cache import IntrospectionCache, VerifiedTokenCache
+from app.utils.token_epoch import TokenEpochCache, epoch_is_current
 
 class AuthService:
     def __init__(self):
-        self.dm = DbManager()
-        self.gt = TokenGenerator()
-        self.auth_dao = AuthDao()
-    def get_token_payload(self, token: str):
+        self.dm = provide(DbManager)
+        self.gt = provide(TokenGenerator)
+        self.auth_dao = provide(AuthDao)
+        self.user_dao = provide(UserDAO)
+    def get_token_payload(self, token: str, stored: dict | None = None):
+        """Claims del refresh: verificando la firma o, si es opaco, desde su documento en refresh_tokens"""
+        if TokenGenerator.is_opaque(token):
+            stored = stored if stored is not None else self.dm.get_refresh_token(token)
+            return self.gt.stored_refresh_claims(stored) if stored else None
         return self.gt.verify_token(token=token, expected_type="refresh")
 
     def get_active_token_by_user_and_device(self, username, device_id=None):
@@ -20,9 +31,28 @@ class AuthService:
         return self.auth_dao.get_active_token_by_username(username)
     def is_token_in_use(self, username) -> dict:
         return self.auth_dao.is_token_in_use(username)
-    def revoke_all_tokens_for_user(self, username):
-        return self.auth_dao.revoke_all_tokens_for_user(username)
+    def revoke_all_tokens_for_user(self, username) -> int | None:
+        """Revoca todos los tokens del usuario incrementando su epoch; devuelve el nuevo epoch"""
+        epoch = self.user_dao.bump_token_epoch(username)
+        if epoch is not None:
+            TokenEpochCache.set(username, epoch)
+        VerifiedTokenCache.invalidate_subject(username)
+        IntrospectionCache.clear()
+        return epoch
+
+    @staticmethod
+    def token_epoch_of(stored: dict) -> int:
+        """Epoch de un refresh ya almacenado (sin verificar firma: solo decide si reemitir)"""
+        token = stored["refresh_token"]
+        if TokenGenerator.is_opaque(token):
+            return stored.get("epoch", 0)
+        return jwt.decode(token, options={"verify_signature": False}).get("epoch", 0)
+
+    def is_token_epoch_current(self, claims: dict) -> bool:
+        return epoch_is_current(claims, self.user_dao.get_token_epoch)
     def revoke_token_by_jti(self, jti):
+        VerifiedTokenCache.invalidate_jti(jti)
+        IntrospectionCache.clear()
         return self.auth_dao.revoke_token_by_jti(jti)
     def revoke_token_by_device_id(self, device_id) -> bool:
         return bool(self.auth_dao.revoke_token_by_device_id(device_id))
@@ -30,6 +60,14 @@ class AuthService:
         now_ts = float(datetime.now(timezone.utc).timestamp())
         return now_ts > exp
 
+    def needs_new_jti(self, stored: dict, token_epoch: int) -> bool:
+        """Login: el refresh guardado no se reutiliza si está revocado (logout), es de un epoch anterior o expiró"""
+        if stored.get("revoked_at") is not None or RevocationSet.is_revoked(stored.get("jti")):
+            return True
+        if self.token_epoch_of(stored) < token_epoch:
+            return True
+        return self.is_token_expired(exp=float(stored["expires_at"].timestamp()))
+
     def detect_reuse(self, stored: dict) -> bool:
         return stored.get("used_at") is not None
 
@@ -51,13 +89,18 @@ class AuthService:
     def get_refresh_token_from_db(self, token: str) -> dict | None:
         return self.dm.get_refresh_token(token)
 
-    def refresh_access_token(self, token: str) -> str | None:
-        return self.gt.refresh_access_token(token)
+    def refresh_access_token(self, token: str, stored: dict | None = None) -> str | None:
+        return self.reissue_access_token(token, stored).access_token
+
+    def reissue_access_token(self, token: str, stored: dict | None = None) -> IssuedTokens:
+        """Access nuevo para un refresh vigente; los opacos toman sus claims de stored"""
+        claims = self.gt.stored_refresh_claims(stored) if stored and TokenGenerator.is_opaque(token) else None
+        return self.gt.reissue_access_token(token, claims)
 
     def revoke_all_for_device(self, device_id: str):
         return self.dm.revoke_tokens_by_device(device_id)
 
-    def generate_tokens(self, payload: dict) -> tuple[str, str]:
+    def generate_tokens(self, payload: dict) -> IssuedTokens:
         return self.gt.create_tokens(payload)
 
     def verify_access_token(self, token: str):
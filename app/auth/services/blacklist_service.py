@@ -1,12 +1,22 @@
 from app.dao.blacklist_dao import TokenBlacklistDao
+from app.utils.request_container import provide
+from app.utils.revocation_set import RevocationSet
+from app.utils.token_cache import IntrospectionCache, VerifiedTokenCache
 
 
 class TokenBlacklistService():
     def __init__(self):
-        self.blacklist_dao = TokenBlacklistDao()
+        self.blacklist_dao = provide(TokenBlacklistDao)
 
     def revoke_token_blacklist(self, token: str, device_id: None, username: None, reason: None) -> dict:
-        return self.blacklist_dao.revoke_token_blacklist(token=token,device_id=device_id,username=username,reason=reason)
+        VerifiedTokenCache.invalidate_token(token)
+        IntrospectionCache.clear()
+        jti = RevocationSet.jti_of({"token": token})
+        result = self.blacklist_dao.revoke_token_blacklist(token=token,device_id=device_id,username=username,reason=reason,jti=jti)
+        if result.get("success"):
+            # Solo si quedó en token_blacklist: los demás procesos lo reciben por el change stream
+            RevocationSet.add(jti, RevocationSet.expiry_of({"token": token}))
+        return result
 
 
 
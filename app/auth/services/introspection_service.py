@@ -0,0 +1,111 @@
+# app/auth/services/introspection_service.py
+
+import time
+from typing import Optional
+
+import jwt
+
+from app.auth.exceptions.auth_exceptions import AuthException
+from app.dao.auth_dao import AuthDao
+from app.dao.blacklist_dao import TokenBlacklistDao
+from app.dao.user_dao import UserDAO
+from app.model.token_generator import TokenGenerator
+from app.utils.crypto_executor import CryptoExecutor
+from app.utils.request_container import provide
+from app.utils.token_cache import IntrospectionCache
+from app.utils.token_digest import stored_token_matches, token_hash
+from app.utils.token_epoch import epoch_is_current
+
+TOKEN_TYPES = ("access", "refresh")
+# Claims que se devuelven de un token activo (RFC 7662 §2.2 + propios)
+RESPONSE_CLAIMS = ("sub", "username", "scope", "rol", "device_id", "jti", "exp", "iat", "nbf", "iss", "aud")
+
+
+class IntrospectionService:
+    """
+    Introspección por lotes (RFC 7662) para resource servers.
+
+    Firmas verificadas en paralelo (CryptoExecutor), refresh opacos resueltos
+    por digest, revocación resuelta con una consulta a token_blacklist y otra
+    a refresh_tokens para todo el lote, y resultados cacheados unos segundos
+    (IntrospectionCache).
+    """
+
+    def __init__(self):
+        self.tg = provide(TokenGenerator)
+        self.auth_dao = provide(AuthDao)
+        self.blacklist_dao = provide(TokenBlacklistDao)
+        self.user_dao = provide(UserDAO)
+
+    def introspect(self, tokens: list[str], token_type_hint: Optional[str] = None) -> list[dict]:
+        results: list[Optional[dict]] = [IntrospectionCache.get(token) for token in tokens]
+        pending = [i for i, cached in enumerate(results) if cached is None]
+        if not pending:
+            return results
+
+        opaque = self._opaque_claims([tokens[i] for i in pending if TokenGenerator.is_opaque(tokens[i])])
+        signed = [i for i in pending if not TokenGenerator.is_opaque(tokens[i])]
+        verified = dict(zip(signed, CryptoExecutor.map("jwt_verify", lambda token: self._verify(token, token_type_hint),
+                                                       [tokens[i] for i in signed])))
+        claims = [verified[i] if i in verified else opaque.get(tokens[i]) for i in pending]
+        revoked = self._revoked([(tokens[i], c) for i, c in zip(pending, claims) if c])
+
+        for i, decoded in zip(pending, claims):
+            token = tokens[i]
+            if decoded is None or token in revoked or decoded.get("jti") in revoked:
+                result = {"active": False}
+            else:
+                result = self._active(decoded)
+            IntrospectionCache.put(token, result)
+            results[i] = result
+        return results
+
+    def _verify(self, token: str, token_type_hint: Optional[str]) -> Optional[dict]:
+        """Claims si la firma, exp, iss, aud y tipo son válidos; None si no"""
+        try:
+            # El tipo declarado solo elige qué se espera; _decode lo vuelve a comprobar tras verificar la firma
+            declared = jwt.decode(token, options={"verify_signature": False}).get("type")
+            expected = declared if declared in TOKEN_TYPES else token_type_hint or "access"
+            decoded = self.tg.verify_token(token, expected_type=expected)
+        except (jwt.InvalidTokenError, AuthException):
+            return None
+        return decoded if isinstance(decoded, dict) and "error" not in decoded else None
+
+    def _opaque_claims(self, tokens: list[str]) -> dict[str, dict]:
+        """Claims de los refresh opacos vigentes del lote: una consulta por digest a refresh_tokens"""
+        if not tokens:
+            return {}
+        by_hash = {token_hash(token): token for token in tokens}
+        now = time.time()
+        claims = {}
+        for doc in self.auth_dao.find_by_token_hashes(list(by_hash)):
+            decoded = self.tg.stored_refresh_claims(doc)
+            if decoded["exp"] > now:
+                claims[by_hash[doc["refresh_token_hash"]]] = decoded
+        return claims
+
+    def _revoked(self, verified: list[tuple[str, dict]]) -> set[str]:
+        """Tokens y jtis revocados del lote: una consulta a token_blacklist y otra a refresh_tokens"""
+        if not verified:
+            return set()
+        jtis = list({c["jti"] for _, c in verified if c.get("jti")})
+        revoked = set()
+        for entry in self.blacklist_dao.find_revoked([token for token, _ in verified], jtis):
+            revoked.update(v for v in (entry.get("token"), entry.get("jti")) if v)
+
+        stored = {doc["jti"]: doc for doc in self.auth_dao.find_by_jtis(jtis)} if jtis else {}
+        for token, c in verified:
+            doc = stored.get(c.get("jti"))
+            if doc is not None and doc.get("revoked_at") is not None:
+                revoked.add(c["jti"])
+            elif c.get("type") == "refresh" and (doc is None or not stored_token_matches(doc, token)):
+                revoked.add(token)  # refresh ya rotado o desconocido
+            elif not epoch_is_current(c, self.user_dao.get_token_epoch):
+                revoked.add(token)  # emitido antes de un "revocar todo" del usuario
+        return revoked
+
+    @staticmethod
+    def _active(decoded: dict) -> dict:
+        result = {"active": True, "token_type": decoded.get("type")}
+        result.update({name: decoded[name] for name in RESPONSE_CLAIMS if name in decoded})
+        return result
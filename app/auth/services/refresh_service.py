@@ -0,0 +1,131 @@
+# app/auth/services/refresh_service.py
+
+from datetime import datetime, timezone
+
+from bson import ObjectId
+from icecream import ic
+
+from app.auth.exceptions.auth_exceptions import AuthException
+from app.auth.services.audit_service import AuditService
+from app.dao.auth_dao import AuthDao
+from app.dao.session_dao import SessionDAO
+from app.dao.user_dao import UserDAO
+from app.model.token_generator import IssuedTokens, TokenGenerator
+from app.utils.db_manager import DbManager
+from app.utils.db_mongo import MongoDatabase
+from app.utils.request_container import provide
+from app.utils.session_schema import unified_sessions
+from app.utils.token_epoch import TokenEpochCache, epoch_is_current
+
+
+class RefreshService:
+    """
+    Rotación de refresh tokens en dos idas y vueltas a Mongo.
+
+    1. find_one_and_update condicional sobre refresh_tokens (mismo digest y
+       device, no revocado, no expirado, refresh_attempts < 3, epoch vigente):
+       valida y rota a la vez, sin ventana entre la comprobación y la escritura.
+    2. Un bulk_write con la sesión y la auditoría del refresh (solo la auditoría
+       en el esquema unificado: la sesión se actualizó en el paso 1).
+
+    El epoch se comprueba antes de escribir: con JWT desde sus claims; un refresh
+    opaco no dice de qué usuario es, así que se lee su documento (por digest)
+    y el epoch vigente va además en el filtro de la rotación.
+    El motivo del rechazo solo se consulta cuando la rotación no coincide.
+    """
+
+    def __init__(self):
+        self.tg = provide(TokenGenerator)
+        self.auth_dao = provide(AuthDao)
+        self.user_dao = provide(UserDAO)
+        self.session_dao = provide(SessionDAO)
+        self.audit_service = provide(AuditService)
+        self.dm = provide(DbManager)
+        self.db = provide(MongoDatabase)
+
+    def rotate(self, refresh_token: str, device_id: str, browser: str | None, os: str | None,
+               ip_address: str | None) -> IssuedTokens:
+        """Rota el refresh y devuelve los tokens nuevos; AuthException con el código de error si no procede"""
+        claims, min_epoch = None, 0
+        if TokenGenerator.is_opaque(refresh_token) or self.tg.opaque_refresh:
+            # Un refresh opaco sigue opaco hasta el próximo login aunque cambie REFRESH_TOKEN_FORMAT
+            issued, new_refresh_token = None, self.tg.new_opaque_token()
+            stored = self.dm.get_refresh_token(refresh_token)
+            if not stored:
+                raise AuthException("Token no válido. Iniciá sesión nuevamente.", "InvalidTokenError", 401)
+            min_epoch = TokenEpochCache.get(stored["username"], self.user_dao.get_token_epoch)
+            if stored.get("epoch", 0) < min_epoch:
+                raise AuthException("Token revocado", "RevokedToken", 401)
+        else:
+            # Firma, exp y epoch se verifican sin escribir; el refresh nuevo se firma antes de rotar
+            claims = self.tg.verify_token(refresh_token, expected_type="refresh")
+            if not isinstance(claims, dict) or "error" in claims:
+                raise AuthException("Token expirado", "Expired", 401)
+            if not epoch_is_current(claims, self.user_dao.get_token_epoch):
+                raise AuthException("Token revocado", "RevokedToken", 401)
+            issued = self.tg.create_tokens({
+                "username": claims["sub"],
+                "jti": claims["jti"],  # 🔑 Mantener jti del refresh
+                "device_id": device_id,
+                "rol": claims.get("rol"),
+                "epoch": claims.get("epoch", 0)
+            })
+            new_refresh_token = issued.refresh_token
+
+        # 1️⃣ Validar + rotar
+        expires_at = datetime.fromisoformat(datetime.now(timezone.utc).isoformat()) + AuthDao.REFRESH_TOKEN_TTL
+        previous = self.auth_dao.rotate_refresh_token(refresh_token, device_id, new_refresh_token, expires_at,
+                                                      browser, os, ip_address, min_epoch)
+        if previous is None:
+            raise self.rejection(refresh_token, device_id)
+
+        if claims is None:
+            claims = self.tg.stored_refresh_claims({**previous, "expires_at": expires_at})
+            issued = self.tg.reissue_access_token(new_refresh_token, claims)
+
+        # 2️⃣ Sesión + auditoría
+        self.record_activity(previous, new_refresh_token, browser, ip_address)
+        return issued
+
+    def rejection(self, refresh_token: str, device_id: str) -> AuthException:
+        """Por qué no coincidió la rotación (una lectura, solo en el camino de error)"""
+        stored = self.dm.get_refresh_token(refresh_token)
+        if not stored:
+            return AuthException("Token no válido. Iniciá sesión nuevamente.", "InvalidTokenError", 401)
+        if stored.get("device_id") != device_id:
+            return AuthException("Dispositivo no coincide", "DeviceMismatch", 403)
+        if stored.get("revoked_at"):
+            return AuthException("Token revocado", "RevokedToken", 401)
+        if not epoch_is_current({"sub": stored.get("username"), "epoch": stored.get("epoch", 0)}, self.user_dao.get_token_epoch):
+            # "Revocar todo" entre la lectura del refresh opaco y la rotación
+            return AuthException("Token revocado", "RevokedToken", 401)
+        if stored.get("refresh_attempts", 0) >= AuthDao.MAX_REFRESH_ATTEMPTS:
+            return AuthException("Se alcanzó el máximo de intentos de refresh", "MaxAttemptsExceeded", 403)
+        # Expirado, o rotado por otra petición entre medio
+        return AuthException("Token expirado", "Expired", 401)
+
+    def record_activity(self, previous: dict, new_refresh_token: str, browser: str | None, ip_address: str | None) -> None:
+        writes = []
+        unified = unified_sessions()
+        # Esquema unificado: la sesión es el propio documento del refresh
+        user_id, session_id = previous.get("user_id"), previous.get("_id" if unified else "session_id")
+        if user_id is None or session_id is None:
+            # Refresh emitido antes de guardar user_id/session_id: se buscan y se completan en el mismo lote
+            user_model = self.user_dao.find_by_username(previous["username"])
+            if user_model is None:
+                raise AuthException("No existe usuario para refrescar token", "INVALID_USER_TOKEN", 500)
+            session = self.session_dao.get_active_session_by_Id(user_id=ObjectId(user_model.id))
+            if not session:
+                ic(f"[REFRESH] ⚠️ {previous['username']} sin sesión activa: no se audita el refresh")
+                return
+            user_id, session_id = session["user_id"], session["_id"]
+            if not unified:
+                writes.append(self.auth_dao.session_ref_write(previous["username"], previous["device_id"], user_id, session_id))
+
+        session = {"_id": session_id, "user_id": user_id, "browser": previous.get("browser"),
+                   "ip_address": previous.get("ip_address")}
+        writes += self.audit_service.refresh_activity_writes(session, new_refresh_token, ip_address, browser,
+                                                             include_session=not unified)
+        result = self.db.bulk_write_with_log(writes, context="Refresh: sesión y auditoría")
+        if not result.get("success"):
+            raise AuthException("Problemas al actualizar session del usuario", "INVALID_UPDATE_USER", 500)
@@ -3,11 +3,12 @@ from datetime import datetime, timezone
 from bson import ObjectId
 from app.dao.session_dao import SessionDAO 
 from app.model.user_session import UserSession
+from app.utils.request_container import provide
 
 
 class SessionService:
     def __init__(self):
-        self.session_dao = SessionDAO()
+        self.session_dao = provide(SessionDAO)
 
     def register_session(self, user_session: UserSession) -> dict:
         return self.session_dao.insert_session(session=user_session)
@@ -27,7 +28,7 @@ class SessionService:
     @staticmethod
     def get_non_admin_active_sessions(filtro_status: str = None):
         
-        sd = SessionDAO()
+        sd = provide(SessionDAO)
         sessions = sd.get_active_sessions_with_user_data(filtro_status=filtro_status)
         
         result = []
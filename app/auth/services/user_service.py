@@ -1,7 +1,7 @@
 # app/services/user_service.py
 
 from datetime import datetime, timedelta, timezone
-from typing import List, Optional
+from typing import Iterator, List, Optional
 
 from bson import ObjectId
 
@@ -10,14 +10,18 @@ from app.dao.auth_dao import AuthDao
 from app.utils.db_manager import DbManager
 from app.model.user import User
 from app.dao.user_dao import UserDAO
+from app.config import Config
+from app.utils import password_hasher
+from app.utils.crypto_executor import CryptoExecutor
+from app.utils.request_container import provide
 
 
 class UserService:
     def __init__(self):
         self.MAX_ATTEMPTS = 3
         self.BLOCK_TIME_SECONDS = 120  # 2 min
-        self.auth_dao = AuthDao()
-        self.user_dao = UserDAO()
+        self.auth_dao = provide(AuthDao)
+        self.user_dao = provide(UserDAO)
     def get_user_by_username(self, username: str) -> Optional[User]:
         return self.user_dao.find_by_username(username)
 
@@ -26,30 +30,49 @@ class UserService:
     def get_ids_users (self) -> List[ObjectId]:
         return self.user_dao.find_ids_users()
 
+    def iter_users(self, query: Optional[dict] = None) -> Iterator[User]:
+        return self.user_dao.iter_all(query=query, projection={"password": 0})
+
+    def get_users_page(self, page: int = 1, page_size: int = 50, query: Optional[dict] = None) -> dict:
+        return self.user_dao.find_page(query=query, projection={"password": 0}, page=page, page_size=page_size)
+
     def validate_login_payload(self, data: dict) -> list:
         required_fields = ['username', 'password', 'device', 'rol', 'user_agent']
         return [f for f in required_fields if not data.get(f)]
 
     def authenticate_user(self, username: str, password: str) -> User:
-        user = self.user_dao.find_by_username(username)
-        if user and User.verify_password(password, user.password):
-            return user
-        return None
-
-    def handle_failed_login(self, user_model: User) -> dict:
-        attempts = user_model.failed_attempts + 1
-        update = {"$set": {"failed_attempts": attempts}}
+        user, password_ok = self.check_credentials(username, password)
+        return user if password_ok else None
 
-        if attempts >= self.MAX_ATTEMPTS:
-            update["$set"]["blocked_until"] = datetime.now(timezone.utc) + timedelta(seconds=self.BLOCK_TIME_SECONDS)
-            update["$set"]["failed_attempts"] = 0
-
-        return self.user_dao.update({"username": user_model.username, "rol": user_model.rol}, update, upsert=True, context="Intentos Fallidos")
-
-    def reset_login_attempts(self, user_model: User) -> dict:
-        return self.user_dao.update({"username": user_model.username, "rol": user_model.rol}, {
-            "$set": {"failed_attempts": 0, "blocked_until": None}
-        }, upsert=True, context="Reset Intentos")
+    def check_credentials(self, username: str, password: str) -> tuple[Optional[User], bool]:
+        """(usuario, contraseña correcta); el usuario se devuelve aunque falle para contabilizar el intento"""
+        user = self.user_dao.find_by_username(username)
+        # Hash de contraseña fuera del hub de eventlet (ver CryptoExecutor)
+        if user and CryptoExecutor.run("password_verify", User.verify_password, password, user.password):
+            if Config.PASSWORD_REHASH_ON_LOGIN and password_hasher.needs_rehash(user.password):
+                self.rehash_password(user, password)
+            return user, True
+        return user, False
+
+    def rehash_password(self, user_model: User, password: str) -> dict:
+        """Re-hashea con el algoritmo/costo configurado; solo si el hash no cambió desde la lectura"""
+        new_hash = CryptoExecutor.run("password_hash", User.hash_password, password)
+        result = self.user_dao.update({"username": user_model.username, "rol": user_model.rol, "password": user_model.password}, {
+            "$set": {"password": new_hash, "updated_at": datetime.now(timezone.utc)}
+        }, context="Rehash Password")
+        if result.get("success"):
+            user_model.password = new_hash
+        return result
+
+    def register_login_attempt(self, user_model: User, success: bool) -> Optional[User]:
+        """
+        Bloqueo + intentos fallidos en un solo find_one_and_update sobre users.
+        Devuelve el usuario actualizado, o None si está bloqueado. Un login correcto
+        sin intentos ni bloqueo previos no escribe nada.
+        """
+        if success and not user_model.failed_attempts and user_model.blocked_until is None:
+            return user_model
+        return self.user_dao.record_login_attempt(user_model.username, success, self.MAX_ATTEMPTS, self.BLOCK_TIME_SECONDS)
 
     def persist_refresh_token(self, decoded_token: dict, token: str, user_agent: dict, ip: str, refresh_attempts=0) -> dict:
         return self.auth_dao.update_refresh_token(
@@ -71,7 +94,9 @@ class UserService:
             refresh_attempts=refresh_attempts,
             browser=user_agent["browser"],
             os=user_agent["os"],
-            ip_address=ip
+            ip_address=ip,
+            rol=decoded_token.get("rol"),
+            epoch=decoded_token.get("epoch", 0)
         )
 
     
\ No newline at end of file
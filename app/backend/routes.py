@@ -6,17 +6,23 @@ from datetime import datetime, timezone
 from uuid import uuid4
 
 from bson import ObjectId
+from app.auth.exceptions.auth_exceptions import AuthException
 from app.auth.services.audit_service import AuditService
 from app.auth.services.auth_service import AuthService
 from app.auth.services.blacklist_service import TokenBlacklistService
+from app.auth.services.introspection_service import IntrospectionService
+from app.auth.services.refresh_service import RefreshService
 from app.auth.services.user_service import UserService
 from flask import Blueprint, jsonify, make_response, request
 from icecream import ic 
 
 from app.auth.services.session_service import SessionService
-from app.midleware.jwt_guard import jwt_required_custom, jwt_required_custom_refresh
+from app.config import Config
+from app.midleware.jwt_guard import introspection_client_required, jwt_required_custom, jwt_required_custom_refresh
 from app.model.user import User
 from app.model.user_session import UserSession
+from app.utils.request_container import provide
+from app.utils.session_schema import unified_sessions
 
 backend_bp = Blueprint("backend", __name__)
 MAX_ATTEMPTS = 3
@@ -25,17 +31,17 @@ def update_datetime_format_iso(fecha: datetime) -> datetime:
     return fecha.fromisoformat(fecha.isoformat())
 
 def existe_usuario(user_id: ObjectId) -> UserSession | None:
-    session_service = SessionService()
+    session_service = provide(SessionService)
     result = session_service.get_active_session_by_Id(user_id=user_id)
     ic("[EXISTE_USUARIO] :", result)
     return UserSession.from_dict(result) if result else None
 
 @backend_bp.route("/auth/acceso", methods=["POST"])
 def login():
-    user_service = UserService()
-    session_service = SessionService()
-    audit_service = AuditService()
-    auth_service = AuthService()
+    user_service = provide(UserService)
+    session_service = provide(SessionService)
+    audit_service = provide(AuditService)
+    auth_service = provide(AuthService)
     data = request.get_json()
 
     if not request.is_json:
@@ -51,42 +57,64 @@ def login():
     ip_address, device_id = request.remote_addr, data.get("device")
 
     # 2️⃣ Autenticación
-    user_model = user_service.authenticate_user(
+    user_model, password_ok = user_service.check_credentials(
         username=data.get("username"),
         password=data.get("password")
     )
     if not user_model:
         return jsonify({"msg": "Usuario o contraseña inválidos", "code": "INVALID_CREDENTIALS"}), 403
 
-    # 3️⃣ Bloqueo temporal
-    if user_model.is_blocked_now():
+    # 3️⃣ Bloqueo temporal + 4️⃣ intentos fallidos: una sola escritura atómica (None = bloqueado)
+    attempt = user_service.register_login_attempt(user_model=user_model, success=password_ok)
+    blocked = attempt if attempt is not None else (user_model if password_ok else None)
+    if blocked is not None and blocked.is_blocked_now():
         return jsonify({
             "msg": "⏳ Usuario temporalmente bloqueado",
-            "bloqueado_hasta": user_model.blocked_until.isoformat() + "Z",
+            "bloqueado_hasta": blocked.blocked_until.isoformat() + "Z",
             "code": "USER_BLOCKED"
         }), 403
+    if not password_ok or attempt is None:
+        return jsonify({"msg": "Usuario o contraseña inválidos", "code": "INVALID_CREDENTIALS"}), 403
+    user_model = attempt
+
+    # Sesión del usuario: su _id se guarda con el refresh para que /auth/refresh no la busque
+    usuario_existe = existe_usuario(ObjectId(user_model.id))
+    session_ref = {
+        "user_id": ObjectId(user_model.id),
+        "session_id": usuario_existe.session_id if usuario_existe else ObjectId()
+    }
 
-    # 4️⃣ Intentos fallidos
-    fail_check = user_service.handle_failed_login(user_model=user_model)
-    if not fail_check.get("success"):
-        return jsonify({"msg": fail_check.get("message"), "code": "INVALID_FAIL_CREDENTIALS"}), 403
+    # Sesión del dispositivo (en el esquema unificado se escribe con el refresh)
+    user_model_session = UserSession(
+        user_id=user_model.id,
+        device_id=device_id,
+        ip_address=ip_address,
+        browser=browser,
+        os=so,
+        login_at=update_datetime_format_iso(datetime.now(timezone.utc)),
+        last_refresh_at=update_datetime_format_iso(datetime.now(timezone.utc)),
+        reason="login",
+        role="User",
+        session_id=session_ref["session_id"]
+    )
 
-    reset_attempts = user_service.reset_login_attempts(user_model=user_model)
-    if not reset_attempts.get("success"):
-        return jsonify({"msg": reset_attempts.get("message"), "code": "INVALID_RESET_ATTEMPTS"}), 500
+    session_doc = {"session": user_model_session.to_dict()} if unified_sessions() else {}
+    session_written = False
 
     # 5️⃣ Manejo de tokens
     existing_token = auth_service.is_token_in_use(user_model.username)
     if existing_token and existing_token["device_id"] == device_id:
-        if auth_service.is_token_expired(exp=float(existing_token["expires_at"].timestamp())):
-            # Token expirado → nuevo jti y tokens
+        if auth_service.needs_new_jti(existing_token, user_model.token_epoch):
+            # Token expirado, revocado o anterior al último "revocar todo" → nuevo jti y tokens
             jti = str(uuid4())
-            access_token, refresh_token = auth_service.generate_tokens({
+            issued = auth_service.generate_tokens({
                 "username": user_model.username,
                 "rol": user_model.rol,
                 "device_id": device_id,
-                "jti": jti
+                "jti": jti,
+                "epoch": user_model.token_epoch
             })
+            access_token, refresh_token = issued.access_token, issued.refresh_token
             # Guardar refresh token
             upsert_ok = auth_service.upsert_new_token(
                 username=user_model.username,
@@ -96,15 +124,20 @@ def login():
                 ip_address=ip_address,
                 browser=browser,
                 os=so,
-                refresh_attempts=0
+                refresh_attempts=0,
+                rol=user_model.rol,
+                epoch=user_model.token_epoch,
+                **session_ref,
+                **session_doc
             )
             if not upsert_ok.get("success"):
                 return jsonify({"msg": upsert_ok.get("message"), "code": "UPSERT_TOKEN_FAILED"}), 500
+            session_written = bool(session_doc)
         else:
             # Token válido → reutilizar jti, regenerar access
             jti = existing_token["jti"]
             refresh_token = existing_token["refresh_token"]
-            access_token = auth_service.refresh_access_token(token=refresh_token)
+            access_token = auth_service.refresh_access_token(token=refresh_token, stored=existing_token)
 
     elif existing_token:
         # Otro device ya tiene token activo
@@ -116,15 +149,16 @@ def login():
     else:
         # Primer login → nuevo jti
         jti = str(uuid4())
-        access_token, refresh_token = auth_service.generate_tokens({
+        issued = auth_service.generate_tokens({
             "username": user_model.username,
             "rol": user_model.rol,
             "device_id": device_id,
-            "jti": jti
+            "jti": jti,
+            "epoch": user_model.token_epoch
         })
+        access_token, refresh_token = issued.access_token, issued.refresh_token
 
-        valor = auth_service.get_token_payload(token=refresh_token)
-        salida = valor["exp"]
+        salida = issued.refresh_claims["exp"]
         ic(f"TIPO: {type(salida)} ")
         ic(f"EXPIRACION: {salida} ")
 
@@ -137,27 +171,23 @@ def login():
             ip_address=ip_address,
             browser=browser,
             os=so,
-            refresh_attempts=0
+            refresh_attempts=0,
+            rol=user_model.rol,
+            epoch=user_model.token_epoch,
+            **session_ref,
+            **session_doc
         )
         if not upsert_ok.get("success"):
             return jsonify({"msg": upsert_ok.get("message"), "code": "UPSERT_TOKEN_FAILED"}), 500
+        session_written = bool(session_doc)
 
     # 6️⃣ Crear o actualizar sesión
-    user_model_session = UserSession(
-        user_id=user_model.id,
-        device_id=device_id,
-        ip_address=ip_address,
-        browser=browser,
-        os=so,
-        login_at=update_datetime_format_iso(datetime.now(timezone.utc)),
-        refresh_token=refresh_token,
-        last_refresh_at=update_datetime_format_iso(datetime.now(timezone.utc)),
-        reason="login",
-        role="User"
-    )
-
-    usuario_existe = existe_usuario(user_model_session.user_id)
-    if usuario_existe is None:
+    user_model_session.refresh_token = refresh_token
+    if session_written:
+        # Esquema unificado: la sesión ya se escribió con el refresh; solo queda auditar
+        if usuario_existe is not None:
+            audit_service.record_login_activity(usuario_existe.to_dict(), ip_address, browser)
+    elif usuario_existe is None:
         insert_result = session_service.register_session(user_session=user_model_session)
         if not insert_result.get("success"):
             return jsonify({"msg": insert_result.get("message"), "code": "REGISTER_SESSION_FAILED"}), 500
@@ -178,10 +208,7 @@ def login():
 
 @backend_bp.route("/auth/refresh", methods=["POST"])
 def refresh():
-    user_service = UserService()
-    auth_service = AuthService()
-    session_service = SessionService()
-    audit_service = AuditService()
+    refresh_service = provide(RefreshService)
     data = request.get_json()
     
     if not data:
@@ -197,73 +224,12 @@ def refresh():
         return jsonify({"msg": "Faltan datos requeridos", "code": "MISSING_FIELDS"}), 400
 
     try:
-        # Verificar existencia del refresh en DB
-        stored = auth_service.get_refresh_token_from_db(refresh_token)
-        if not stored:
-            return jsonify({"msg": "Token no válido. Iniciá sesión nuevamente.", "code": "InvalidTokenError"}), 401
-
-        # Validar que está en uso, no expirado y coincide con device
-        in_use = auth_service.get_active_token_by_user_and_device(stored["username"], device_id)
-        if not in_use:
-            return jsonify({"msg": "Dispositivo no coincide", "code": "DeviceMismatch"}), 403
-
-        # Validar revocado o intentos máximos
-        if stored.get("revoked_at"):
-            return jsonify({"msg": "Token revocado", "code": "RevokedToken"}), 401
-
-        if stored.get("refresh_attempts", 0) >= 3:
-            return jsonify({"msg": "Se alcanzó el máximo de intentos de refresh", "code": "MaxAttemptsExceeded"}), 403
-
-        # Verificar firma y expiración
-        payload = auth_service.get_token_payload(token=refresh_token)
-        if auth_service.is_token_expired(exp=float(payload["exp"])):
-            return jsonify({"msg": "Token expirado", "code": "Expired"}), 401
-
-        username, jti = payload["sub"], payload["jti"] # 🔑 Mantener jti del refresh
-
-        revocar_old_token = auth_service.revoke_old_token(username=username,device_id=device_id,token=refresh_token)
-        if not revocar_old_token.get("success"):
-            return jsonify({"msg": revocar_old_token.get("message"), "code": "REVOKED_OLD_TOKEN_FAILED"}), 500
-        # Generar nuevos tokens respetando el jti
-        access_token, new_refresh_token = auth_service.generate_tokens({
-            "username": username,
-            "jti": jti,
-            "device_id": device_id,
-            "rol": stored.get("rol")
-        })
-
-        # Persistir nuevo refresh token
-        attempts = stored.get("refresh_attempts", 0) + 1
-        upsert_new_token = auth_service.upsert_new_token(
-            username=username,
-            device_id=device_id,
-            jti=jti,
-            refresh_token=new_refresh_token,
-            browser=browser,
-            os=so,
-            ip_address=ip,
-            refresh_attempts=attempts
-        )
-        if not upsert_new_token.get("success"):
-            return jsonify({"msg": upsert_new_token.get("message"), "code": "UPSERT_TOKEN_FAILED"}), 500
-
-        user_model: User = user_service.get_user_by_username(username=username)
-        if user_model is None:
-             return jsonify({"msg": "No existe usuario para refrescar token", "code": "INVALID_USER_TOKEN"}), 500
-        else:
-            user_sesion = session_service.update_session(user_id=ObjectId(user_model.id), token=new_refresh_token, reason="refresh_token")
-            if not user_sesion.get("success"):
-                return jsonify({"msg": "Problemas al actualizar session del usuario", "code": "INVALID_UPDATE_USER"}), 500
-            # Crear o actualizar sesión
-            audit_service.update_session_activity(
-                user_id=user_model.id,
-                ip_address=ip,
-                user_agent=browser
-            )
-
+        # Validar y rotar en un paso; sesión y auditoría en un solo lote
+        issued = refresh_service.rotate(refresh_token=refresh_token, device_id=device_id, browser=browser, os=so, ip_address=ip)
+        access_token, new_refresh_token = issued.access_token, issued.refresh_token
 
         # Responder con tokens actualizados
-        decoded = auth_service.get_token_payload(new_refresh_token)
+        decoded = issued.refresh_claims
         salida = decoded["exp"]
         ic(f"TIPO: {type(salida)} ")
         ic(f"EXPIRACION: {salida} ")
@@ -276,18 +242,40 @@ def refresh():
             "exp": decoded.get("exp")
         }), 200
 
+    except AuthException as e:
+        return jsonify({"msg": e.message, "code": e.code}), e.status
     except Exception as e:
         return jsonify({"msg": f"Error interno: {str(e)}", "code": "InternalServerError"}), 500
 
 
+@backend_bp.route("/auth/introspect", methods=["POST"])
+@introspection_client_required
+def introspect():
+    """
+    Introspección RFC 7662 por lotes.
+    Body: {"token": "..."} -> un resultado, o {"tokens": [...]} -> {"results": [...]} (mismo orden).
+    token_type_hint opcional ("access" | "refresh").
+    """
+    data = request.get_json(silent=True) or request.form.to_dict()
+    single = "tokens" not in data
+    tokens = [data.get("token")] if single else data.get("tokens")
+    if not isinstance(tokens, list) or not tokens or not all(isinstance(t, str) and t for t in tokens):
+        return jsonify({"msg": "Se requiere 'token' o una lista 'tokens'", "code": "MISSING_FIELDS"}), 400
+    if len(tokens) > Config.INTROSPECTION_MAX_BATCH:
+        return jsonify({"msg": f"Máximo {Config.INTROSPECTION_MAX_BATCH} tokens por request", "code": "BATCH_TOO_LARGE"}), 413
+
+    results = provide(IntrospectionService).introspect(tokens, data.get("token_type_hint"))
+    return jsonify(results[0] if single else {"results": results}), 200
+
+
 @backend_bp.route("/auth/logout", methods=["POST"])
 @jwt_required_custom_refresh
 def logout(user,user_token_refresh):
-    us = UserService()
-    ss = SessionService()
-    auth_service = AuthService()
-    blacklist_service = TokenBlacklistService()
-    audit_service = AuditService()
+    us = provide(UserService)
+    ss = provide(SessionService)
+    auth_service = provide(AuthService)
+    blacklist_service = provide(TokenBlacklistService)
+    audit_service = provide(AuditService)
     data = request.get_json()
     access_token = data.get("access_token")
     refresh_token = data.get("refresh_token")
@@ -1,10 +1,11 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 
+import json
 from datetime import datetime
 from uuid import uuid4
 from bson import ObjectId
-from flask import Blueprint, jsonify, request
+from flask import Blueprint, Response, jsonify, request, stream_with_context
 from dotenv import load_dotenv
 from icecream import ic
 
@@ -15,8 +16,12 @@ from app.auth.services.session_service import SessionService
 from app.auth.services.user_service import UserService
 from app.dao.user_dao import UserDAO
 from app.utils.db_manager import DbManager
+from app.utils.mongo_metrics import command_metrics
+from app.utils.crypto_executor import CryptoExecutor
+from app.utils.revocation_set import RevocationSet
+from app.utils.token_cache import VerifiedTokenCache
 from app.midleware.jwt_guard import admin_required
-from app.model.token_generator import TokenGenerator
+from app.utils.request_container import provide
 
 
 load_dotenv()
@@ -24,8 +29,8 @@ admin_bp = Blueprint("admin_bp", __name__)
 
 @admin_bp.route("/auth/admin", methods=["POST"])
 def login():
-    user_service = UserService()
-    auth_service = AuthService()
+    user_service = provide(UserService)
+    auth_service = provide(AuthService)
     data = request.get_json()
     user_agent = data.get("user_agent", {})
     browser, so = user_agent.get("browser"), user_agent.get("os")
@@ -37,8 +42,7 @@ def login():
     if missing:
         return jsonify({"msg": f"Faltan campos: {', '.join(missing)}", "code": "MISSING_FIELDS"}), 400
 
-    tg = TokenGenerator()
-    user_model_dao = UserDAO()
+    user_model_dao = provide(UserDAO)
 
     user_model = user_model_dao.find_by_username(username=data.get("username"))
     if not user_model:
@@ -49,15 +53,17 @@ def login():
 
     existing_token = auth_service.is_token_in_use(user_model.username)
     if existing_token and existing_token["device_id"] == data.get("device_id"):
-        if auth_service.is_token_expired(exp=float(existing_token["expires_at"].timestamp())):
-            # Token expirado → nuevo jti y tokens
+        if auth_service.needs_new_jti(existing_token, user_model.token_epoch):
+            # Token expirado, revocado o anterior al último "revocar todo" → nuevo jti y tokens
             jti = str(uuid4())
-            access_token, refresh_token = auth_service.generate_tokens({
+            issued = auth_service.generate_tokens({
                 "username": user_model.username,
                 "rol": user_model.rol,
                 "device_id": data.get("device_id"),
-                "jti": jti
+                "jti": jti,
+                "epoch": user_model.token_epoch
             })
+            access_token, refresh_token = issued.access_token, issued.refresh_token
             # Guardar refresh token
             upsert_ok = auth_service.upsert_new_token(
                 username=user_model.username,
@@ -67,7 +73,9 @@ def login():
                 ip_address=ip_address,
                 browser=browser,
                 os=so,
-                refresh_attempts=0
+                refresh_attempts=0,
+                rol=user_model.rol,
+                epoch=user_model.token_epoch
             )
             if not upsert_ok.get("success"):
                 return jsonify({"msg": upsert_ok.get("message"), "code": "UPSERT_TOKEN_FAILED"}), 500
@@ -75,7 +83,8 @@ def login():
             # Token válido → reutilizar jti, regenerar access
             jti = existing_token["jti"]
             refresh_token = existing_token["refresh_token"]
-            access_token = auth_service.refresh_access_token(token=refresh_token)
+            issued = auth_service.reissue_access_token(token=refresh_token, stored=existing_token)
+            access_token = issued.access_token
 
     elif existing_token:
         # Otro device ya tiene token activo
@@ -87,12 +96,14 @@ def login():
     else:
         # Primer login → nuevo jti
         jti = str(uuid4())
-        access_token, refresh_token = auth_service.generate_tokens({
+        issued = auth_service.generate_tokens({
             "username": user_model.username,
             "rol": user_model.rol,
             "device_id": device_id,
-            "jti": jti
+            "jti": jti,
+            "epoch": user_model.token_epoch
         })
+        access_token, refresh_token = issued.access_token, issued.refresh_token
         # Guardar refresh token
         upsert_ok = auth_service.upsert_new_token(
             username=user_model.username,
@@ -102,12 +113,14 @@ def login():
             ip_address=ip_address,
             browser=browser,
             os=so,
-            refresh_attempts=0
+            refresh_attempts=0,
+            rol=user_model.rol,
+            epoch=user_model.token_epoch
         )
         if not upsert_ok.get("success"):
             return jsonify({"msg": upsert_ok.get("message"), "code": "UPSERT_TOKEN_FAILED"}), 500
 
-    decoded = tg.verify_token(access_token, expected_type="access")
+    decoded = issued.access_claims  # claims del token recién firmado, sin re-verificarlo
     
     validate_upsert_user_token = user_service.persist_refresh_token_admin(decoded, refresh_token, user_agent, ip_address)
     if not validate_upsert_user_token.get("success"):
@@ -143,7 +156,7 @@ def get_audit_logs(user):
     - page (int)
     - limit (int)
     """
-    ads = AuditService()
+    ads = provide(AuditService)
     try:
         data = request.get_json()
         params = {
@@ -161,6 +174,70 @@ def get_audit_logs(user):
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+@admin_bp.route("/auth/admin/users", methods=["POST"])
+@admin_required
+def list_users(user):
+    """
+    Lista paginada de usuarios (sin contraseña):
+    - page (int)
+    - page_size (int, máximo 500)
+    """
+    us = provide(UserService)
+    data = request.get_json(silent=True) or {}
+    try:
+        result = us.get_users_page(page=int(data.get("page", 1)), page_size=min(int(data.get("page_size", 50)), 500))
+        result["items"] = [u.to_public_json() for u in result["items"]]
+        return jsonify(result), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@admin_bp.route("/auth/admin/users/export", methods=["GET"])
+@admin_required
+def export_users(user):
+    """
+    Exporta todos los usuarios en NDJSON; los documentos se envían a medida
+    que llegan del cursor, sin cargar la colección en memoria.
+    """
+    us = provide(UserService)
+
+    def generate():
+        for u in us.iter_users():
+            yield json.dumps(u.to_public_json()) + "\n"
+
+    return Response(stream_with_context(generate()), mimetype="application/x-ndjson")
+
+@admin_bp.route("/auth/admin/mongo/metrics", methods=["GET"])
+@admin_required
+def mongo_metrics(user):
+    """
+    Latencia de comandos MongoDB por endpoint, colección y comando:
+    - endpoint (query, opcional): filtra por endpoint de Flask (ej. backend_bp.refresh)
+    - reset=true (query, opcional): reinicia los histogramas tras leerlos
+    """
+    snapshot = command_metrics.snapshot(endpoint=request.args.get("endpoint"))
+    since = datetime.fromtimestamp(command_metrics.started_at).isoformat()
+    if request.args.get("reset", "").lower() == "true":
+        command_metrics.reset()
+    return jsonify({"since": since, "commands": snapshot}), 200
+
+@admin_bp.route("/auth/admin/token-cache", methods=["GET"])
+@admin_required
+def token_cache_stats(user):
+    """Contadores de la cache de tokens verificados (hits, misses, evictions, invalidations)"""
+    return jsonify(VerifiedTokenCache.stats()), 200
+
+@admin_bp.route("/auth/admin/revocations", methods=["GET"])
+@admin_required
+def revocation_stats(user):
+    """Estado del conjunto de revocaciones en memoria (tamaño, filtro de Bloom, última sincronización)"""
+    return jsonify(RevocationSet.stats()), 200
+
+@admin_bp.route("/auth/admin/crypto-executor", methods=["GET"])
+@admin_required
+def crypto_executor_stats(user):
+    """Cola y tiempos (espera/ejecución) del ejecutor de bcrypt y firma JWT"""
+    return jsonify(CryptoExecutor.stats()), 200
+
 @admin_bp.route('/auth/sessions/active', methods=['POST'])
 @admin_required
 def get_active_sessions(user):
@@ -205,9 +282,9 @@ def get_active_sessions(user):
 @admin_bp.route("/auth/sessions/revoke", methods=["POST"])
 @admin_required
 def revoke_session(user):
-    auth_service = AuthService()
-    ss = SessionService()
-    ads = AuditService()
+    auth_service = provide(AuthService)
+    ss = provide(SessionService)
+    ads = provide(AuditService)
     data = request.json;
     session_id = data.get("user_id")
     username = data.get("username")
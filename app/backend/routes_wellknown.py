@@ -0,0 +1,24 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import hashlib
+import json
+
+from flask import Blueprint, Response, request
+
+from app.config import Config
+from app.utils.key_ring import KeyRing
+
+wellknown_bp = Blueprint("wellknown_bp", __name__)
+
+
+@wellknown_bp.route("/.well-known/jwks.json", methods=["GET"])
+def jwks():
+    """
+    Claves públicas de verificación (actual + anteriores aceptadas) para que
+    otros servicios validen los access tokens localmente por kid.
+    """
+    body = json.dumps(KeyRing.jwks(), separators=(",", ":"), sort_keys=True)
+    response = Response(body, mimetype="application/json")
+    response.set_etag(hashlib.sha256(body.encode()).hexdigest())
+    response.headers["Cache-Control"] = f"public, max-age={Config.JWKS_MAX_AGE}, stale-while-revalidate={Config.JWKS_MAX_AGE}"
+    return response.make_conditional(request)
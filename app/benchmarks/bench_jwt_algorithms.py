@@ -0,0 +1,82 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Compara RS256, ES256 y EdDSA para los tokens de la aplicación: firmas y
+verificaciones por segundo y tamaño del token (mismo payload que
+TokenGenerator._build_payload). Las claves se generan en memoria.
+
+    python -m app.benchmarks.bench_jwt_algorithms --iterations 2000
+"""
+import argparse
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import jwt
+from cryptography.hazmat.primitives.asymmetric import ec, ed25519, rsa
+
+from app.utils.key_ring import key_id
+
+ALGORITHMS = {
+    "RS256": lambda: rsa.generate_private_key(public_exponent=65537, key_size=2048),
+    "ES256": lambda: ec.generate_private_key(ec.SECP256R1()),
+    "EdDSA": lambda: ed25519.Ed25519PrivateKey.generate(),
+}
+
+
+def sample_payload() -> dict:
+    now = datetime.now(timezone.utc)
+    return {
+        "sub": "user@example.com",
+        "username": "user@example.com",
+        "rol": "User",
+        "scope": "read_only",
+        "device_id": str(uuid.uuid4()),
+        "jti": str(uuid.uuid4()),
+        "exp": now + timedelta(minutes=5),
+        "iat": now,
+        "nbf": now,
+        "iss": "neo-auth",
+        "aud": "neo-app",
+        "type": "access"
+    }
+
+
+def run(algorithm: str, iterations: int) -> dict:
+    private_key = ALGORITHMS[algorithm]()
+    public_key = private_key.public_key()
+    headers = {"kid": key_id(public_key)}
+    payload = sample_payload()
+
+    start = time.perf_counter()
+    for _ in range(iterations):
+        token = jwt.encode(payload, private_key, algorithm=algorithm, headers=headers)
+    sign_elapsed = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for _ in range(iterations):
+        jwt.decode(token, public_key, algorithms=[algorithm], audience="neo-app", issuer="neo-auth")
+    verify_elapsed = time.perf_counter() - start
+
+    return {
+        "algorithm": algorithm,
+        "sign_per_s": iterations / sign_elapsed,
+        "verify_per_s": iterations / verify_elapsed,
+        "token_bytes": len(token)
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=2000)
+    parser.add_argument("--algorithms", default=",".join(ALGORITHMS))
+    args = parser.parse_args()
+
+    print(f"{'algoritmo':>9} {'firmas/s':>10} {'verif./s':>10} {'bytes':>6}")
+    for algorithm in args.algorithms.split(","):
+        result = run(algorithm, args.iterations)
+        print(f"{result['algorithm']:>9} {result['sign_per_s']:>10.0f} {result['verify_per_s']:>10.0f} {result['token_bytes']:>6}")
+
+
+if __name__ == "__main__":
+    main()
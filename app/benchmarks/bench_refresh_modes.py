@@ -0,0 +1,136 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Throughput de POST /api/auth/refresh con refresh tokens JWT y opacos
+(REFRESH_TOKEN_FORMAT). En modo jwt cada rotación verifica la firma del
+refresh recibido y firma uno nuevo; en modo opaco solo se firma el access.
+
+Usa las claves de PATH_PRIVATE_KEY/PATH_PUBLIC_KEY y una base temporal
+(--db) que se borra al terminar:
+
+    python -m app.benchmarks.bench_refresh_modes --uri mongodb://localhost:27017 --requests 300
+"""
+import argparse
+import statistics
+import time
+from datetime import datetime, timezone
+from uuid import uuid4
+
+from bson import ObjectId
+from flask import Flask
+
+from app import register_error_handlers
+from app.backend.routes import backend_bp
+from app.benchmarks.bench_write_round_trips import CommandCounter, build_database
+from app.config import Config
+from app.dao.auth_dao import AuthDao
+from app.model.token_generator import TokenGenerator, token_settings
+from app.utils.db_mongo import MongoDatabase
+from app.utils.request_container import request_container
+from app.utils.token_cache import VerifiedTokenCache
+
+USERNAME = "bench@example.com"
+USER_AGENT = {"browser": "bench", "os": "bench"}
+MODES = ("jwt", "opaque")
+# /auth/refresh admite 3 rotaciones por refresh emitido en login (refresh_attempts)
+CHAIN = 3
+
+
+def build_app(db: MongoDatabase) -> Flask:
+    app = Flask(__name__)
+    app.register_blueprint(backend_bp, url_prefix="/api")
+    register_error_handlers(app)
+
+    @app.before_request
+    def bind_database():
+        request_container().get(MongoDatabase, lambda: db)
+
+    return app
+
+
+def seed(db: MongoDatabase) -> dict:
+    """Usuario y sesión activa; devuelve las referencias que /auth/acceso guarda con el refresh"""
+    now = datetime.now(timezone.utc)
+    user_id = ObjectId()
+    db.db.users.insert_one({"_id": user_id, "username": USERNAME, "email": USERNAME, "password": "x", "rol": "User",
+                            "created_at": now, "updated_at": now, "failed_attempts": 0, "blocked_until": None,
+                            "token_epoch": 0})
+    session = db.db.active_sessions.insert_one({"user_id": user_id, "device_id": "bench", "ip_address": "127.0.0.1",
+                                      "browser": "bench", "os": "bench", "login_at": now, "refresh_token": "-",
+                                      "is_revoked": False, "status": "active", "reason": "login"})
+    return {"user_id": user_id, "session_id": session.inserted_id}
+
+
+def login(db: MongoDatabase, tg: TokenGenerator, device_id: str, session_ref: dict) -> str:
+    """Refresh recién emitido y guardado como en /auth/acceso (fuera de la medición)"""
+    jti = str(uuid4())
+    issued = tg.create_tokens({"username": USERNAME, "rol": "User", "device_id": device_id, "jti": jti, "epoch": 0})
+    query, update = AuthDao.refresh_token_upsert(username=USERNAME, device_id=device_id, jti=jti,
+                                                 refresh_token=issued.refresh_token, refresh_attempts=0,
+                                                 browser="bench", os="bench", ip_address="127.0.0.1",
+                                                 rol="User", epoch=0, **session_ref)
+    db.db.refresh_tokens.update_one(query, update, upsert=True)
+    return issued.refresh_token
+
+
+def run_mode(app: Flask, db: MongoDatabase, counter: CommandCounter, session_ref: dict, mode: str, requests: int) -> dict:
+    Config.REFRESH_TOKEN_FORMAT = mode
+    token_settings.cache_clear()
+    VerifiedTokenCache.clear()
+    tg = TokenGenerator()
+    client = app.test_client()
+    latencies, commands = [], 0
+    while len(latencies) < requests:
+        device_id = f"device-{uuid4()}"
+        refresh_token = login(db, tg, device_id, session_ref)
+        for _ in range(min(CHAIN, requests - len(latencies))):
+            counter.reset()
+            start = time.perf_counter()
+            response = client.post("/api/auth/refresh", json={"refresh_token": refresh_token, "device_id": device_id,
+                                                              "user_agent": USER_AGENT})
+            latencies.append(time.perf_counter() - start)
+            commands += sum(counter.commands.values())
+            if response.status_code != 200:
+                raise SystemExit(f"{mode}: /auth/refresh respondió {response.status_code}: {response.get_json()}")
+            refresh_token = response.get_json()["refresh_token"]
+    latencies.sort()
+    return {
+        "mode": mode,
+        "requests_per_second": len(latencies) / sum(latencies),
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p95_ms": latencies[int(len(latencies) * 0.95) - 1] * 1000,
+        "commands_per_refresh": commands / len(latencies),
+        "refresh_token_bytes": len(refresh_token)
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--uri", default=Config.MONGO_URI)
+    parser.add_argument("--db", default="bench_refresh_modes")
+    parser.add_argument("--requests", type=int, default=300)
+    args = parser.parse_args()
+
+    counter = CommandCounter()
+    db = build_database(args.uri, counter)
+    db.db = db.client[args.db]
+    db.client.drop_database(args.db)
+    original = Config.REFRESH_TOKEN_FORMAT
+    try:
+        session_ref = seed(db)
+        app = build_app(db)
+        results = [run_mode(app, db, counter, session_ref, mode, args.requests) for mode in MODES]
+        for r in results:
+            print(f"{r['mode']:>7}: {r['requests_per_second']:.0f} req/s, p50 {r['p50_ms']:.2f} ms, "
+                  f"p95 {r['p95_ms']:.2f} ms, {r['commands_per_refresh']:.1f} comandos/refresh, "
+                  f"refresh de {r['refresh_token_bytes']} bytes")
+        print(f"opaque/jwt: x{results[1]['requests_per_second'] / results[0]['requests_per_second']:.2f}")
+    finally:
+        Config.REFRESH_TOKEN_FORMAT = original
+        token_settings.cache_clear()
+        db.client.drop_database(args.db)
+        db.client.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Escrituras por login y por refresh con los dos esquemas de sesiones
+(Config.SESSION_SCHEMA): split (refresh_tokens + active_sessions) y unified
+(un documento por usuario + device). Cada usuario hace un login y CHAIN
+refresh; se cuentan comandos de escritura y documentos escritos por colección.
+
+Usa una base temporal (--db) que se borra al terminar:
+
+    python -m app.benchmarks.bench_session_writes --uri mongodb://localhost:27017 --users 100
+"""
+import argparse
+from collections import Counter
+from datetime import datetime, timezone
+
+from flask import Flask
+from pymongo import monitoring
+
+from app.benchmarks.bench_refresh_modes import CHAIN, USER_AGENT, build_app
+from app.benchmarks.bench_write_round_trips import build_database
+from app.config import Config
+from app.model.user import User
+from app.utils.db_create import ensure_indexes
+from app.utils.db_mongo import MongoDatabase
+
+SCHEMAS = ("split", "unified")
+PASSWORD = "bench-password"
+# Campo con las operaciones de cada comando de escritura (None = una sola)
+WRITE_COMMANDS = {"insert": "documents", "update": "updates", "delete": "deletes", "findAndModify": None, "bulkWrite": "ops"}
+
+
+class WriteCounter(monitoring.CommandListener):
+    """Comandos de escritura y documentos escritos por colección"""
+
+    def __init__(self) -> None:
+        self.commands = 0
+        self.documents = Counter()
+
+    def started(self, event: monitoring.CommandStartedEvent) -> None:
+        if event.command_name not in WRITE_COMMANDS:
+            return
+        self.commands += 1
+        command = event.command
+        if event.command_name == "bulkWrite":
+            # bulkWrite de cliente: cada operación apunta a un namespace de nsInfo
+            namespaces = [ns["ns"].split(".", 1)[1] for ns in command.get("nsInfo", [])]
+            for op in command.get("ops", []):
+                index = next(v for k, v in op.items() if k in ("insert", "update", "delete"))
+                self.documents[namespaces[index]] += 1
+            return
+        field = WRITE_COMMANDS[event.command_name]
+        self.documents[command[event.command_name]] += len(command.get(field, [])) if field else 1
+
+    def succeeded(self, event: monitoring.CommandSucceededEvent) -> None:
+        pass
+
+    def failed(self, event: monitoring.CommandFailedEvent) -> None:
+        pass
+
+    def reset(self) -> None:
+        self.commands = 0
+        self.documents.clear()
+
+
+def seed(db: MongoDatabase, users: int) -> list[str]:
+    now = datetime.now(timezone.utc)
+    password = User.hash_password(PASSWORD)
+    usernames = [f"bench{i}@example.com" for i in range(users)]
+    db.db.users.insert_many([{"username": username, "email": username, "password": password, "rol": "User",
+                              "created_at": now, "updated_at": now, "failed_attempts": 0, "blocked_until": None,
+                              "token_epoch": 0} for username in usernames])
+    return usernames
+
+
+def run_schema(app: Flask, db: MongoDatabase, counter: WriteCounter, schema: str, users: int) -> dict:
+    Config.SESSION_SCHEMA = schema
+    ensure_indexes(db.db)
+    client = app.test_client()
+    phases = {"login": (0, Counter()), "refresh": (0, Counter())}
+
+    def measure(phase: str, path: str, body: dict) -> dict:
+        counter.reset()
+        response = client.post(path, json=body)
+        if response.status_code != 200:
+            raise SystemExit(f"{schema}: {path} respondió {response.status_code}: {response.get_json()}")
+        commands, documents = phases[phase]
+        phases[phase] = (commands + counter.commands, documents + counter.documents)
+        return response.get_json()
+
+    for i, username in enumerate(seed(db, users)):
+        device_id = f"device-{i}"
+        tokens = measure("login", "/api/auth/acceso", {"username": username, "password": PASSWORD, "device": device_id,
+                                                       "rol": "User", "user_agent": USER_AGENT})
+        for _ in range(CHAIN):
+            tokens = measure("refresh", "/api/auth/refresh", {"refresh_token": tokens["refresh_token"],
+                                                              "device_id": device_id, "user_agent": USER_AGENT})
+
+    counts = {"login": users, "refresh": users * CHAIN}
+    return {
+        "schema": schema,
+        **{f"{phase}_commands": commands / counts[phase] for phase, (commands, _) in phases.items()},
+        **{f"{phase}_documents": {c: n / counts[phase] for c, n in sorted(documents.items())}
+           for phase, (_, documents) in phases.items()}
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--uri", default=Config.MONGO_URI)
+    parser.add_argument("--db", default="bench_session_writes")
+    parser.add_argument("--users", type=int, default=100)
+    args = parser.parse_args()
+
+    counter = WriteCounter()
+    db = build_database(args.uri, counter)
+    db.db = db.client[args.db]
+    original = Config.SESSION_SCHEMA
+    try:
+        app = build_app(db)
+        for schema in SCHEMAS:
+            db.client.drop_database(args.db)
+            r = run_schema(app, db, counter, schema, args.users)
+            for phase in ("login", "refresh"):
+                documents = ", ".join(f"{c}={n:.1f}" for c, n in r[f"{phase}_documents"].items())
+                print(f"{schema:>8} {phase:>7}: {r[f'{phase}_commands']:.1f} escrituras ({documents})")
+    finally:
+        Config.SESSION_SCHEMA = original
+        db.client.drop_database(args.db)
+        db.client.close()
+
+
+if __name__ == "__main__":
+    main()
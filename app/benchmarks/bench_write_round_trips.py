@@ -0,0 +1,88 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Cuenta los comandos (round trips) que envía MongoDatabase por cada escritura
+de un documento, con y sin transacción.
+
+Requiere un mongod en modo replica set (las transacciones no existen en un
+standalone):
+
+    python -m app.benchmarks.bench_write_round_trips --uri mongodb://localhost:27017/?replicaSet=rs0
+"""
+import argparse
+import time
+from collections import Counter
+from datetime import datetime, timezone
+
+from pymongo import MongoClient, monitoring
+
+from app.config import Config
+from app.utils.db_mongo import MongoDatabase
+
+COLLECTION = "bench_round_trips"
+
+
+class CommandCounter(monitoring.CommandListener):
+    """Acumula los comandos enviados al servidor"""
+
+    def __init__(self) -> None:
+        self.commands = Counter()
+
+    def started(self, event: monitoring.CommandStartedEvent) -> None:
+        self.commands[event.command_name] += 1
+
+    def succeeded(self, event: monitoring.CommandSucceededEvent) -> None:
+        pass
+
+    def failed(self, event: monitoring.CommandFailedEvent) -> None:
+        pass
+
+    def reset(self) -> None:
+        self.commands.clear()
+
+
+def build_database(uri: str, counter: CommandCounter) -> MongoDatabase:
+    client = MongoClient(uri, event_listeners=[counter], tz_aware=True, tzinfo=timezone.utc)
+    db = MongoDatabase()
+    db.client = client
+    db.db = client[Config.MONGO_DB]
+    return db
+
+
+def run_mode(db: MongoDatabase, counter: CommandCounter, transactional: bool, iterations: int) -> dict:
+    counter.reset()
+    start = time.perf_counter()
+    for i in range(iterations):
+        db.insert_with_log(COLLECTION, {"n": i, "created_at": datetime.now(timezone.utc)}, transactional=transactional)
+        db.update_with_log(COLLECTION, {"n": i}, {"$set": {"updated": True}}, upsert=False, transactional=transactional)
+    elapsed = time.perf_counter() - start
+    writes = iterations * 2
+    return {
+        "mode": "transaccional" if transactional else "directo",
+        "commands_per_write": sum(counter.commands.values()) / writes,
+        "ms_per_write": elapsed * 1000 / writes,
+        "commands": dict(counter.commands)
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--uri", default=Config.MONGO_URI)
+    parser.add_argument("--iterations", type=int, default=200)
+    args = parser.parse_args()
+
+    counter = CommandCounter()
+    db = build_database(args.uri, counter)
+    db.db[COLLECTION].drop()
+    try:
+        for transactional in (True, False):
+            result = run_mode(db, counter, transactional, args.iterations)
+            print(f"{result['mode']:>14}: {result['commands_per_write']:.2f} comandos/escritura, "
+                  f"{result['ms_per_write']:.2f} ms/escritura -> {result['commands']}")
+    finally:
+        db.db[COLLECTION].drop()
+        db.client.close()
+
+
+if __name__ == "__main__":
+    main()
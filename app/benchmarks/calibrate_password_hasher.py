@@ -0,0 +1,99 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Calibra el costo del hash de contraseñas para este host: mide la latencia
+de hash con costos crecientes y elige el mayor que no supere --target-ms.
+Imprime las variables de entorno a configurar (PASSWORD_HASHER y
+parámetros); los hashes existentes se actualizan solos en el próximo login
+(Config.PASSWORD_REHASH_ON_LOGIN).
+
+    python -m app.benchmarks.calibrate_password_hasher --target-ms 250
+    python -m app.benchmarks.calibrate_password_hasher --hasher argon2id --memory-kib 65536
+"""
+import argparse
+import statistics
+import time
+
+from app.utils.password_hasher import build_hasher
+
+SAMPLE_PASSWORD = "calibración-Passw0rd!"
+BCRYPT_ROUNDS = range(4, 18)
+ARGON2_MAX_TIME_COST = 10
+ARGON2_MIN_MEMORY_KIB = 19456  # mínimo recomendado por OWASP para argon2id
+
+
+def measure(hasher, samples: int = 3) -> float:
+    """Mediana (ms) de samples hashes"""
+    durations = []
+    for _ in range(samples):
+        start = time.perf_counter()
+        hasher.hash(SAMPLE_PASSWORD)
+        durations.append((time.perf_counter() - start) * 1000)
+    return statistics.median(durations)
+
+
+def calibrate_bcrypt(target_ms: float, samples: int = 3) -> dict:
+    """Mayor número de rondas bajo target_ms (cada ronda extra duplica el costo)"""
+    best = None
+    for rounds in BCRYPT_ROUNDS:
+        elapsed = measure(build_hasher("bcrypt", rounds=rounds), samples)
+        if elapsed > target_ms and best is not None:
+            break
+        best = {"hasher": "bcrypt", "params": {"rounds": rounds}, "ms": round(elapsed, 1)}
+        if elapsed > target_ms:
+            break  # ni el mínimo entra en el presupuesto
+    return best
+
+
+def calibrate_argon2(target_ms: float, memory_kib: int = 65536, parallelism: int = 4, samples: int = 3) -> dict:
+    """
+    Con la memoria dada sube time_cost hasta el presupuesto; si ni time_cost=1
+    entra, reduce la memoria a la mitad (sin bajar de ARGON2_MIN_MEMORY_KIB).
+    """
+    best = None
+    while best is None:
+        for time_cost in range(1, ARGON2_MAX_TIME_COST + 1):
+            params = {"time_cost": time_cost, "memory_kib": memory_kib, "parallelism": parallelism}
+            elapsed = measure(build_hasher("argon2id", **params), samples)
+            if elapsed > target_ms:
+                break
+            best = {"hasher": "argon2id", "params": params, "ms": round(elapsed, 1)}
+        if best is None:
+            if memory_kib <= ARGON2_MIN_MEMORY_KIB:
+                return {"hasher": "argon2id", "params": params, "ms": round(elapsed, 1)}
+            memory_kib = max(ARGON2_MIN_MEMORY_KIB, memory_kib // 2)
+    return best
+
+
+def env_lines(result: dict) -> list[str]:
+    names = {
+        "rounds": "PASSWORD_BCRYPT_ROUNDS",
+        "time_cost": "PASSWORD_ARGON2_TIME_COST",
+        "memory_kib": "PASSWORD_ARGON2_MEMORY_KIB",
+        "parallelism": "PASSWORD_ARGON2_PARALLELISM",
+    }
+    return [f"PASSWORD_HASHER={result['hasher']}"] + [f"{names[k]}={v}" for k, v in result["params"].items()]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--hasher", choices=("bcrypt", "argon2id"), default="bcrypt")
+    parser.add_argument("--target-ms", type=float, default=250.0, help="latencia máxima de un hash/verificación")
+    parser.add_argument("--samples", type=int, default=3)
+    parser.add_argument("--memory-kib", type=int, default=65536, help="argon2id: memoria inicial")
+    parser.add_argument("--parallelism", type=int, default=4, help="argon2id: hilos por hash")
+    args = parser.parse_args()
+
+    if args.hasher == "bcrypt":
+        result = calibrate_bcrypt(args.target_ms, args.samples)
+    else:
+        result = calibrate_argon2(args.target_ms, args.memory_kib, args.parallelism, args.samples)
+
+    print(f"# {result['hasher']} {result['params']} -> {result['ms']} ms por hash (objetivo {args.target_ms} ms)")
+    if result["ms"] > args.target_ms:
+        print("# ⚠️ ni el costo mínimo entra en el presupuesto")
+    print("\n".join(env_lines(result)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,373 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Planes de ejecución (explain) de todas las consultas que emiten los DAOs.
+
+Las consultas se capturan ejecutando los métodos reales de los DAOs contra
+RecordingDatabase (no toca la red); luego cada una se ejecuta con explain()
+en una base temporal con los índices de app.utils.db_create.INDEXES y datos
+sintéticos. Un plan es sospechoso si recorre la colección (COLLSCAN) o
+examina muchas más claves/documentos de los que devuelve.
+
+    python -m app.benchmarks.query_plans --uri mongodb://localhost:27017
+
+app/tests/test_query_plans.py usa este módulo como suite de regresión
+(variable de entorno MONGO_EXPLAIN_URI).
+"""
+import argparse
+import sys
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Iterator, Optional
+
+from bson import ObjectId, SON
+from flask import Flask
+from pymongo import MongoClient
+
+from app.dao.audit_dao import AuditLogDAO
+from app.dao.auth_dao import AuthDao
+from app.dao.blacklist_dao import TokenBlacklistDao
+from app.dao.session_dao import SessionDAO
+from app.dao.user_dao import UserDAO
+from app.utils.db_create import ensure_indexes
+from app.utils.db_mongo import MongoDatabase
+from app.utils.request_container import provide, request_container
+from app.utils.token_digest import token_hash
+
+# Un plan es aceptable si examina como mucho MAX_RATIO * devueltos + SLACK claves/documentos
+MAX_RATIO = 10
+SLACK = 20
+
+# Consultas que recorren la colección completa a propósito (listados/exportaciones de administración)
+ALLOWED_FULL_SCANS = {
+    "UserDAO.find_ids_users": "exporta todos los usuarios no Admin",
+    "SessionDAO.get_active_sessions_with_user_data": "panel de administración: $lookup sobre todas las sesiones",
+    "AuditLogDAO.get_logs_audit": "sin filtros: totalCount recorre todo session_audit",
+    "SessionDAO.device_id_exists": "sin uso en las rutas: no justifica un índice solo por device_id en active_sessions",
+}
+
+
+@dataclass
+class QueryShape:
+    """Una consulta emitida por un DAO"""
+    name: str
+    kind: str  # find | count | aggregate | update | delete
+    collection: str
+    filter: dict = field(default_factory=dict)
+    pipeline: list = field(default_factory=list)
+    update: Any = None
+    sort: Optional[list] = None
+    limit: int = 0
+    skip: int = 0
+    upsert: bool = False
+    multi: bool = False
+
+
+class _Result(dict):
+    """Respuesta de escritura: dict (update_with_log) y UpdateResult (modified_count) a la vez"""
+    modified_count = 0
+    deleted_count = 0
+
+
+class RecordingDatabase:
+    """Sustituto de MongoDatabase que registra las consultas en vez de ejecutarlas"""
+
+    def __init__(self) -> None:
+        self.shapes: list[QueryShape] = []
+
+    def _record(self, kind: str, collection: str, **kwargs) -> None:
+        self.shapes.append(QueryShape(name="", kind=kind, collection=collection, **kwargs))
+
+    def find(self, collection: str, query: Optional[dict] = None, projection: Optional[dict] = None, read_preference=None):
+        self._record("find", collection, filter=query or {})
+        return None
+
+    def stream(self, collection: str, query: Optional[dict] = None, projection: Optional[dict] = None, sort=None,
+               limit: int = 0, skip: int = 0, batch_size=None, max_time_ms=None, read_preference=None) -> Iterator[dict]:
+        self._record("find", collection, filter=query or {}, sort=sort, limit=limit, skip=skip)
+        return iter([])
+
+    def find_page(self, collection: str, query: Optional[dict] = None, projection: Optional[dict] = None, page: int = 1,
+                  page_size: int = 50, sort=None, max_time_ms=None, read_preference=None) -> dict:
+        self._record("find", collection, filter=query or {}, sort=sort, limit=page_size + 1, skip=(page - 1) * page_size)
+        return {"items": [], "page": page, "page_size": page_size, "has_next": False}
+
+    def find_one(self, collection: str, query: Optional[dict] = None, projection: Optional[dict] = None):
+        self._record("find", collection, filter=query or {}, limit=1)
+        return None
+
+    def count_documents(self, collection: str, filtro: Optional[dict] = None, read_preference=None) -> int:
+        self._record("count", collection, filter=filtro or {})
+        return 0
+
+    def aggregate(self, collection: str, pipeline: list, transactional: bool = False, read_preference=None) -> list:
+        self._record("aggregate", collection, pipeline=pipeline)
+        return []
+
+    def update_with_log(self, collection: str, query: dict, update: dict, upsert: bool, context: str = "", transactional: bool = False):
+        self._record("update", collection, filter=query, update=update, upsert=upsert)
+        return _Result(success=True, modified_count=0)
+
+    def update_one(self, collection: str, query: dict, update: dict, upsert: bool):
+        self._record("update", collection, filter=query, update=update, upsert=upsert)
+        return _Result()
+
+    def find_one_and_update(self, collection: str, query: dict, update: dict, projection: Optional[dict] = None,
+                            upsert: bool = False, return_document=None) -> Optional[dict]:
+        self._record("update", collection, filter=query, update=update, upsert=upsert)
+        return None
+
+    def update_many(self, collection: str, query: dict, update: dict):
+        self._record("update", collection, filter=query, update=update, upsert=True, multi=True)
+        return _Result()
+
+    def delete_one(self, collection: str, query: dict) -> bool:
+        self._record("delete", collection, filter=query)
+        return False
+
+    def insert_with_log(self, collection: str, document: dict, context: str = "", transactional: bool = False) -> dict:
+        return _Result(success=True)
+
+
+@dataclass
+class Sample:
+    """Valores de las consultas; existen en los datos de seed()"""
+    user: int = 7
+    device: int = 1
+
+    @property
+    def username(self) -> str:
+        return f"user{self.user}@example.com"
+
+    @property
+    def user_id(self) -> ObjectId:
+        return user_object_id(self.user)
+
+    @property
+    def device_id(self) -> str:
+        return f"device-{self.user}-{self.device}"
+
+    @property
+    def jti(self) -> str:
+        return f"jti-{self.user}-{self.device}"
+
+    @property
+    def refresh_token(self) -> str:
+        return f"refresh-{self.user}-{self.device}"
+
+
+def user_object_id(n: int) -> ObjectId:
+    return ObjectId(f"{n:024x}")
+
+
+def dao_calls(s: Sample) -> dict[str, Callable[[], Any]]:
+    """Un llamado por cada método de DAO que consulta MongoDB"""
+    now = datetime.now(timezone.utc)
+    refresh_kwargs = {
+        "username": s.username, "device_id": s.device_id, "jti": s.jti, "refresh_token": s.refresh_token,
+        "refresh_attempts": 0, "browser": "Firefox", "os": "Linux", "ip_address": "10.0.0.1", "user_agent": "Mozilla/5.0",
+        "user_id": s.user_id
+    }
+    return {
+        "AuthDao.get_active_token_by_user_and_device": lambda: provide(AuthDao).get_active_token_by_user_and_device(s.username, s.device_id),
+        "AuthDao.get_active_token_by_username": lambda: provide(AuthDao).get_active_token_by_username(s.username),
+        "AuthDao.is_token_in_use": lambda: provide(AuthDao).is_token_in_use(s.username),
+        "AuthDao.revoke_all_tokens_for_user": lambda: provide(AuthDao).revoke_all_tokens_for_user(s.username),
+        "AuthDao.revoke_token_by_jti": lambda: provide(AuthDao).revoke_token_by_jti(s.jti),
+        "AuthDao.revoke_token_by_device_id": lambda: provide(AuthDao).revoke_token_by_device_id(s.device_id),
+        "AuthDao.mark_token_as_used": lambda: provide(AuthDao).mark_token_as_used(
+            s.username, s.device_id, s.jti, s.refresh_token, now, now + timedelta(minutes=6), 0, "Firefox", "Linux", "10.0.0.1", upsert=False),
+        "AuthDao.revoke_refresh_token": lambda: provide(AuthDao).revoke_refresh_token(s.username, s.device_id, s.refresh_token),
+        "AuthDao.upsert_refresh_token": lambda: provide(AuthDao).upsert_refresh_token(**refresh_kwargs),
+        "AuthDao.find_by_jtis": lambda: provide(AuthDao).find_by_jtis([s.jti]),
+        "AuthDao.find_by_token_hashes": lambda: provide(AuthDao).find_by_token_hashes([token_hash(s.refresh_token)]),
+        "AuthDao.rotate_refresh_token": lambda: provide(AuthDao).rotate_refresh_token(
+            s.refresh_token, s.device_id, f"{s.refresh_token}-next", now + timedelta(minutes=6), "Firefox", "Linux", "10.0.0.1"),
+        "TokenBlacklistDao.find_revoked": lambda: provide(TokenBlacklistDao).find_revoked([s.refresh_token], [s.jti]),
+        "TokenBlacklistDao.is_token_revoked": lambda: provide(TokenBlacklistDao).is_token_revoked(s.jti),
+        "TokenBlacklistDao.revoke_token_blacklist": lambda: provide(TokenBlacklistDao).revoke_token_blacklist(f"token-{s.user}", reason="logout"),
+        "SessionDAO.get_active_session": lambda: provide(SessionDAO).get_active_session(s.user_id, s.device_id),
+        "SessionDAO.get_active_session_by_Id": lambda: provide(SessionDAO).get_active_session_by_Id(s.user_id),
+        "SessionDAO.find_previous_session": lambda: provide(SessionDAO).find_previous_session(s.user_id, s.device_id),
+        "SessionDAO.device_id_exists": lambda: provide(SessionDAO).device_id_exists(s.device_id),
+        "SessionDAO.revoked_session": lambda: provide(SessionDAO).revoked_session(s.user_id, "logout"),
+        "SessionDAO.update_session": lambda: provide(SessionDAO).update_session(s.user_id, s.refresh_token, "refresh_token"),
+        "SessionDAO.update_session_for_audit": lambda: provide(SessionDAO).update_session_for_audit(s.user_id, "10.0.0.1", "Firefox", "ip_change"),
+        "SessionDAO.has_active_session": lambda: provide(SessionDAO).has_active_session(s.user_id),
+        "SessionDAO.get_active_sessions_with_user_data": lambda: provide(SessionDAO).get_active_sessions_with_user_data(),
+        "UserDAO.find_by_id": lambda: provide(UserDAO).find_by_id(str(s.user_id)),
+        "UserDAO.find_by_username": lambda: provide(UserDAO).find_by_username(s.username),
+        "UserDAO.find_ids_users": lambda: provide(UserDAO).find_ids_users(),
+        "UserDAO.find_all": lambda: provide(UserDAO).find_all(),
+        "UserDAO.find_page": lambda: provide(UserDAO).find_page(page=2, page_size=10),
+        "UserDAO.count_documents": lambda: provide(UserDAO).count_documents(),
+        "UserDAO.find_blocked": lambda: provide(UserDAO).find_blocked(),
+        "UserDAO.get_token_epoch": lambda: provide(UserDAO).get_token_epoch(s.username),
+        "UserDAO.bump_token_epoch": lambda: provide(UserDAO).bump_token_epoch(s.username),
+        "UserDAO.record_login_attempt": lambda: provide(UserDAO).record_login_attempt(s.username, False, 3, 120),
+        "UserDAO.update": lambda: provide(UserDAO).update({"username": s.username, "rol": "User"}, {"$inc": {"failed_attempts": 1}}),
+        "AuditLogDAO.get_logs_audit": lambda: provide(AuditLogDAO).get_logs_audit(),
+        "AuditLogDAO.get_logs_audit[user_id]": lambda: provide(AuditLogDAO).get_logs_audit(user_id=s.user_id),
+        "AuditLogDAO.get_logs_audit[event_type]": lambda: provide(AuditLogDAO).get_logs_audit(event_type="revoked"),
+        "AuditLogDAO.get_logs_audit[range]": lambda: provide(AuditLogDAO).get_logs_audit(
+            start=(now - timedelta(hours=1)).timestamp(), end=now.timestamp()),
+    }
+
+
+def capture_shapes(sample: Optional[Sample] = None) -> list[QueryShape]:
+    """Ejecuta los métodos de los DAOs contra RecordingDatabase y devuelve sus consultas"""
+    shapes = []
+    app = Flask(__name__)
+    for name, call in dao_calls(sample or Sample()).items():
+        recorder = RecordingDatabase()
+        # Cada llamado en su propio request: los DAOs comparten el recorder vía provide(MongoDatabase)
+        with app.test_request_context():
+            request_container().get(MongoDatabase, lambda: recorder)
+            call()
+        for i, shape in enumerate(recorder.shapes):
+            shape.name = name if len(recorder.shapes) == 1 else f"{name}#{i + 1}"
+            shapes.append(shape)
+    return shapes
+
+
+def explain(database, shape: QueryShape) -> dict:
+    """explain() en modo executionStats (no modifica datos, tampoco en updates)"""
+    if shape.kind == "find":
+        command = {"find": shape.collection, "filter": shape.filter}
+        if shape.sort:
+            command["sort"] = SON(shape.sort)
+        if shape.limit:
+            command["limit"] = shape.limit
+        if shape.skip:
+            command["skip"] = shape.skip
+    elif shape.kind == "count":
+        command = {"count": shape.collection, "query": shape.filter}
+    elif shape.kind == "aggregate":
+        command = {"aggregate": shape.collection, "pipeline": shape.pipeline, "cursor": {}}
+    elif shape.kind == "update":
+        command = {"update": shape.collection,
+                   "updates": [{"q": shape.filter, "u": shape.update, "upsert": shape.upsert, "multi": shape.multi}]}
+    else:
+        command = {"delete": shape.collection, "deletes": [{"q": shape.filter, "limit": 1}]}
+    return database.command("explain", command, verbosity="executionStats")
+
+
+def _walk(node: Any) -> Iterator[dict]:
+    if isinstance(node, dict):
+        yield node
+        for value in node.values():
+            yield from _walk(value)
+    elif isinstance(node, list):
+        for value in node:
+            yield from _walk(value)
+
+
+def plan_summary(explain_doc: dict) -> dict:
+    """Etapas del plan ganador y contadores de executionStats"""
+    stages = set()
+    for node in _walk(explain_doc):
+        if "winningPlan" in node:
+            stages.update(n["stage"] for n in _walk(node["winningPlan"]) if isinstance(n.get("stage"), str))
+    stats = next((n["executionStats"] for n in _walk(explain_doc) if isinstance(n.get("executionStats"), dict)), {})
+    return {
+        "stages": sorted(stages),
+        "keys_examined": stats.get("totalKeysExamined", 0),
+        "docs_examined": stats.get("totalDocsExamined", 0),
+        "returned": stats.get("nReturned", 0)
+    }
+
+
+def plan_problems(summary: dict, max_ratio: int = MAX_RATIO, slack: int = SLACK) -> list[str]:
+    """Motivos por los que el plan no escala (lista vacía = plan aceptable)"""
+    problems = []
+    if "COLLSCAN" in summary["stages"]:
+        problems.append("COLLSCAN")
+    budget = max(summary["returned"], 1) * max_ratio + slack
+    for key in ("keys_examined", "docs_examined"):
+        if summary[key] > budget:
+            problems.append(f"{key}={summary[key]} para {summary['returned']} devueltos")
+    return problems
+
+
+def seed(database, users: int = 50, devices: int = 3, audit_events: int = 500) -> None:
+    """Datos sintéticos coherentes con Sample"""
+    now = datetime.now(timezone.utc)
+    database.users.insert_many([{
+        "_id": user_object_id(u),
+        "username": f"user{u}@example.com",
+        "email": f"user{u}@example.com",
+        "password": "x",
+        "rol": "Admin" if u == 0 else "User",
+        "created_at": now, "updated_at": now,
+        "failed_attempts": u % 3,
+        "blocked_until": now + timedelta(minutes=5) if u % 10 == 0 else None
+    } for u in range(users)])
+    database.refresh_tokens.insert_many([{
+        "username": f"user{u}@example.com",
+        "device_id": f"device-{u}-{d}",
+        "jti": f"jti-{u}-{d}",
+        "refresh_token": f"refresh-{u}-{d}",
+        "refresh_token_hash": token_hash(f"refresh-{u}-{d}"),
+        "created_at": now, "update_at": now,
+        "expires_at": now + timedelta(minutes=6),
+        "revoked_at": None if d else now,
+        "used_at": now if d == 0 else None,
+        "refresh_attempts": 0
+    } for u in range(users) for d in range(devices)])
+    database.active_sessions.insert_many([{
+        "user_id": user_object_id(u),
+        "device_id": f"device-{u}-{d}",
+        "ip_address": "10.0.0.1", "browser": "Firefox", "os": "Linux",
+        "login_at": now, "last_refresh_at": None,
+        "refresh_token": f"refresh-{u}-{d}",
+        "refresh_token_hash": token_hash(f"refresh-{u}-{d}"),
+        "is_revoked": d == 0, "revoked_at": now if d == 0 else None,
+        "status": "revoked" if d == 0 else "active", "reason": "login"
+    } for u in range(users) for d in range(devices)])
+    database.token_blacklist.insert_many([{
+        "token": f"token-{u}", "jti": f"jti-{u}-0", "revoked_at": now, "username": f"user{u}@example.com"
+    } for u in range(users)])
+    database.session_audit.insert_many([{
+        "session_id": str(i), "user_id": str(user_object_id(i % users)),
+        "event_type": ("ip_change", "user_agent_change", "revoked")[i % 3],
+        "old_value": "a", "new_value": "b",
+        "timestamp": now - timedelta(minutes=i)
+    } for i in range(audit_events)])
+
+
+def prepare_database(client: MongoClient, name: str):
+    """Base temporal con los índices de INDEXES y los datos de seed()"""
+    client.drop_database(name)
+    database = client[name]
+    ensure_indexes(database)
+    seed(database)
+    return database
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--uri", default="mongodb://localhost:27017")
+    parser.add_argument("--db", default="query_plans_bench")
+    args = parser.parse_args()
+
+    client = MongoClient(args.uri, tz_aware=True, tzinfo=timezone.utc)
+    database = prepare_database(client, args.db)
+    failures = 0
+    try:
+        for shape in capture_shapes():
+            summary = plan_summary(explain(database, shape))
+            problems = plan_problems(summary)
+            allowed = shape.name.split("#")[0] in ALLOWED_FULL_SCANS
+            failures += bool(problems) and not allowed
+            status = "OK" if not problems else ("PERMITIDO" if allowed else "FALLA")
+            print(f"{status:>9} {shape.name:<50} {','.join(summary['stages']):<40} "
+                  f"keys={summary['keys_examined']} docs={summary['docs_examined']} n={summary['returned']} "
+                  f"{'; '.join(problems)}")
+    finally:
+        client.drop_database(args.db)
+        client.close()
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -32,6 +32,62 @@ class Config:
 
     JWT_ISSUER = os.getenv("JWT_ISSUER", "neo-auth")
     JWT_AUDIENCE = os.getenv("JWT_AUDIENCE", "neo-app")
+    # Algoritmo de firma por tipo de token (RS256, ES256 o EdDSA) y algoritmos aceptados al verificar
+    JWT_ALGORITHMS = {
+        "access": os.getenv("JWT_ACCESS_ALGORITHM", "RS256"),
+        "refresh": os.getenv("JWT_REFRESH_ALGORITHM", "RS256"),
+        "global": os.getenv("JWT_GLOBAL_ALGORITHM", "RS256")
+    }
+    JWT_ACCEPTED_ALGORITHMS = os.getenv("JWT_ACCEPTED_ALGORITHMS", "RS256,ES256,EdDSA").split(",")
+    # Formato del refresh token: jwt (firmado) | opaque (aleatorio; refresh_tokens es la fuente de verdad)
+    REFRESH_TOKEN_FORMAT = os.getenv("REFRESH_TOKEN_FORMAT", "jwt")
+    # Esquema de sesiones: split (refresh_tokens + active_sessions) | unified (un documento por usuario + device)
+    SESSION_SCHEMA = os.getenv("SESSION_SCHEMA", "split")
+    UNIFIED_SESSIONS_COLLECTION = os.getenv("UNIFIED_SESSIONS_COLLECTION", "device_sessions")
+    # Pares de claves de ES256 (P-256) y EdDSA (Ed25519); RS256 usa PATH_PRIVATE_KEY/PATH_PUBLIC_KEY
+    PATH_PRIVATE_KEY_ES256 = os.getenv("PATH_PRIVATE_KEY_ES256")
+    PATH_PUBLIC_KEY_ES256 = os.getenv("PATH_PUBLIC_KEY_ES256")
+    PATH_PRIVATE_KEY_EDDSA = os.getenv("PATH_PRIVATE_KEY_EDDSA")
+    PATH_PUBLIC_KEY_EDDSA = os.getenv("PATH_PUBLIC_KEY_EDDSA")
+    # Cada cuánto (segundos) KeyRing revisa si los PEM cambiaron en disco
+    JWT_KEY_RELOAD_CHECK_SECONDS = float(os.getenv("JWT_KEY_RELOAD_CHECK_SECONDS", "5"))
+    # Rotación: claves públicas anteriores (*.pem) que se siguen aceptando por kid
+    JWT_PREVIOUS_KEYS_DIR = os.getenv("JWT_PREVIOUS_KEYS_DIR")
+    JWT_KEY_HISTORY = int(os.getenv("JWT_KEY_HISTORY", "2"))
+    # Cache LRU de tokens verificados (entradas; 0 = desactivada) y vida máxima de una entrada (segundos)
+    JWT_VERIFY_CACHE_SIZE = int(os.getenv("JWT_VERIFY_CACHE_SIZE", "10000"))
+    JWT_VERIFY_CACHE_TTL = int(os.getenv("JWT_VERIFY_CACHE_TTL", "60"))
+    # Cache-Control max-age de /.well-known/jwks.json (segundos)
+    JWKS_MAX_AGE = int(os.getenv("JWKS_MAX_AGE", "300"))
+    # Ejecutor de bcrypt/firma JWT: auto | tpool | threads | inline; operaciones simultáneas y
+    # máximo de operaciones en espera (0 = sin límite; al superarlo se responde 503)
+    CRYPTO_EXECUTOR = os.getenv("CRYPTO_EXECUTOR", "auto")
+    CRYPTO_MAX_CONCURRENCY = int(os.getenv("CRYPTO_MAX_CONCURRENCY", str(os.cpu_count() or 4)))
+    CRYPTO_MAX_QUEUE = int(os.getenv("CRYPTO_MAX_QUEUE", "0"))
+    # Hash de contraseñas: bcrypt | argon2id (requiere argon2-cffi). Calibrar con
+    # python -m app.benchmarks.calibrate_password_hasher --target-ms 250
+    PASSWORD_HASHER = os.getenv("PASSWORD_HASHER", "bcrypt")
+    PASSWORD_BCRYPT_ROUNDS = int(os.getenv("PASSWORD_BCRYPT_ROUNDS", "12"))
+    PASSWORD_ARGON2_TIME_COST = int(os.getenv("PASSWORD_ARGON2_TIME_COST", "3"))
+    PASSWORD_ARGON2_MEMORY_KIB = int(os.getenv("PASSWORD_ARGON2_MEMORY_KIB", "65536"))
+    PASSWORD_ARGON2_PARALLELISM = int(os.getenv("PASSWORD_ARGON2_PARALLELISM", "4"))
+    # Introspección por lotes (RFC 7662) para resource servers: secreto del cliente (sin él, el
+    # endpoint queda deshabilitado), tokens por request y vida (segundos) de los resultados cacheados
+    INTROSPECTION_CLIENT_SECRET = os.getenv("INTROSPECTION_CLIENT_SECRET")
+    INTROSPECTION_MAX_BATCH = int(os.getenv("INTROSPECTION_MAX_BATCH", "100"))
+    INTROSPECTION_CACHE_TTL = float(os.getenv("INTROSPECTION_CACHE_TTL", "5"))
+    INTROSPECTION_CACHE_SIZE = int(os.getenv("INTROSPECTION_CACHE_SIZE", "10000"))
+    # Revocaciones en memoria (RevocationSet): sincronizar con token_blacklist, tamaño inicial y tasa de
+    # falsos positivos del filtro de Bloom, y frecuencia (segundos) de consulta si no hay change streams
+    REVOCATION_SYNC = os.getenv("REVOCATION_SYNC", "true").lower() == "true"
+    REVOCATION_BLOOM_CAPACITY = int(os.getenv("REVOCATION_BLOOM_CAPACITY", "100000"))
+    REVOCATION_BLOOM_ERROR_RATE = float(os.getenv("REVOCATION_BLOOM_ERROR_RATE", "0.001"))
+    REVOCATION_POLL_SECONDS = int(os.getenv("REVOCATION_POLL_SECONDS", "5"))
+    # Vida (segundos) del epoch de tokens cacheado por usuario: demora máxima con que otro proceso
+    # ve un "revocar todo"
+    TOKEN_EPOCH_CACHE_TTL = float(os.getenv("TOKEN_EPOCH_CACHE_TTL", "30"))
+    # Re-hashear en el login las contraseñas con algoritmo/costo distinto al configurado
+    PASSWORD_REHASH_ON_LOGIN = os.getenv("PASSWORD_REHASH_ON_LOGIN", "true").lower() == "true"
 
     API_URL = os.getenv("API_URL", "http://localhost:5000")
     API_EXTERNAL_URL = os.getenv("API_EXTERNAL_URL", "https://localhost")
@@ -40,6 +96,33 @@ class Config:
     MONGO_URI_CLUSTER_X509 = os.getenv("MONGO_URI_CLUSTER_X509")
     MONGO_URI = os.getenv("MONGO_URI", "mongodb://localhost:27017/")
     MONGO_DB = os.getenv("MONGO_DB", "mdbManageToken")
+    # Pool compartido de MongoClient (uno por proceso)
+    MONGO_MIN_POOL_SIZE = int(os.getenv("MONGO_MIN_POOL_SIZE", "0"))
+    MONGO_MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", "100"))
+    MONGO_MAX_IDLE_TIME_MS = int(os.getenv("MONGO_MAX_IDLE_TIME_MS", "300000"))
+    # Lecturas en streaming (MongoDatabase.stream / find_page)
+    MONGO_STREAM_BATCH_SIZE = int(os.getenv("MONGO_STREAM_BATCH_SIZE", "500"))
+    MONGO_MAX_TIME_MS = int(os.getenv("MONGO_MAX_TIME_MS", "5000"))
+    # Recorridos completos (export de usuarios): 0 = sin límite, el cursor puede durar lo que dure la descarga
+    MONGO_EXPORT_MAX_TIME_MS = int(os.getenv("MONGO_EXPORT_MAX_TIME_MS", "0"))
+    # Lecturas de administración/analítica (dashboards, auditoría): fuera del primario si es posible.
+    # Las lecturas de validación de tokens no usan esta preferencia y van siempre al primario.
+    MONGO_ADMIN_READ_PREFERENCE = os.getenv("MONGO_ADMIN_READ_PREFERENCE", "secondaryPreferred")
+    MONGO_ADMIN_MAX_STALENESS_SECONDS = int(os.getenv("MONGO_ADMIN_MAX_STALENESS_SECONDS", "90"))  # -1 = sin límite, mínimo 90
+    MONGO_ADMIN_READ_TAGS = os.getenv("MONGO_ADMIN_READ_TAGS", "")  # ej. "workload:analytics,region:eu"
+    # Métricas de comandos (CommandListener) y resumen periódico en el log (segundos, 0 = desactivado)
+    MONGO_COMMAND_MONITORING = os.getenv("MONGO_COMMAND_MONITORING", "true").lower() == "true"
+    MONGO_METRICS_LOG_INTERVAL = int(os.getenv("MONGO_METRICS_LOG_INTERVAL", "60"))
+    # Perfiles de durabilidad por colección (kwargs de WriteConcern); las no listadas usan el default del cliente
+    MONGO_WRITE_CONCERNS = {
+        "refresh_tokens": {"w": "majority", "j": True},
+        UNIFIED_SESSIONS_COLLECTION: {"w": "majority", "j": True},
+        "token_blacklist": {"w": "majority", "j": True},
+        "users": {"w": "majority", "j": True},
+        "active_sessions": {"w": "majority"},
+        "session_audit": {"w": 1, "j": False},
+        "global_tokens": {"w": 1, "j": False}
+    }
     
      # ahora lista de admins
     VALID_ROLES = os.getenv("VALID_ROLES", "Admin,Manager,User").split(",")
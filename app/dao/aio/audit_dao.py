@@ -0,0 +1,26 @@
+from app.dao.audit_dao import AuditLogDAO
+from app.model.audit_session import AuditLog
+from app.utils.db_mongo import admin_read_preference
+from app.utils.db_mongo_async import AsyncMongoDatabase
+
+
+class AsyncAuditLogDAO:
+    """Contraparte asyncio de AuditLogDAO (mismas consultas)"""
+
+    def __init__(self, db=None):
+        self.db = db or AsyncMongoDatabase()
+        self.session_audit = "session_audit"
+
+    async def insert_logs_audit(self, audit_log: AuditLog, context: str = "") -> dict:
+        return await self.db.insert_with_log(collection=self.session_audit, document=audit_log.to_dict(), context=context)
+
+    async def get_logs_audit(self, **kwargs) -> dict:
+        pipeline, page, limit = AuditLogDAO.logs_audit_pipeline(**kwargs)
+        result = await self.db.aggregate(self.session_audit, pipeline=pipeline, read_preference=admin_read_preference())
+        return AuditLogDAO.format_logs_audit(list(result), page, limit)
+
+    async def insert_event_audit(self, previous_session: dict, **kwargs) -> dict:
+        audit_log = AuditLogDAO.build_event_audit(previous_session, **kwargs)
+        if audit_log is None:
+            return {"success": True, "message": "Sin cambios que auditar"}
+        return await self.insert_logs_audit(audit_log, context="Evento Auditoria")
@@ -0,0 +1,78 @@
+import asyncio
+
+from bson import ObjectId
+
+from app.dao.aio.audit_dao import AsyncAuditLogDAO
+from app.dao.aio.session_dao import AsyncSessionDAO
+from app.dao.aio.user_dao import AsyncUserDAO
+from app.dao.auth_dao import AuthDao
+from app.utils.db_mongo_async import AsyncMongoDatabase
+from app.utils.session_schema import sessions_collection
+
+
+class AsyncAuthDao:
+    """Contraparte asyncio de AuthDao (mismas consultas)"""
+
+    def __init__(self, db=None):
+        self.db = db or AsyncMongoDatabase()
+        self.session_dao = AsyncSessionDAO(self.db)
+        self.audit_dao = AsyncAuditLogDAO(self.db)
+        self.user_dao = AsyncUserDAO(self.db)
+        self.refresh_tokens = sessions_collection("refresh_tokens")
+
+    async def get_active_token_by_user_and_device(self, username: str, device_id: str):
+        result = await self.db.aggregate(self.refresh_tokens, AuthDao.active_token_pipeline(username, device_id))
+        return result[0] if result else None
+
+    async def get_active_token_by_username(self, username: str):
+        pipeline = AuthDao.active_token_pipeline(username, projection=AuthDao.ACTIVE_TOKEN_PROJECTION)
+        result = await self.db.aggregate(self.refresh_tokens, pipeline)
+        return result[0] if result else None
+
+    async def is_token_in_use(self, username: str) -> dict:
+        query, projection = AuthDao.token_in_use_query(username)
+        return await self.db.find_one(self.refresh_tokens, query=query, projection=projection)
+
+    async def revoke_refresh_token(self, username: str, device_id: str, refresh_token: str) -> dict:
+        query, update = AuthDao.revoke_refresh_token_query(username, device_id, refresh_token)
+        return await self.db.update_with_log(self.refresh_tokens, query, update, upsert=False, context="Revocar Refresh Token")
+
+    async def update_refresh_token(self, **kwargs) -> dict:
+        query, update = AuthDao.refresh_token_upsert(**kwargs)
+        return await self.db.update_with_log(self.refresh_tokens, query, update, upsert=True, context="Upsert Refresh Token")
+
+    async def upsert_refresh_token(self, **kwargs) -> dict:
+        previous_session = None
+        if kwargs.get("user_id") is not None:
+            previous_session = await self.session_dao.find_previous_session(user_id=kwargs["user_id"], device_id=kwargs["device_id"])
+        if previous_session is not None:
+            event_audit = await self.audit_dao.insert_event_audit(previous_session=previous_session, **kwargs)
+            if not event_audit.get("success"):
+                return event_audit
+        return await self.update_refresh_token(**kwargs)
+
+    async def get_login_context(self, username: str, device_id: str, user_id: ObjectId | None = None) -> dict:
+        """
+        Lanza en paralelo las lecturas independientes del login/refresh:
+        usuario, sesión previa del dispositivo y token activo.
+        La sesión previa se busca por user_id: sin él, espera al usuario.
+        """
+        if user_id is None:
+            user, active_token = await asyncio.gather(
+                self.user_dao.find_by_username(username),
+                self.get_active_token_by_user_and_device(username, device_id)
+            )
+            previous_session = None
+            if user is not None:
+                previous_session = await self.session_dao.find_previous_session(user_id=ObjectId(user.id), device_id=device_id)
+        else:
+            user, previous_session, active_token = await asyncio.gather(
+                self.user_dao.find_by_username(username),
+                self.session_dao.find_previous_session(user_id=user_id, device_id=device_id),
+                self.get_active_token_by_user_and_device(username, device_id)
+            )
+        return {
+            "user": user,
+            "previous_session": previous_session,
+            "active_token": active_token
+        }
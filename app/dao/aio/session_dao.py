@@ -0,0 +1,46 @@
+from bson import ObjectId
+
+from app.dao.session_dao import SessionDAO
+from app.model.user_session import UserSession
+from app.utils.db_mongo import admin_read_preference
+from app.utils.db_mongo_async import AsyncMongoDatabase
+from app.utils.session_schema import sessions_collection
+
+
+class AsyncSessionDAO:
+    """Contraparte asyncio de SessionDAO (mismas consultas)"""
+
+    def __init__(self, db=None):
+        self.db = db or AsyncMongoDatabase()
+        self.active_sessions = sessions_collection("active_sessions")
+        self.users = "users"
+
+    async def insert_session(self, session: UserSession) -> dict:
+        return await self.db.insert_with_log(self.active_sessions, session.to_dict(), context="Insertar sesión activa")
+
+    async def get_active_session(self, user_id: ObjectId, device_id: str) -> dict:
+        query = {"user_id": user_id, "device_id": device_id}
+        return await self.db.find_one(self.active_sessions, query=query, projection=SessionDAO.SESSION_PROJECTION)
+
+    async def get_active_session_by_Id(self, user_id: ObjectId) -> dict:
+        return await self.db.find_one(self.active_sessions, {"user_id": user_id}, SessionDAO.SESSION_PROJECTION)
+
+    async def find_previous_session(self, user_id: ObjectId, device_id: str) -> dict:
+        return await self.db.find_one(self.active_sessions, {"user_id": user_id, "device_id": device_id},
+                                      SessionDAO.PREVIOUS_SESSION_PROJECTION)
+
+    async def revoked_session(self, user_id: ObjectId, reason: str) -> dict:
+        update_fields = SessionDAO.revoked_session_update(reason)
+        return await self.db.update_with_log(self.active_sessions, query={"user_id": user_id}, update=update_fields, upsert=False, context="Revocar Session")
+
+    async def update_session(self, user_id: ObjectId, token: str, reason: str) -> dict:
+        update_fields = SessionDAO.refreshed_session_update(token, reason)
+        return await self.db.update_with_log(self.active_sessions, query={"user_id": user_id}, update=update_fields, upsert=False, context="Session Cerrada")
+
+    async def has_active_session(self, user_id: ObjectId) -> bool:
+        count = await self.db.count_documents(collection=self.active_sessions, filtro=SessionDAO.active_session_filter(user_id))
+        return count > 0
+
+    async def get_active_sessions_with_user_data(self, filtro_status: str = None) -> list:
+        pipeline = SessionDAO.sessions_with_user_data_pipeline(filtro_status, self.users)
+        return list(await self.db.aggregate(self.active_sessions, pipeline, read_preference=admin_read_preference()))
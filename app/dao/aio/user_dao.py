@@ -0,0 +1,42 @@
+from typing import Optional
+
+from bson import ObjectId
+from icecream import ic
+from pymongo.errors import PyMongoError
+
+from app.dao.user_dao import UserDAO
+from app.model.user import User
+from app.utils.db_mongo import admin_read_preference
+from app.utils.db_mongo_async import AsyncMongoDatabase
+
+
+class AsyncUserDAO:
+    """Contraparte asyncio de UserDAO (mismas consultas)"""
+
+    def __init__(self, db=None):
+        self.db = db or AsyncMongoDatabase()
+        self.users = "users"
+
+    async def find_by_id(self, user_id: str) -> User | None:
+        return await self.find_one(query={"_id": ObjectId(user_id)}, projection={"_id": 0, **UserDAO.USER_FIELDS})
+
+    async def find_by_username(self, username: str) -> Optional[User]:
+        return await self.find_one(query={"username": username}, projection={"_id": 1, **UserDAO.USER_FIELDS})
+
+    async def find_one(self, query: Optional[dict] = None, projection: Optional[dict] = None) -> User | None:
+        try:
+            result = await self.db.find_one(collection=self.users, query=query or {}, projection=projection or {})
+            return User.from_dict(result) if result else None
+        except PyMongoError as e:
+            ic(f"❌ Error en find_one: {e}")
+            return None
+
+    async def count_documents(self, filtro: Optional[dict] = None) -> int:
+        return await self.db.count_documents(self.users, filtro or {}, read_preference=admin_read_preference())
+
+    async def find_blocked(self) -> int:
+        result = await self.db.count_documents(self.users, UserDAO.blocked_filter(), read_preference=admin_read_preference())
+        return result if result else 0
+
+    async def update(self, query: dict, update: dict, upsert: bool = False, context: str = "") -> dict:
+        return await self.db.update_with_log(self.users, query, update, upsert, context=context)
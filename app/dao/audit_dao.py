@@ -1,22 +1,37 @@
 from datetime import datetime, timezone
 
 from icecream import ic
+from pymongo import InsertOne
 
 
 from app.model.audit_session import AuditLog
-from app.utils.db_mongo import MongoDatabase
+from app.utils.db_mongo import MongoDatabase, admin_read_preference
+from app.utils.request_container import provide
 
 
 class AuditLogDAO:
     def __init__(self):
-        self.db = MongoDatabase()
+        self.db = provide(MongoDatabase)
         self.session_audit = "session_audit"
 
     def insert_logs_audit(self, audit_log: AuditLog, context: str = "") -> dict:
         return self.db.insert_with_log(collection=self.session_audit, document=audit_log.to_dict(), context=context)
 
+    def audit_write(self, audit_log: AuditLog) -> tuple[str, type, dict]:
+        """insert_logs_audit como operación de MongoDatabase.bulk_write_with_log"""
+        return self.session_audit, InsertOne, {"document": audit_log.to_dict()}
+
+    def insert_logs_audit_many(self, audit_logs: list[AuditLog], context: str = "") -> dict:
+        return self.db.bulk_write_with_log([self.audit_write(log) for log in audit_logs], context=context)
+
     def get_logs_audit(self, **kwargs) -> dict:
+        pipeline, page, limit = self.logs_audit_pipeline(**kwargs)
+        result = list(self.db.aggregate(self.session_audit, pipeline=pipeline, read_preference=admin_read_preference()))
+        return self.format_logs_audit(result, page, limit)
 
+    # Consultas compartidas con app.dao.aio.audit_dao.AsyncAuditLogDAO
+    @staticmethod
+    def logs_audit_pipeline(**kwargs) -> tuple[list, int, int]:
         user_id = kwargs.get("user_id")
         event_type = kwargs.get("event_type")
         start = kwargs.get("start")
@@ -70,8 +85,10 @@ class AuditLogDAO:
                 }
             }
         ]
+        return pipeline, page, limit
 
-        result = list(self.db.aggregate(self.session_audit, pipeline=pipeline))
+    @staticmethod
+    def format_logs_audit(result: list, page: int, limit: int) -> dict:
         data = result[0] if result else {"data": [], "totalCount": []}
 
         # Convertir timestamps en ISO8601
@@ -89,26 +106,29 @@ class AuditLogDAO:
         }
 
     def insert_event_audit(self, previous_session: dict, **kwargs) -> dict:
-        audit_events = []
-        ip_changed = previous_session.get("ip_address") != kwargs["ip_address"]
-        ua_changed = previous_session.get("user_agent") != kwargs["user_agent"]
-
-        if ip_changed or ua_changed:
-            audit_events = {
-                 "username": kwargs["username"],
-                 "device_id": kwargs["device_id"],
-                 "timestamp": datetime.now(timezone.utc),
-                 "old_ip_address": previous_session.get("ip_address"),
-                 "new_ip_address": kwargs["ip_address"],
-                 "old_user_agent": previous_session.get("user_agent"),
-                 "new_user_agent": kwargs["user_agent"],
-                 "reason": []
-            }
-            if ip_changed:
-                audit_events["reason"].append("ip_changed")
-            if ua_changed:
-                audit_events["reason"].append("user_agent_changed")
-            
-            ic(f"[AUDITORÍA] Cambio sospechoso detectado: {audit_events}") 
-
-        return self.db.insert_with_log(self.session_audit, audit_events,context="Evento Auditoria")
\ No newline at end of file
+        audit_log = self.build_event_audit(previous_session, **kwargs)
+        if audit_log is None:
+            return {"success": True, "message": "Sin cambios que auditar"}
+        return self.insert_logs_audit(audit_log, context="Evento Auditoria")
+
+    @staticmethod
+    def build_event_audit(previous_session: dict, **kwargs) -> AuditLog | None:
+        """
+        Cambio de IP entre la sesión previa del device y el login nuevo, en el formato
+        del validador de session_audit. El cambio de navegador lo audita
+        AuditService.update_session_activity.
+        """
+        if previous_session.get("ip_address") == kwargs["ip_address"]:
+            return None
+        audit_log = AuditLog(
+            session_id=str(previous_session["_id"]),
+            user_id=str(previous_session["user_id"]),
+            event_type="ip_change",
+            old_value=previous_session.get("ip_address") or "",
+            new_value=kwargs["ip_address"] or "",
+            timestamp=datetime.fromisoformat(datetime.now(timezone.utc).isoformat()),
+            ip_address=kwargs["ip_address"],
+            user_agent=kwargs.get("browser")
+        )
+        ic(f"[AUDITORÍA] Cambio de IP detectado: {audit_log.to_dict()}")
+        return audit_log
\ No newline at end of file
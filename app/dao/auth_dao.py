@@ -2,31 +2,53 @@ from datetime import datetime, timedelta, timezone
 
 from bson import SON
 from icecream import ic
+from pymongo import ReturnDocument, UpdateOne
 
 from app.dao.audit_dao import AuditLogDAO
 from app.dao.session_dao import SessionDAO
 from app.utils.db_mongo import MongoDatabase
+from app.utils.request_container import provide
+from app.utils.session_schema import sessions_collection, unified_sessions
+from app.utils.token_digest import token_hash
 
 
 class AuthDao:
+    REFRESH_TOKEN_TTL = timedelta(seconds=360)
+    MAX_REFRESH_ATTEMPTS = 3
+    # Lo que necesita el refresh del documento anterior a la rotación
+    ROTATION_PROJECTION = {
+        "_id": 1,
+        "username": 1,
+        "device_id": 1,
+        "jti": 1,
+        "rol": 1,
+        "epoch": 1,
+        "user_id": 1,
+        "session_id": 1,
+        "browser": 1,
+        "ip_address": 1,
+        "refresh_attempts": 1
+    }
+
     def __init__(self, db=None):
-        self.db = db or MongoDatabase()
-        self.session_dao = SessionDAO()
-        self.audit_dao = AuditLogDAO()
+        self.db = db or provide(MongoDatabase)
+        self.session_dao = provide(SessionDAO)
+        self.audit_dao = provide(AuditLogDAO)
         # Si es mongomock o un Database de pymongo, exponemos la colección
+        self.refresh_tokens = sessions_collection("refresh_tokens")
         if hasattr(self.db, "__getitem__"):
-            self.collection = self.db["refresh_tokens"]
+            self.collection = self.db[self.refresh_tokens]
         else:
             self.collection = None
-        self.refresh_tokens = "refresh_tokens"
   
 
-    def get_active_token_by_user_and_device(self, username: str, device_id: str):
-        now = datetime.now(timezone.utc)
+    # Constructores de consultas compartidos con app.dao.aio.auth_dao.AsyncAuthDao
+    @staticmethod
+    def active_token_pipeline(username: str, device_id: str | None = None, projection: dict | None = None) -> list:
         match_filter = {
             "username": username,
             "revoked_at": None,
-            "expires_at": {"$gt": now}
+            "expires_at": {"$gt": datetime.now(timezone.utc)}
         }
         if device_id:
             match_filter["device_id"] = device_id
@@ -36,6 +58,134 @@ class AuthDao:
             {"$sort": SON([("created_at", -1)])},
             {"$limit": 1}
         ]
+        if projection:
+            pipeline.append({"$project": projection})
+        return pipeline
+
+    @staticmethod
+    def token_in_use_query(username: str) -> tuple[dict, dict]:
+        query = {
+            "username": username,
+            "used_at": {"$ne": None}  # distinto de None => ya usado
+        }
+        projection = {"_id": 1, "username": 1, "device_id": 1, "refresh_token": 1, "jti": 1, "expires_at": 1, "rol": 1, "epoch": 1,
+                      "revoked_at": 1}
+        return query, projection
+
+    @staticmethod
+    def revoke_refresh_token_query(username: str, device_id: str, refresh_token: str) -> tuple[dict, dict]:
+        revoked_at = datetime.fromisoformat(datetime.now(timezone.utc).isoformat())
+        query = {"username": username, "device_id": device_id, "refresh_token_hash": token_hash(refresh_token), "revoked_at": None}
+        update = {"$set": {"revoked_at": revoked_at}}
+        return query, update
+
+    @staticmethod
+    def refresh_token_upsert(**kwargs) -> tuple[dict, dict]:
+        expires_at =  datetime.fromisoformat(datetime.now(timezone.utc).isoformat()) + AuthDao.REFRESH_TOKEN_TTL
+        created_at =  datetime.fromisoformat(datetime.now(timezone.utc).isoformat())
+        update_at =  datetime.fromisoformat(datetime.now(timezone.utc).isoformat())
+        used_at =  datetime.fromisoformat(datetime.now(timezone.utc).isoformat())
+        query = {"username":  kwargs["username"], "device_id":  kwargs["device_id"]}
+        update = {
+            "$set": {
+                "jti": kwargs["jti"],
+                "refresh_token": kwargs["refresh_token"],
+                "refresh_token_hash": token_hash(kwargs["refresh_token"]),
+                "update_at": update_at,
+                "expires_at": expires_at,
+                "revoked_at": None,
+                "refresh_attempts": kwargs["refresh_attempts"],
+                "browser": kwargs["browser"],
+                "os": kwargs["os"],
+                "ip_address": kwargs["ip_address"]
+            },
+            "$setOnInsert": {
+                "username": kwargs["username"],
+                "device_id": kwargs["device_id"],
+                "created_at": created_at,
+                "used_at": used_at
+            }
+        }
+        # Rol y epoch del usuario: los refresh opacos no llevan claims y se reconstruyen desde aquí.
+        # user_id/session_id: el refresh escribe sesión y auditoría sin buscarlas
+        for field in ("rol", "epoch", "user_id", "session_id"):
+            if field in kwargs:
+                update["$set"][field] = kwargs[field]
+        # Esquema unificado: la sesión (UserSession.to_dict) viaja en el mismo documento,
+        # que es también su _id (sin session_id aparte)
+        session = kwargs.get("session")
+        if session:
+            update["$set"].pop("session_id", None)
+            for field, value in session.items():
+                if field not in update["$setOnInsert"] and field not in ("_id", "refresh_token", "refresh_token_hash"):
+                    update["$set"].setdefault(field, value)
+        return query, update
+
+    @staticmethod
+    def rotate_refresh_token_query(refresh_token: str, device_id: str, new_refresh_token: str, expires_at: datetime,
+                                   browser: str, os: str, ip_address: str, min_epoch: int = 0) -> tuple[dict, dict]:
+        """
+        Filtro con todas las condiciones del refresh y la rotación que se aplica si se cumplen.
+        min_epoch: token_epoch vigente del usuario; un refresh anterior al último "revocar todo" no rota.
+        """
+        now = datetime.fromisoformat(datetime.now(timezone.utc).isoformat())
+        query = {
+            "refresh_token_hash": token_hash(refresh_token),
+            "device_id": device_id,
+            "revoked_at": None,
+            "refresh_attempts": {"$lt": AuthDao.MAX_REFRESH_ATTEMPTS},
+            "expires_at": {"$gt": now}
+        }
+        if min_epoch > 0:
+            query["epoch"] = {"$gte": min_epoch}
+        update = {
+            "$set": {
+                "refresh_token": new_refresh_token,
+                "refresh_token_hash": token_hash(new_refresh_token),
+                "update_at": now,
+                "expires_at": expires_at,
+                "browser": browser,
+                "os": os,
+                "ip_address": ip_address
+            },
+            "$inc": {"refresh_attempts": 1}
+        }
+        if unified_sessions():
+            # La sesión es el mismo documento: se actualiza en la misma escritura.
+            # Pipeline para comparar con el navegador anterior; $literal evita leer valores del cliente como rutas
+            update = [{"$set": {
+                **{field: {"$literal": value} for field, value in update["$set"].items()},
+                "refresh_attempts": {"$add": [{"$ifNull": ["$refresh_attempts", 0]}, 1]},
+                "last_refresh_at": {"$literal": now},
+                "is_revoked": False,
+                "status": "active",
+                "reason": {"$cond": [{"$ne": ["$browser", {"$literal": browser}]}, "user_agent_change", "refresh_token"]}
+            }}]
+        return query, update
+
+    def rotate_refresh_token(self, refresh_token: str, device_id: str, new_refresh_token: str, expires_at: datetime,
+                             browser: str, os: str, ip_address: str, min_epoch: int = 0) -> dict | None:
+        """
+        Valida y rota el refresh en un solo paso atómico.
+        Devuelve el documento previo a la rotación, o None si no cumple alguna condición.
+        """
+        query, update = self.rotate_refresh_token_query(refresh_token, device_id, new_refresh_token, expires_at,
+                                                        browser, os, ip_address, min_epoch)
+        if self.collection:
+            return self.collection.find_one_and_update(query, update, projection=self.ROTATION_PROJECTION,
+                                                       return_document=ReturnDocument.BEFORE)
+        return self.db.find_one_and_update(self.refresh_tokens, query, update, projection=self.ROTATION_PROJECTION,
+                                           return_document=ReturnDocument.BEFORE)
+
+    def session_ref_write(self, username: str, device_id: str, user_id, session_id) -> tuple[str, type, dict]:
+        """Completa user_id/session_id en refresh previos a esos campos (para MongoDatabase.bulk_write_with_log)"""
+        return self.refresh_tokens, UpdateOne, {
+            "filter": {"username": username, "device_id": device_id},
+            "update": {"$set": {"user_id": user_id, "session_id": session_id}}
+        }
+
+    def get_active_token_by_user_and_device(self, username: str, device_id: str):
+        pipeline = self.active_token_pipeline(username, device_id)
 
         if self.collection:  # MongoMock o pymongo puro
             result = list(self.collection.aggregate(pipeline))
@@ -43,30 +193,20 @@ class AuthDao:
             result = list(self.db.aggregate(collection=self.refresh_tokens, pipeline=pipeline))
         return result[0] if result else None
 
-    def get_active_token_by_username(self, username: str):
-        now = datetime.fromisoformat(datetime.now(timezone.utc).isoformat())
-        match_filter = {
-            "username": username,
-            "revoked_at": None,
-            "expires_at": {"$gt": now}
-        }
+    ACTIVE_TOKEN_PROJECTION = {
+        "_id": 1,
+        "username": 1,
+        "device_id": 1,
+        "jti": 1,
+        "refresh_token": 1,
+        "created_at": 1,
+        "expires_at": 1,
+        "revoked_at": 1,
+        "used_at": 1   # 👉 incluimos el campo
+    }
 
-        pipeline = [
-            {"$match": match_filter},
-            {"$sort": SON([("created_at", -1)])},
-            {"$limit": 1},
-            {"$project": {
-                "_id": 1,
-                "username": 1,
-                "device_id": 1,
-                "jti": 1,
-                "refresh_token": 1,
-                "created_at": 1,
-                "expires_at": 1,
-                "revoked_at": 1,
-                "used_at": 1   # 👉 incluimos el campo
-            }}
-        ]
+    def get_active_token_by_username(self, username: str):
+        pipeline = self.active_token_pipeline(username, projection=self.ACTIVE_TOKEN_PROJECTION)
 
         if self.collection:  # MongoMock o pymongo puro
             result = list(self.collection.aggregate(pipeline))
@@ -80,14 +220,23 @@ class AuthDao:
         Verifica si algún token de este usuario ya ha sido usado.
         Devuelve True si existe al menos un token con 'used_at' definido.
         """
-        query = {
-            "username": username,
-            "used_at": {"$ne": None}  # distinto de None => ya usado
-        }
-        projection = {"_id": 1, "username": 1, "device_id": 1, "refresh_token": 1, "jti": 1, "expires_at": 1}
+        query, projection = self.token_in_use_query(username)
         token_doc = self.db.find_one(self.refresh_tokens,query=query,projection=projection)
         return token_doc if token_doc else None
 
+    def find_by_jtis(self, jtis: list[str]) -> list[dict]:
+        """Estado (refresh vigente y revocación) de cada jti, en una sola consulta"""
+        query = {"jti": {"$in": jtis}}
+        projection = {"_id": 0, "jti": 1, "refresh_token": 1, "refresh_token_hash": 1, "revoked_at": 1}
+        return self.db.find(self.refresh_tokens, query=query, projection=projection) or []
+
+    def find_by_token_hashes(self, hashes: list[str]) -> list[dict]:
+        """Documentos de varios refresh (por digest), en una sola consulta"""
+        query = {"refresh_token_hash": {"$in": hashes}}
+        projection = {"_id": 0, "username": 1, "device_id": 1, "jti": 1, "rol": 1, "epoch": 1,
+                      "expires_at": 1, "revoked_at": 1, "refresh_token_hash": 1}
+        return self.db.find(self.refresh_tokens, query=query, projection=projection) or []
+
     def revoke_all_tokens_for_user(self, username):
         query = {"username": username, "revoked_at": None}
         update = {"$set": {"revoked_at": datetime.fromisoformat(datetime.now(timezone.utc).isoformat())}}
@@ -126,7 +275,7 @@ class AuthDao:
             "username": username, 
             "device_id": device_id, 
             "jti": jti,
-            "refresh_token": refresh_token,
+            "refresh_token_hash": token_hash(refresh_token),
             "created_at": created_at,
             "expires_at": expires_at,
             "refresh_attempts": refresh_attempts,
@@ -139,7 +288,9 @@ class AuthDao:
             "$set": {
                 "revoked_at": datetime.fromisoformat(datetime.now(timezone.utc).isoformat()),
                 "used_at": datetime.fromisoformat(datetime.now(timezone.utc).isoformat())
-            }
+            },
+            # La consulta va por el digest; un upsert igual guarda el token
+            "$setOnInsert": {"refresh_token": refresh_token}
         }
         if self.collection:
             result = self.collection.update_one(query, update, upsert=upsert)
@@ -148,53 +299,22 @@ class AuthDao:
         return result.modified_count
            
     def revoke_refresh_token(self, username: str, device_id: str, refresh_token: str) -> dict:
-        revoked_at = datetime.fromisoformat(datetime.now(timezone.utc).isoformat())
-        return self.db.update_with_log(self.refresh_tokens,
-            {"username": username, "device_id": device_id, "refresh_token": refresh_token, "revoked_at": None},
-            {
-                "$set": 
-                {
-                    "revoked_at": revoked_at
-                }
-            },upsert=False,context="Revocar Refresh Token"
-        )
+        query, update = self.revoke_refresh_token_query(username, device_id, refresh_token)
+        return self.db.update_with_log(self.refresh_tokens, query, update, upsert=False, context="Revocar Refresh Token")
 
     def update_refresh_token(self, **kwargs) -> dict:
-        expires_at =  datetime.fromisoformat(datetime.now(timezone.utc).isoformat()) + timedelta(seconds=360)
-        created_at =  datetime.fromisoformat(datetime.now(timezone.utc).isoformat())
-        update_at =  datetime.fromisoformat(datetime.now(timezone.utc).isoformat())
-        used_at =  datetime.fromisoformat(datetime.now(timezone.utc).isoformat())
-        return self.db.update_with_log(self.refresh_tokens,
-             {"username":  kwargs["username"], "device_id":  kwargs["device_id"]},
-             {
-                 "$set": {
-                     "jti": kwargs["jti"],
-                     "refresh_token": kwargs["refresh_token"],
-                     "update_at": update_at,
-                     "expires_at": expires_at,
-                     "revoked_at": None,
-                     "refresh_attempts": kwargs["refresh_attempts"],
-                     "browser": kwargs["browser"],
-                     "os": kwargs["os"],
-                     "ip_address": kwargs["ip_address"]
-                 },
-                 "$setOnInsert": {
-                     "username": kwargs["username"],
-                     "device_id": kwargs["device_id"],
-                     "created_at": created_at,
-                     "used_at": used_at
-                 }
-             },
-             upsert=True,
-             context="Upsert Refresh Token"
-         )
+        query, update = self.refresh_token_upsert(**kwargs)
+        return self.db.update_with_log(self.refresh_tokens, query, update, upsert=True, context="Upsert Refresh Token")
 
     def upsert_refresh_token(self, **kwargs) -> dict:
     
         device_id = kwargs["device_id"]
-        username = kwargs["username"]
+        user_id = kwargs.get("user_id")
         # Buscar sesión previa con mismo usuario + dispositivo
-        previous_session = self.session_dao.find_previous_session(username=username,device_id=device_id)
+        # (en el esquema unificado es este mismo documento y la audita el login)
+        previous_session = None
+        if user_id is not None and not unified_sessions():
+            previous_session = self.session_dao.find_previous_session(user_id=user_id, device_id=device_id)
 
         ic(f"[AUDITORÍA] SESSION PREVIOUS: {previous_session}")
 
@@ -1,10 +1,11 @@
 from datetime import datetime, timezone
 
 from app.utils.db_mongo import MongoDatabase
+from app.utils.request_container import provide
 
 class TokenBlacklistDao:
     def __init__(self, db=None):
-        self.db = db or MongoDatabase()
+        self.db = db or provide(MongoDatabase)
         # Si es mongomock o un Database de pymongo, exponemos la colección
         if hasattr(self.db, "__getitem__"):
             self.collection = self.db["token_blacklist"]
@@ -15,6 +16,14 @@ class TokenBlacklistDao:
     def is_token_revoked(self, jti: str) -> bool:
         return self.db.count_documents(self.token_blacklist,{"jti": jti}) > 0
 
+    def find_revoked(self, tokens: list[str], jtis: list[str]) -> list[dict]:
+        """Entradas revocadas de cualquiera de los tokens o jtis (una sola consulta)"""
+        query = {
+            "$or": [{"token": {"$in": tokens}}, {"jti": {"$in": jtis}}],
+            "revoked_at": {"$ne": None}
+        }
+        return self.db.find(self.token_blacklist, query=query, projection={"_id": 0, "token": 1, "jti": 1}) or []
+
     def insert_token(self, token: str, username: str = None, device_id: str = None, reason: str = None) -> bool:
         """
         Inserta un nuevo token.
@@ -34,7 +43,7 @@ class TokenBlacklistDao:
             print(f"Error insertando token: {e}")
             return False
 
-    def revoke_token_blacklist(self, token: str, device_id=None, username=None, reason=None) -> dict:
+    def revoke_token_blacklist(self, token: str, device_id=None, username=None, reason=None, jti=None) -> dict:
         update_fields = {
             "revoked_at": datetime.fromisoformat(datetime.now(timezone.utc).isoformat())
         }
@@ -45,6 +54,8 @@ class TokenBlacklistDao:
             update_fields["device_id"] = device_id
         if username is not None:
             update_fields["username"] = username
+        if jti is not None:
+            update_fields["jti"] = jti  # RevocationSet indexa por jti
 
         return self.db.update_with_log(
             self.token_blacklist,
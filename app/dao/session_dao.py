@@ -2,13 +2,34 @@
 from datetime import datetime, timezone
 
 from bson import ObjectId
-from app.utils.db_mongo import MongoDatabase
+from pymongo import UpdateOne
+from app.utils.db_mongo import MongoDatabase, admin_read_preference
 from app.model.user_session import UserSession
+from app.utils.request_container import provide
+from app.utils.session_schema import sessions_collection
+from app.utils.token_digest import token_hash
 
 class SessionDAO:
+    # Consultas compartidas con app.dao.aio.session_dao.AsyncSessionDAO
+    SESSION_PROJECTION = {
+        "_id": 1,
+        "user_id": 1,
+        "device_id": 1,
+        "ip_address": 1,
+        "browser": 1,
+        "os": 1,
+        "login_at": 1,
+        "last_refresh_at": 1,
+        "refresh_token": 1,
+        "is_revoked": 1,
+        "reason": 1
+    }
+    # Lo que AuditLogDAO.build_event_audit compara con el login nuevo
+    PREVIOUS_SESSION_PROJECTION = {"_id": 1, "user_id": 1, "ip_address": 1, "browser": 1}
+
     def __init__(self,db=None):
-        self.db = db or MongoDatabase()
-        self.active_sessions = "active_sessions"
+        self.db = db or provide(MongoDatabase)
+        self.active_sessions = sessions_collection("active_sessions")
         self.users = "users"
 
     def insert_session(self, session: UserSession) -> dict:
@@ -18,39 +39,15 @@ class SessionDAO:
             "user_id": user_id,
             "device_id": device_id
          }
-        projection = {
-            "_id": 1,
-            "user_id": 1,
-            "device_id": 1,
-            "ip_address": 1,
-            "browser": 1,
-            "os": 1,
-            "login_at": 1,
-            "last_refresh_at": 1,
-            "refresh_token": 1,
-            "is_revoked": 1,
-            "reason": 1
-        }
-        return self.db.find_one(self.active_sessions,query=query,projection=projection)
+        return self.db.find_one(self.active_sessions,query=query,projection=self.SESSION_PROJECTION)
     def get_active_session_by_Id(self, user_id: ObjectId) -> dict:
-       return self.db.find_one(self.active_sessions,{"user_id": user_id},{
-            "_id": 1,
-            "user_id": 1,
-            "device_id": 1,
-            "ip_address": 1,
-            "browser": 1,
-            "os": 1,
-            "login_at": 1,
-            "last_refresh_at": 1,
-            "refresh_token": 1,
-            "is_revoked": 1,
-            "reason": 1
-        })
-    def find_previous_session(self, username: str, device_id: str) -> dict:
-        # Buscar sesión previa con mismo usuario + dispositivo
+       return self.db.find_one(self.active_sessions,{"user_id": user_id},self.SESSION_PROJECTION)
+    def find_previous_session(self, user_id: ObjectId, device_id: str) -> dict:
+        # Buscar sesión previa con mismo usuario + dispositivo (idx_user_device_id)
         return self.db.find_one(
                 self.active_sessions,
-                {"username": username, "device_id":device_id}
+                {"user_id": user_id, "device_id": device_id},
+                self.PREVIOUS_SESSION_PROJECTION
         )
     def device_id_exists(self, device_id: str) -> dict:
         query = {"device_id": device_id}
@@ -63,24 +60,11 @@ class SessionDAO:
         query={
             "user_id": user_id
          }
-        projection = {
-            "_id": 1,
-            "user_id": 1,
-            "device_id": 1,
-            "ip_address": 1,
-            "browser": 1,
-            "os": 1,
-            "login_at": 1,
-            "last_refresh_at": 1,
-            "refresh_token": 1,
-            "is_revoked": 1,
-            "reason": 1
-        }
-        return self.db.find_one(self.active_sessions,query=query,projection=projection)
-    def revoked_session(self, user_id: ObjectId, reason: str):
+        return self.db.find_one(self.active_sessions,query=query,projection=self.SESSION_PROJECTION)
+    @staticmethod
+    def revoked_session_update(reason: str) -> dict:
         revoked_at = datetime.fromisoformat(datetime.now(timezone.utc).isoformat())
-        query={"user_id": user_id}
-        update_fields = {
+        return {
             "$set": {
                 "is_revoked": True,
                 "revoked_at": revoked_at,
@@ -88,21 +72,33 @@ class SessionDAO:
                 "reason": reason
             }
         }
-        return self.db.update_with_log(self.active_sessions,query=query,update=update_fields,upsert=False,context="Revocar Session")
-    def update_session(self, user_id:ObjectId, token: str, reason: str):
+    @staticmethod
+    def refreshed_session_update(token: str, reason: str) -> dict:
         last_refresh_at = datetime.fromisoformat(datetime.now(timezone.utc).isoformat())
-        query={"user_id": user_id}
-        update_fields = {
+        return {
             "$set": {
                 "is_revoked": False,
                 "revoked_at": None,
                 "last_refresh_at": last_refresh_at,
                 "refresh_token": token,
+                "refresh_token_hash": token_hash(token),
                 "status": "active",
                 "reason": reason
 
             }
         }
+    def refresh_activity_write(self, user_id: ObjectId, token: str, ip_address: str, browser: str, reason: str) -> tuple[str, type, dict]:
+        """update_session + update_session_for_audit de un refresh en una sola operación (para bulk_write_with_log)"""
+        update_fields = self.refreshed_session_update(token, reason)
+        update_fields["$set"].update({"ip_address": ip_address, "browser": browser})
+        return self.active_sessions, UpdateOne, {"filter": {"user_id": user_id}, "update": update_fields}
+    def revoked_session(self, user_id: ObjectId, reason: str):
+        query={"user_id": user_id}
+        update_fields = self.revoked_session_update(reason)
+        return self.db.update_with_log(self.active_sessions,query=query,update=update_fields,upsert=False,context="Revocar Session")
+    def update_session(self, user_id:ObjectId, token: str, reason: str):
+        query={"user_id": user_id}
+        update_fields = self.refreshed_session_update(token, reason)
         return self.db.update_with_log(self.active_sessions,query=query,update=update_fields,upsert=False,context="Session Cerrada")
     def update_session_for_audit(self, user_id: ObjectId, ip_address: str, browser: str, reason: str) -> dict:
         last_refresh_at = datetime.fromisoformat(datetime.now(timezone.utc).isoformat())
@@ -116,15 +112,22 @@ class SessionDAO:
             }
         }
         return self.db.update_with_log(self.active_sessions,query=query,update=update_fields,upsert=False,context="Session Actualizada")
-    def has_active_session(self, user_id: ObjectId) -> bool:
-        filtro = {
+    @staticmethod
+    def active_session_filter(user_id: ObjectId) -> dict:
+        return {
             "user_id": user_id,
             "status": "active",
             "is_revoked": False
         }
+    def has_active_session(self, user_id: ObjectId) -> bool:
+        filtro = self.active_session_filter(user_id)
         count = self.db.count_documents(collection=self.active_sessions, filtro=filtro)
         return count > 0
     def get_active_sessions_with_user_data(self, filtro_status: str = None):
+        return list(self.db.aggregate(self.active_sessions,self.sessions_with_user_data_pipeline(filtro_status, self.users),
+                                      read_preference=admin_read_preference()))
+    @staticmethod
+    def sessions_with_user_data_pipeline(filtro_status: str = None, users: str = "users") -> list:
         match_stage = {
             "user_data.rol": {"$ne": "Admin"},
             "revoked_at": None
@@ -138,7 +141,7 @@ class SessionDAO:
         pipeline = [
             {
                 "$lookup": {
-                    "from": self.users,                 # Colección con la que haces join
+                    "from": users,                 # Colección con la que haces join
                     "localField": "user_id",         # Campo en active_sessions
                     "foreignField": "_id",           # Campo en users
                     "as": "user_data"                # Nombre del campo resultante
@@ -170,4 +173,4 @@ class SessionDAO:
                 }
             }
         ]
-        return list(self.db.aggregate(self.active_sessions,pipeline))
\ No newline at end of file
+        return pipeline
\ No newline at end of file
@@ -1,50 +1,45 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
-from datetime import datetime, timezone
-from typing import List, Optional
+from datetime import datetime, timedelta, timezone
+from typing import Iterator, List, Optional
 from bson import ObjectId
 from pymongo.errors import PyMongoError
 from app.model.user import User
 from icecream import ic
 
-from app.utils.db_mongo import MongoDatabase
+from app.config import Config
+from app.utils.db_mongo import MongoDatabase, admin_read_preference
+from app.utils.request_container import provide
 
 
 class UserDAO:
+    # Consultas compartidas con app.dao.aio.user_dao.AsyncUserDAO
+    USER_FIELDS = {
+        "username": 1,
+        "password": 1,
+        "email": 1,
+        "rol": 1,
+        "created_at": 1,
+        "updated_at": 1,
+        "failed_attempts": 1,
+        "blocked_until": 1,
+        "token_epoch": 1
+    }
+
     def __init__(self):
-        self.db = MongoDatabase()
+        self.db = provide(MongoDatabase)
         self.users = "users"
         self.active_sessions = "active_sessions"
 
     def find_by_id(self, user_id: str) -> User | None:
         query = {"_id": ObjectId(user_id)}
-        projection = {
-            "_id": 0,
-            "username": 1,
-            "password": 1,
-            "email": 1,
-            "rol": 1,
-            "created_at": 1,
-            "updated_at": 1,
-            "failed_attempts": 1,
-            "blocked_until": 1
-        }
+        projection = {"_id": 0, **self.USER_FIELDS}
         return self.find_one(query=query, projection=projection) 
    
     def find_by_username(self, username: str) -> Optional[User]:
              
         query = {"username": username}
-        projection = {
-            "_id": 1,
-            "username": 1,
-            "password": 1,
-            "email": 1,
-            "rol": 1,
-            "created_at": 1,
-            "updated_at": 1,
-            "failed_attempts": 1,
-            "blocked_until": 1
-        }
+        projection = {"_id": 1, **self.USER_FIELDS}
 
         return self.find_one(query=query, projection=projection)  # Podés incluir `projection` si extendés el método
     def find_one(self, query: Optional[dict] = None, projection: Optional[dict] = None) -> User | None:
@@ -65,11 +60,7 @@ class UserDAO:
         projection = {"_id": 1}
 
         try:
-            docs = self.db.find(self.users, query, projection) or []
-            # Forzamos a lista si es un cursor
-            if not isinstance(docs, list):
-                docs = list(docs)
-            return [doc["_id"] for doc in docs if "_id" in doc]
+            return [doc["_id"] for doc in self.db.stream(self.users, query, projection) if "_id" in doc]
         except PyMongoError as e:
             ic(f"❌ Error en find_ids_users: {e}")
             raise
@@ -80,30 +71,46 @@ class UserDAO:
         Devuelve una lista de objetos User.
         """
         try:
-            docs = self.db.find(self.users, query, projection) or []
-
-            if not isinstance(docs, list):
-                docs = list(docs)
-
-            return [User.from_dict(doc) for doc in docs]
+            return list(self.iter_all(query, projection))
         except PyMongoError as e:
             ic(f"❌ Error en find_all: {e}")
             raise
 
+    def iter_all(self, query: Optional[dict] = None, projection: Optional[dict] = None, batch_size: Optional[int] = None) -> Iterator[User]:
+        """
+        Itera usuarios en streaming (memoria acotada al tamaño del lote).
+        Sin el maxTimeMS de las lecturas normales: el export recorre toda la colección.
+        """
+        for doc in self.db.stream(self.users, query, projection, sort=[("_id", 1)], batch_size=batch_size,
+                                  max_time_ms=Config.MONGO_EXPORT_MAX_TIME_MS):
+            yield User.from_dict(doc)
+
+    def find_page(self, query: Optional[dict] = None, projection: Optional[dict] = None, page: int = 1, page_size: int = 50) -> dict:
+        """
+        Página de usuarios ordenada por _id; items son objetos User.
+        """
+        result = self.db.find_page(self.users, query, projection, page=page, page_size=page_size, sort=[("_id", 1)])
+        result["items"] = [User.from_dict(doc) for doc in result["items"]]
+        return result
+
     def count_documents(self, filtro: Optional[dict] = None) -> int:
         filtro = filtro or {}
         try:
-            return self.db.count_documents(self.users, filtro)
+            return self.db.count_documents(self.users, filtro, read_preference=admin_read_preference())
         except PyMongoError as e:
             ic(f"Error en find_one: {e}")
             raise
 
+    @staticmethod
+    def blocked_filter() -> dict:
+        return {
+           "blocked_until": { "$gt": datetime.now(timezone.utc) }
+        }
+
     def find_blocked(self) -> int:
         try:
-            query = {
-               "blocked_until": { "$gt": datetime.now(timezone.utc) }
-            }
-            result = self.db.count_documents(self.users,query)
+            query = self.blocked_filter()
+            result = self.db.count_documents(self.users,query, read_preference=admin_read_preference())
             return result if result else 0
         except PyMongoError as e:
             ic(f"Error en find_one: {e}")
@@ -120,4 +127,42 @@ class UserDAO:
 
     def update(self, query: dict, update: dict, upsert: bool = False, context: str = "") -> dict:
         return self.db.update_with_log(self.users, query, update, upsert, context=context)
+
+    @staticmethod
+    def login_attempt_update(username: str, success: bool, max_attempts: int, block_seconds: int) -> tuple[dict, dict | list]:
+        """
+        Filtro (usuario no bloqueado) y update de un intento de login: reset si fue
+        correcto; si no, +1 y, al llegar al máximo, bloqueo y contador a 0.
+        """
+        now = datetime.now(timezone.utc)
+        query = {"username": username, "$or": [{"blocked_until": None}, {"blocked_until": {"$lte": now}}]}
+        if success:
+            return query, {"$set": {"failed_attempts": 0, "blocked_until": None}}
+        reached = {"$gte": ["$failed_attempts", max_attempts]}
+        update = [
+            {"$set": {"failed_attempts": {"$add": [{"$ifNull": ["$failed_attempts", 0]}, 1]}}},
+            {"$set": {
+                "blocked_until": {"$cond": [reached, now + timedelta(seconds=block_seconds), None]},
+                "failed_attempts": {"$cond": [reached, 0, "$failed_attempts"]}
+            }}
+        ]
+        return query, update
+
+    def record_login_attempt(self, username: str, success: bool, max_attempts: int, block_seconds: int) -> Optional[User]:
+        """Contabiliza el intento en una escritura atómica; devuelve el usuario actualizado o None si está bloqueado"""
+        query, update = self.login_attempt_update(username, success, max_attempts, block_seconds)
+        doc = self.db.find_one_and_update(self.users, query, update, projection={"_id": 1, **self.USER_FIELDS})
+        return User.from_dict(doc) if doc else None
+
+    def get_token_epoch(self, username: str) -> int:
+        """Epoch de tokens vigente del usuario (0 si nunca se revocó)"""
+        doc = self.db.find_one(self.users, query={"username": username}, projection={"_id": 0, "token_epoch": 1})
+        return (doc or {}).get("token_epoch", 0)
+
+    def bump_token_epoch(self, username: str) -> Optional[int]:
+        """Incrementa el epoch (revoca todos los tokens del usuario); devuelve el nuevo o None si no existe"""
+        doc = self.db.find_one_and_update(self.users, {"username": username},
+                                          {"$inc": {"token_epoch": 1}, "$currentDate": {"updated_at": True}},
+                                          projection={"token_epoch": 1})
+        return doc.get("token_epoch") if doc else None
         
\ No newline at end of file
@@ -3,16 +3,22 @@
 
 # middlewares/jwt_guard.py
 
+import hmac
 from datetime import datetime, timezone
 from functools import wraps
 from flask import redirect, request, jsonify, g, url_for
 from icecream import ic
 from jwt.exceptions import ExpiredSignatureError, InvalidTokenError
 from pymongo.errors import PyMongoError
+from app.auth.services.auth_service import AuthService
 from app.auth.services.user_service import UserService
 
+from app.config import Config
 from app.model.token_generator import TokenGenerator
 from app.utils.db_manager import DbManager  # Asegúrate que esta clase maneje verificación JWT
+from app.utils.request_container import provide
+from app.utils.revocation_set import RevocationSet
+from app.utils.token_epoch import epoch_is_current
 
 def admin_required(f):
     @wraps(f)
@@ -23,11 +29,13 @@ def admin_required(f):
 
         token = auth_header.replace("Bearer ", "")
         tipo = request.headers.get("X-Token-Type","")
-        tg = TokenGenerator()
+        tg = provide(TokenGenerator)
         decoded = tg.verify_token(token=token,expected_type=tipo)
         if "error" in decoded:
             return jsonify({"msg": decoded.get("error"), "code": decoded.get("code")}), 401
-        us = UserService()
+        if RevocationSet.is_revoked(decoded.get("jti")) or not epoch_is_current(decoded):
+            return jsonify({"msg": "Token revocado", "code": "RevokedToken"}), 401
+        us = provide(UserService)
         username = decoded.get("sub")
         user = us.get_user_by_username(username=username)
         if not user or user.rol != "Admin":
@@ -46,8 +54,8 @@ def jwt_required_global(f):
         if any(request.path.startswith(p) for p in public_paths):
             return f(*args, **kwargs)
         try:
-            dm = DbManager()
-            tg = TokenGenerator()
+            dm = provide(DbManager)
+            tg = provide(TokenGenerator)
             token = dm.exists_token_global()
             if not token:
                 return jsonify({'msg': 'Token no existe'}), 401
@@ -75,8 +83,10 @@ def jwt_required_custom(f):
         if not token:
             return jsonify({"msg": "Token no enviado", "code": "TOKEN_NOT_FOUND"}),401
         try:
-            tg = TokenGenerator()
+            tg = provide(TokenGenerator)
             payload = tg.verify_token(token=token,expected_type=token_type)
+            if isinstance(payload, dict) and (RevocationSet.is_revoked(payload.get("jti")) or not epoch_is_current(payload)):
+                return jsonify({"msg": "Token revocado", "code": "RevokedToken"}), 401
             g.user = payload
         except ExpiredSignatureError:
             return jsonify({"msg": "El token ha expirado"}), 401
@@ -94,11 +104,31 @@ def jwt_required_custom_refresh(f):
             return redirect(url_for('frontend.index') + '?untoken=true')
             # return jsonify({"msg": "Token faltante o inválido"}), 401
         token_refresh = auth.replace("Bearer ", "") if auth.startswith("Bearer ") else None
-        tg = TokenGenerator()
-        payload = tg.verify_token(token=token_refresh,expected_type=tipo)
+        if TokenGenerator.is_opaque(token_refresh):
+            # Refresh opaco: sin firma que verificar, sus claims salen de refresh_tokens
+            payload = provide(AuthService).get_token_payload(token_refresh)
+            if payload is None:
+                return jsonify({"msg": "Token no válido", "code": "InvalidTokenError"}), 401
+        else:
+            tg = provide(TokenGenerator)
+            payload = tg.verify_token(token=token_refresh,expected_type=tipo)
         return f(user=payload,user_token_refresh=token_refresh, *args, **kwargs)
     return decorated_function
 
+def introspection_client_required(f):
+    """Resource servers autenticados con Config.INTROSPECTION_CLIENT_SECRET (Bearer)"""
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        secret = Config.INTROSPECTION_CLIENT_SECRET
+        if not secret:
+            return jsonify({"msg": "Introspección deshabilitada", "code": "INTROSPECTION_DISABLED"}), 404
+        auth = request.headers.get("Authorization", "")
+        presented = auth[len("Bearer "):] if auth.startswith("Bearer ") else ""
+        if not hmac.compare_digest(presented.encode(), secret.encode()):
+            return jsonify({"msg": "🔒 Cliente de introspección no autorizado", "code": "INVALID_CLIENT"}), 401
+        return f(*args, **kwargs)
+    return decorated_function
+
 def log_refresh_attempt(f):
     @wraps(f)
     def wrapper(*args, **kwargs):
@@ -22,14 +22,15 @@ def apply_secure_headers(app):
         response.headers["Access-Control-Allow-Headers"] = "Content-Type, Authorization"
         response.headers["Access-Control-Allow-Methods"] = "GET, POST, PUT, DELETE, OPTIONS"
         ic(f"[REQUEST_PATH] - {request.path}")
-        # Control de caché según tipo de recurso
+        # Control de caché según tipo de recurso; en /.well-known la vista define Cache-Control/ETag (JWKS)
+        well_known = request.path.startswith("/.well-known")
         if request.path.startswith("/static"):
             response.headers['Cache-Control'] = 'public, max-age=3600, immutable'
+        elif not well_known and (request.path.startswith("/api") or response.status_code in (401, 403)): # Opcionalmente puedes agregar más
             # Forzar Connection: close si es API o error crítico
-        elif (request.path.startswith("/api") or response.status_code in (401, 403)): # Opcionalmente puedes agregar más
             # Cierre explícito de conexión HTTP
             response.headers["Connection"] = "close"
-        else:
+        elif not well_known:
             response.headers["Cache-Control"] = "no-store, no-cache, must-revalidate, max-age=0"
             response.headers["Pragma"] = "no-cache"
             response.headers["Expires"] = "0"
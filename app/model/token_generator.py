@@ -1,6 +1,9 @@
+import secrets
 import uuid
+from dataclasses import dataclass
 from datetime import datetime, timedelta, timezone
-from cryptography.hazmat.primitives import serialization
+from functools import lru_cache
+from typing import NamedTuple, Optional
 import jwt
 from jwt.exceptions import (
     DecodeError,
@@ -14,27 +17,95 @@ from icecream import ic
 
 from app.config import Config
 from app.auth.exceptions.auth_exceptions import AuthException
+from app.utils.crypto_executor import CryptoExecutor
+from app.utils.key_ring import KeyRing, key_paths
+from app.utils.token_cache import VerifiedTokenCache
+
+class IssuedTokens(NamedTuple):
+    """Tokens recién firmados y sus claims (tal como los devolvería jwt.decode)"""
+    access_token: str
+    refresh_token: Optional[str]
+    access_claims: dict
+    refresh_claims: Optional[dict]
+
+
+@dataclass(frozen=True)
+class TokenSettings:
+    """Expiraciones y roles de Config, parseados una sola vez por proceso"""
+    access_exp: int
+    access_exp_admin: int
+    refresh_exp: int
+    refresh_exp_admin: int
+    access_exp_global: int
+    valid_roles: tuple
+    roles_scope: dict
+    opaque_refresh: bool
+
+
+@lru_cache(maxsize=None)
+def token_settings() -> TokenSettings:
+    return TokenSettings(
+        access_exp=int(Config.ACCESS_TOKEN_EXP_SECONDS),
+        access_exp_admin=int(Config.ACCESS_TOKEN_EXP_ADMIN),
+        refresh_exp=int(Config.REFRESH_TOKEN_EXP_SECONDS),
+        refresh_exp_admin=int(Config.REFRESH_TOKEN_EXP_ADMIN),
+        access_exp_global=int(Config.ACCESS_TOKEN_GLOBAL_EXP_SECONDS),
+        valid_roles=tuple(Config.VALID_ROLES),
+        roles_scope=Config.ROLE_SCOPES,
+        opaque_refresh=Config.REFRESH_TOKEN_FORMAT == "opaque"
+    )
+
 
 class TokenGenerator:
     def __init__(self):
-        self.access_exp = int(Config.ACCESS_TOKEN_EXP_SECONDS)
-        self.access_exp_admin = int(Config.ACCESS_TOKEN_EXP_ADMIN)
-        self.refresh_exp = int(Config.REFRESH_TOKEN_EXP_SECONDS)
-        self.refresh_exp_admin = int(Config.REFRESH_TOKEN_EXP_ADMIN)
-        self.access_exp_global = int(Config.ACCESS_TOKEN_GLOBAL_EXP_SECONDS)
-        self.valid_roles = Config.VALID_ROLES
-        self.roles_scope = Config.ROLE_SCOPES
-        self.private_key = self._load_key(Config.PATH_PRIVATE_KEY, is_private=True)
-        self.public_key = self._load_key(Config.PATH_PUBLIC_KEY, is_private=False)
-
-    def _load_key(self, path, is_private=False):
-        try:
-            with open(path, "r") as f:
-                content = f.read().encode()
-                return serialization.load_pem_private_key(content, password=None) if is_private else serialization.load_pem_public_key(content)
-        except FileNotFoundError:
-            ic(f"⚠️ Clave {'privada' if is_private else 'pública'} no encontrada en {path}")
-            return None
+        settings = token_settings()
+        self.access_exp = settings.access_exp
+        self.access_exp_admin = settings.access_exp_admin
+        self.refresh_exp = settings.refresh_exp
+        self.refresh_exp_admin = settings.refresh_exp_admin
+        self.access_exp_global = settings.access_exp_global
+        self.valid_roles = settings.valid_roles
+        self.roles_scope = settings.roles_scope
+        self.opaque_refresh = settings.opaque_refresh
+
+    @property
+    def private_key(self):
+        """Clave de firma del KeyRing del proceso (se recarga si cambia el PEM)"""
+        return KeyRing.get(Config.PATH_PRIVATE_KEY, is_private=True)
+
+    @property
+    def public_key(self):
+        """Clave de verificación del KeyRing del proceso"""
+        return KeyRing.get(Config.PATH_PUBLIC_KEY, is_private=False)
+
+    @property
+    def signing_kid(self) -> str:
+        """kid de la clave de firma actual de los access tokens"""
+        return self.signing_kid_for("access")
+
+    def signing_kid_for(self, token_type: str) -> str:
+        private_path, _ = key_paths(Config.JWT_ALGORITHMS[token_type])
+        return KeyRing.kid(private_path, is_private=True)
+
+    def _encode(self, payload: dict, token_type: str) -> str:
+        """Firma con el algoritmo configurado para el tipo de token (Config.JWT_ALGORITHMS)"""
+        algorithm = Config.JWT_ALGORITHMS[token_type]
+        private_path, _ = key_paths(algorithm)
+        private_key = KeyRing.get(private_path, is_private=True)
+        if private_key is None:
+            raise AuthException(f"No hay clave privada configurada para {algorithm}", "MissingSigningKey", 500)
+        return CryptoExecutor.run("jwt_sign", jwt.encode, payload, private_key, algorithm=algorithm,
+                                  headers={"kid": KeyRing.kid(private_path, is_private=True)})
+
+    def _verification_key(self, token: str) -> tuple:
+        """(clave pública, algoritmo) según el kid del token (actual o anterior aún aceptada)"""
+        kid = jwt.get_unverified_header(token).get("kid")
+        if kid is None:
+            return self.public_key, "RS256"  # tokens emitidos antes de usar kid
+        key, algorithm = KeyRing.verification_key(kid)
+        if key is None:
+            raise InvalidTokenError(f"kid desconocido: {kid}")
+        return key, algorithm
 
     def _current_utc(self) -> datetime:
         return datetime.fromisoformat(datetime.now(timezone.utc).isoformat())
@@ -70,9 +141,19 @@ class TokenGenerator:
             "type": token_type
         }
 
-    def create_tokens(self, data: dict) -> tuple[str, str]:
+    @staticmethod
+    def _claims(payload: dict) -> dict:
+        """Claims de un payload propio con las fechas como NumericDate (igual que jwt.decode)"""
+        return {k: int(v.timestamp()) if isinstance(v, datetime) else v for k, v in payload.items()}
+
+    def _issue(self, payload: dict, token_type: str) -> tuple[str, dict]:
+        """Firma el payload y devuelve (token, claims) sin decodificar lo que se acaba de firmar"""
+        return self._encode(payload, token_type), self._claims(payload)
+
+    def create_tokens(self, data: dict) -> IssuedTokens:
         """
-        Genera access_token y refresh_token con el mismo jti
+        Genera access_token y refresh_token con el mismo jti.
+        Devuelve también sus claims para no re-verificar tokens propios.
         """
         if data.get("rol") == "Admin":
             payload_access = self._build_payload(data, "access", self.access_exp_admin)
@@ -82,23 +163,58 @@ class TokenGenerator:
             payload_refresh = self._build_payload(data, "refresh", self.refresh_exp)
 
 
-        return (
-            jwt.encode(payload_access, self.private_key, algorithm="RS256"),
-            jwt.encode(payload_refresh, self.private_key, algorithm="RS256")
-        )
+        access_token, access_claims = self._issue(payload_access, "access")
+        if self.opaque_refresh:
+            # Sin firma: el refresh es un identificador aleatorio y su estado vive en refresh_tokens
+            refresh_token, refresh_claims = self.new_opaque_token(), self._claims(payload_refresh)
+        else:
+            refresh_token, refresh_claims = self._issue(payload_refresh, "refresh")
+        return IssuedTokens(access_token, refresh_token, access_claims, refresh_claims)
+
+    @staticmethod
+    def new_opaque_token() -> str:
+        return secrets.token_urlsafe(32)
+
+    @staticmethod
+    def is_opaque(token: str) -> bool:
+        """True si no tiene forma de JWT (header.payload.firma)"""
+        return token.count(".") != 2
+
+    @staticmethod
+    def stored_refresh_claims(stored: dict) -> dict:
+        """Claims de un refresh opaco a partir de su documento en refresh_tokens"""
+        return {
+            "sub": stored["username"],
+            "username": stored["username"],
+            "rol": stored.get("rol"),
+            "scope": stored.get("scope", "default"),
+            "device_id": stored.get("device_id"),
+            "jti": stored.get("jti"),
+            "epoch": stored.get("epoch", 0),
+            "exp": int(stored["expires_at"].timestamp()),
+            "type": "refresh"
+        }
 
     def refresh_access_token(self, refresh_token: str) -> str:
         """
         Recibe un refresh_token válido y devuelve un nuevo access_token
         con el mismo jti.
         """
-        decoded = self._decode(refresh_token, expected_type="refresh")
+        return self.reissue_access_token(refresh_token).access_token
+
+    def reissue_access_token(self, refresh_token: str, claims: Optional[dict] = None) -> IssuedTokens:
+        """
+        Como refresh_access_token, con los claims del access nuevo y del refresh recibido.
+        claims: los del refresh ya resueltos (obligatorio para refresh opacos).
+        """
+        decoded = claims if claims is not None else self.verify_token(refresh_token, expected_type="refresh")
 
         data = {
             "username": decoded.get("sub"),
             "rol": decoded.get("rol"),
             "scope": decoded.get("scope"),
             "jti": decoded.get("jti"),   # reutilizamos mismo jti
+            "epoch": decoded.get("epoch", 0),
         }
 
         exp_seconds = (
@@ -106,19 +222,20 @@ class TokenGenerator:
         )
 
         payload_access = self._build_payload(data, "access", exp_seconds)
-
-        return jwt.encode(payload_access, self.private_key, algorithm="RS256")
+        access_token, access_claims = self._issue(payload_access, "access")
+        return IssuedTokens(access_token, refresh_token, access_claims, decoded)
 
     def create_tokens_global(self) -> str:
         payload = self._build_global_payload("access", self.access_exp_global)
-        return jwt.encode(payload, self.private_key, algorithm="RS256")
+        return self._encode(payload, "global")
 
     def _decode(self, token: str, expected_type: str = "access", issuer=None, audience=None) -> dict:
         try:
+            key, algorithm = self._verification_key(token)
             decoded = jwt.decode(
                 token,
-                self.public_key,
-                algorithms=["RS256"],
+                key,
+                algorithms=[algorithm],
                 issuer=issuer or Config.JWT_ISSUER,
                 audience=audience or Config.JWT_AUDIENCE
             )
@@ -177,10 +294,11 @@ class TokenGenerator:
 
     def _decode_global(self, token: str, expected_type: str = "access", issuer=None, audience=None) -> dict:
         try:
+            key, algorithm = self._verification_key(token)
             decoded = jwt.decode(
                 token,
-                self.public_key,
-                algorithms=["RS256"],
+                key,
+                algorithms=[algorithm],
                 issuer=issuer or Config.JWT_ISSUER
             )
 
@@ -245,7 +363,13 @@ class TokenGenerator:
         except Exception as e:
             return {"error": f"Error inesperado: {str(e)}"}, 500
     def verify_token(self, token: str, expected_type: str = "access") -> dict:
-        return self._decode(token, expected_type)
+        cached = VerifiedTokenCache.get(token)
+        if cached is not None and cached.get("type") == expected_type:
+            return cached
+        decoded = self._decode(token, expected_type)
+        if isinstance(decoded, dict) and "error" not in decoded:
+            VerifiedTokenCache.put(token, decoded)
+        return decoded
 
     def verify_token_global(self, token: str, expected_type: str = "access") -> dict:
         return self._decode_global(token=token, expected_type=expected_type, issuer="flask-root")
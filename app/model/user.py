@@ -1,7 +1,8 @@
 from datetime import datetime, timezone
 from typing import Optional, Literal
 from bson import ObjectId
-import bcrypt
+
+from app.utils import password_hasher
 
 class User:
     def __init__(
@@ -14,7 +15,8 @@ class User:
         updated_at: Optional[datetime] = None,
         failed_attempts: int = 0,
         blocked_until: Optional[datetime] = None,
-        _id: Optional[ObjectId] = None
+        _id: Optional[ObjectId] = None,
+        token_epoch: int = 0
     ):
         self._id = _id or ObjectId()
         self._username = username
@@ -26,6 +28,7 @@ class User:
         self._updated_at = updated_at or datetime.now(timezone.utc)
         self._failed_attempts = failed_attempts
         self._blocked_until = blocked_until
+        self._token_epoch = token_epoch
 
     # Getter y setter para _id (solo getter porque el id no debería cambiar)
     @property
@@ -109,6 +112,11 @@ class User:
     def blocked_until(self, value: Optional[datetime]):
         self._blocked_until = value
 
+    # token_epoch: los tokens emitidos con un epoch menor ya no son válidos
+    @property
+    def token_epoch(self) -> int:
+        return self._token_epoch
+
     # Métodos que ya tenías (sin cambios salvo usar propiedades internas)
     def to_dict(self) -> dict:
         return {
@@ -120,7 +128,8 @@ class User:
             "created_at": self._created_at,
             "updated_at": self._updated_at,
             "failed_attempts": self._failed_attempts,
-            "blocked_until": self._blocked_until
+            "blocked_until": self._blocked_until,
+            "token_epoch": self._token_epoch
         }
 
     def to_json(self):
@@ -132,6 +141,12 @@ class User:
             d["blocked_until"] = d["blocked_until"].isoformat()
         return d
 
+    def to_public_json(self):
+        """to_json sin el hash de la contraseña (listados de administración)"""
+        d = self.to_json()
+        d.pop("password", None)
+        return d
+
     def is_blocked_now(self) -> bool:
         return self.blocked_until is not None and self.update_timestamp() < self.blocked_until.replace(tzinfo=timezone.utc)
 
@@ -150,13 +165,14 @@ class User:
             updated_at=data.get("updated_at"),
             failed_attempts=data.get("failed_attempts", 0),
             blocked_until=data.get("blocked_until"),
-            _id=data.get("_id")
+            _id=data.get("_id"),
+            token_epoch=data.get("token_epoch", 0)
         )
 
     @staticmethod
     def hash_password(plain_password):
-        return bcrypt.hashpw(plain_password.encode("utf-8"), bcrypt.gensalt()).decode("utf-8")
+        return password_hasher.hash_password(plain_password)
 
     @staticmethod
     def verify_password(plain_password, hashed_password):
-        return bcrypt.checkpw(plain_password.encode("utf-8"), hashed_password.encode("utf-8"))
+        return password_hasher.verify_password(plain_password, hashed_password)
@@ -5,6 +5,8 @@ from datetime import datetime, timezone
 from typing import Optional, Any, Dict
 from bson import ObjectId
 
+from app.utils.token_digest import token_hash
+
 
 class UserSession:
     # Constantes / enums
@@ -222,6 +224,7 @@ class UserSession:
             "login_at": self.login_at,
             "last_refresh_at": self.last_refresh_at,
             "refresh_token": self.refresh_token,
+            "refresh_token_hash": token_hash(self.refresh_token),
             "is_revoked": self.is_revoked,
             "revoked_at": self.revoked_at,
             "reason": self.reason,
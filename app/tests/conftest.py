@@ -0,0 +1,60 @@
+import functools
+
+import pytest
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from mongomock.collection import BulkOperationBuilder
+
+from app.model import token_generator
+from app.utils.key_ring import KeyRing
+from app.utils.token_cache import VerifiedTokenCache
+
+
+def _drop_sort(method):
+    @functools.wraps(method)
+    def wrapper(self, *args, sort=None, **kwargs):
+        return method(self, *args, **kwargs)
+    return wrapper
+
+
+@pytest.fixture(autouse=True, scope="session")
+def mongomock_bulk_write_compat():
+    """pymongo >= 4.9 pasa sort= a las operaciones de bulk_write; mongomock aún no lo acepta"""
+    originals = BulkOperationBuilder.add_update, BulkOperationBuilder.add_replace
+    BulkOperationBuilder.add_update, BulkOperationBuilder.add_replace = map(_drop_sort, originals)
+    yield
+    BulkOperationBuilder.add_update, BulkOperationBuilder.add_replace = originals
+
+
+def _write_key_pair(tmp_path, name="key"):
+    private = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    private_path = tmp_path / f"{name}_private.pem"
+    public_path = tmp_path / f"{name}_public.pem"
+    private_path.write_bytes(private.private_bytes(
+        serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()))
+    public_path.write_bytes(private.public_key().public_bytes(
+        serialization.Encoding.PEM, serialization.PublicFormat.SubjectPublicKeyInfo))
+    return str(private_path), str(public_path)
+
+
+@pytest.fixture
+def write_key_pair():
+    """Escribe un par RSA en PEM; devuelve (privada, pública)"""
+    return _write_key_pair
+
+
+@pytest.fixture
+def key_paths(tmp_path, monkeypatch):
+    private_path, public_path = _write_key_pair(tmp_path)
+    monkeypatch.setattr(token_generator.Config, "PATH_PRIVATE_KEY", private_path)
+    monkeypatch.setattr(token_generator.Config, "PATH_PUBLIC_KEY", public_path)
+    for name in ("ACCESS_TOKEN_EXP_SECONDS", "ACCESS_TOKEN_EXP_ADMIN", "REFRESH_TOKEN_EXP_SECONDS",
+                 "REFRESH_TOKEN_EXP_ADMIN", "ACCESS_TOKEN_GLOBAL_EXP_SECONDS"):
+        monkeypatch.setattr(token_generator.Config, name, "300")
+    token_generator.token_settings.cache_clear()
+    KeyRing.clear()
+    VerifiedTokenCache.clear()
+    yield private_path, public_path
+    token_generator.token_settings.cache_clear()
+    KeyRing.clear()
+    VerifiedTokenCache.clear()
@@ -0,0 +1,74 @@
+import asyncio
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+from bson import ObjectId
+
+from app.dao.aio.auth_dao import AsyncAuthDao
+from app.dao.aio.session_dao import AsyncSessionDAO
+from app.dao.auth_dao import AuthDao
+from app.dao.session_dao import SessionDAO
+
+
+@pytest.fixture
+def async_db():
+    db = MagicMock()
+    db.find_one = AsyncMock(return_value=None)
+    db.aggregate = AsyncMock(return_value=[])
+    db.count_documents = AsyncMock(return_value=1)
+    db.update_with_log = AsyncMock(return_value={"success": True, "modified_count": 1})
+    db.insert_with_log = AsyncMock(return_value={"success": True})
+    return db
+
+
+def _without_dates(pipeline):
+    """Quita el valor de expires_at ($gt now) para comparar pipelines."""
+    match = dict(pipeline[0]["$match"])
+    match.pop("expires_at")
+    return [{"$match": match}, *pipeline[1:]]
+
+
+def test_async_auth_dao_uses_same_pipeline_as_sync(async_db):
+    dao = AsyncAuthDao(db=async_db)
+    asyncio.run(dao.get_active_token_by_user_and_device("neo", "device123"))
+
+    issued = async_db.aggregate.call_args.args[1]
+    expected = AuthDao.active_token_pipeline("neo", "device123")
+    assert _without_dates(issued) == _without_dates(expected)
+
+
+def test_async_session_dao_uses_same_update_as_sync(async_db):
+    dao = AsyncSessionDAO(db=async_db)
+    result = asyncio.run(dao.update_session("user_id", token="token123", reason="refresh_token"))
+
+    assert result["modified_count"] == 1
+    issued = async_db.update_with_log.call_args.kwargs["update"]["$set"]
+    expected = SessionDAO.refreshed_session_update("token123", "refresh_token")["$set"]
+    assert issued.keys() == expected.keys()
+    assert issued["refresh_token"] == "token123"
+
+
+def test_get_login_context_runs_lookups_concurrently(async_db):
+    in_flight = 0
+    peak = 0
+
+    async def slow_lookup(*args, **kwargs):
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.01)
+        in_flight -= 1
+        return None
+
+    async def slow_aggregate(*args, **kwargs):
+        await slow_lookup()
+        return []
+
+    async_db.find_one = AsyncMock(side_effect=slow_lookup)
+    async_db.aggregate = AsyncMock(side_effect=slow_aggregate)
+
+    dao = AsyncAuthDao(db=async_db)
+    context = asyncio.run(dao.get_login_context("neo", "device123", user_id=ObjectId()))
+
+    assert context == {"user": None, "previous_session": None, "active_token": None}
+    assert peak == 3
@@ -22,7 +22,7 @@ def mock_db(monkeypatch):
             self.db[collection].insert_one(document)
             return document
 
-        def aggregate(self, collection, pipeline):
+        def aggregate(self, collection, pipeline, read_preference=None):
             return self.db[collection].aggregate(pipeline)
 
     monkeypatch.setattr("app.dao.audit_dao.MongoDatabase", FakeMongoDB)
@@ -91,6 +91,19 @@ def test_insert_logs_audit(audit_dao, mock_db):
     assert saved is not None
 
 
+def test_insert_event_audit_records_ip_change(audit_dao, mock_db):
+    previous = {"_id": ObjectId(), "user_id": ObjectId(), "ip_address": "10.0.0.1", "browser": "Firefox"}
+
+    audit_dao.insert_event_audit(previous, username="neo", device_id="d1", ip_address="10.0.0.1", browser="Chrome")
+    assert mock_db["session_audit"].count_documents({}) == 0
+
+    audit_dao.insert_event_audit(previous, username="neo", device_id="d1", ip_address="10.0.0.2", browser="Chrome")
+    saved = mock_db["session_audit"].find_one({}, {"_id": 0})
+    # Campos requeridos por el validador de session_audit
+    assert (saved["session_id"], saved["user_id"]) == (str(previous["_id"]), str(previous["user_id"]))
+    assert (saved["event_type"], saved["old_value"], saved["new_value"]) == ("ip_change", "10.0.0.1", "10.0.0.2")
+
+
 def test_get_logs_audit_all(audit_dao, mock_db, sample_logs):
     mock_db["session_audit"].insert_many(sample_logs)
     params = {
@@ -2,6 +2,7 @@ from datetime import datetime, timedelta, timezone
 import mongomock
 import pytest
 from app.dao.auth_dao import AuthDao
+from app.utils.token_digest import token_hash
 
 @pytest.fixture
 def mock_db():
@@ -148,6 +149,7 @@ def test_mark_token_as_used_existing(auth_dao, sample_tokens):
         "device_id": "device123",
         "jti": "jti_1",
         "refresh_token": "rtok123",
+        "refresh_token_hash": token_hash("rtok123"),
         "revoked_at": None,
         "expires_at": now + timedelta(hours=1),
         "created_at": now - timedelta(minutes=10),
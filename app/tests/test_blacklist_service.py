@@ -0,0 +1,27 @@
+from unittest.mock import MagicMock
+
+import jwt
+import pytest
+
+from app.auth.services.blacklist_service import TokenBlacklistService
+from app.utils.revocation_set import RevocationSet
+
+
+@pytest.fixture
+def service():
+    RevocationSet.clear()
+    svc = TokenBlacklistService.__new__(TokenBlacklistService)
+    svc.blacklist_dao = MagicMock()
+    yield svc
+    RevocationSet.clear()
+
+
+@pytest.mark.parametrize("success", [True, False])
+def test_jti_is_added_only_after_the_blacklist_write(service, success):
+    token = jwt.encode({"jti": "jti_1"}, "k" * 32, algorithm="HS256")
+    service.blacklist_dao.revoke_token_blacklist.return_value = {"success": success}
+
+    result = service.revoke_token_blacklist(token, device_id="d1", username="neo", reason="logout")
+
+    assert result["success"] is success
+    assert RevocationSet.is_revoked("jti_1") is success
@@ -0,0 +1,75 @@
+import threading
+import time
+
+import pytest
+
+from app.auth.exceptions.auth_exceptions import AuthException
+from app.utils import crypto_executor
+from app.utils.crypto_executor import CryptoExecutor
+
+
+@pytest.fixture(autouse=True)
+def fresh_executor(monkeypatch):
+    monkeypatch.setattr(crypto_executor.Config, "CRYPTO_EXECUTOR", "threads")
+    monkeypatch.setattr(crypto_executor.Config, "CRYPTO_MAX_CONCURRENCY", 2)
+    monkeypatch.setattr(crypto_executor.Config, "CRYPTO_MAX_QUEUE", 0)
+    CryptoExecutor.reset()
+    yield
+    CryptoExecutor.reset()
+
+
+def test_runs_in_worker_thread_and_records_metrics():
+    caller = threading.current_thread().name
+
+    assert CryptoExecutor.run("op", lambda: threading.current_thread().name) != caller
+
+    stats = CryptoExecutor.stats()
+    assert stats["mode"] == "threads"
+    assert stats["operations"]["op"]["run"]["count"] == 1
+    assert stats["operations"]["op"]["wait"]["count"] == 1
+    assert (stats["in_flight"], stats["queued"]) == (0, 0)
+
+
+def test_exceptions_propagate_and_count_as_failures():
+    def boom():
+        raise ValueError("x")
+
+    with pytest.raises(ValueError):
+        CryptoExecutor.run("op", boom)
+
+    assert CryptoExecutor.stats()["operations"]["op"]["run"]["failures"] == 1
+
+
+def test_concurrency_is_capped():
+    running, peak = [0], [0]
+    lock = threading.Lock()
+
+    def work():
+        with lock:
+            running[0] += 1
+            peak[0] = max(peak[0], running[0])
+        time.sleep(0.05)
+        with lock:
+            running[0] -= 1
+
+    callers = [threading.Thread(target=CryptoExecutor.run, args=("op", work)) for _ in range(6)]
+    for t in callers:
+        t.start()
+    for t in callers:
+        t.join()
+
+    stats = CryptoExecutor.stats()
+    assert peak[0] == 2
+    assert stats["max_queued"] >= 2
+    assert stats["operations"]["op"]["wait"]["max_ms"] >= 40
+
+
+def test_full_queue_is_rejected(monkeypatch):
+    monkeypatch.setattr(crypto_executor.Config, "CRYPTO_MAX_QUEUE", 1)
+    monkeypatch.setattr(CryptoExecutor, "queued", 1)
+
+    with pytest.raises(AuthException) as exc:
+        CryptoExecutor.run("op", lambda: None)
+
+    assert exc.value.status == 503
+    assert CryptoExecutor.rejected == 1
@@ -0,0 +1,157 @@
+from unittest.mock import MagicMock
+
+import pytest
+
+from app.utils import db_mongo
+from pymongo.write_concern import WriteConcern
+
+from app.utils.db_mongo import MongoClientRegistry, MongoDatabase, read_preference_for, write_concern_for
+
+
+@pytest.fixture
+def fake_client_factory(monkeypatch):
+    """Sustituye MongoClient para no abrir conexiones reales."""
+    factory = MagicMock(side_effect=lambda *args, **kwargs: MagicMock(name="MongoClient"))
+    monkeypatch.setattr(db_mongo, "MongoClient", factory)
+    monkeypatch.setattr(MongoClientRegistry, "_clients", {})
+    return factory
+
+
+def test_registry_shares_client_between_instances(fake_client_factory):
+    first = MongoDatabase()
+    second = MongoDatabase()
+
+    assert first.client is second.client
+    assert fake_client_factory.call_count == 1
+
+
+def test_warmup_opens_a_connection(fake_client_factory):
+    MongoClientRegistry.warmup()
+
+    client = MongoClientRegistry.get_client()
+    client.admin.command.assert_called_once_with("ping")
+
+
+def test_registry_applies_pool_options(fake_client_factory, monkeypatch):
+    monkeypatch.setattr(db_mongo.Config, "MONGO_MAX_POOL_SIZE", 42)
+    MongoClientRegistry.get_client("mongodb://pool-test")
+
+    kwargs = fake_client_factory.call_args.kwargs
+    assert kwargs["maxPoolSize"] == 42
+    assert "minPoolSize" in kwargs
+    assert "maxIdleTimeMS" in kwargs
+
+
+def test_registry_resets_after_fork(fake_client_factory, monkeypatch):
+    parent = MongoClientRegistry.get_client("mongodb://fork-test")
+    monkeypatch.setattr(MongoClientRegistry, "_pid", -1)  # simula un proceso hijo
+
+    child = MongoClientRegistry.get_client("mongodb://fork-test")
+
+    assert child is not parent
+    assert fake_client_factory.call_count == 2
+
+
+def test_close_does_not_close_shared_client(fake_client_factory):
+    dao_db = MongoDatabase()
+    client = dao_db.client
+    dao_db.close()
+
+    client.close.assert_not_called()
+    assert MongoDatabase().client is client
+
+
+def test_insert_with_log_skips_transaction_by_default(fake_client_factory):
+    db = MongoDatabase()
+    result = db.insert_with_log("session_audit", {"user_id": "neo"}, context="test")
+
+    assert result["success"] is True
+    db.client.start_session.assert_not_called()
+    db._write_collection("session_audit").insert_one.assert_called_once_with({"user_id": "neo"}, session=None)
+
+
+def test_update_with_log_uses_transaction_when_requested(fake_client_factory):
+    db = MongoDatabase()
+    session = db.client.start_session.return_value.__enter__.return_value
+
+    result = db.update_with_log("users", {"username": "neo"}, {"$set": {"failed_attempts": 0}}, upsert=False, transactional=True)
+
+    assert result["success"] is True
+    session.start_transaction.assert_called_once()
+    db._write_collection("users").update_one.assert_called_once_with(
+        {"username": "neo"}, {"$set": {"failed_attempts": 0}}, False, session=session
+    )
+
+
+def test_write_concern_profiles_per_collection(fake_client_factory):
+    db = MongoDatabase()
+    db.insert_with_log("refresh_tokens", {"jti": "jti_1"})
+    db.insert_with_log("session_audit", {"user_id": "neo"})
+
+    concerns = [c.kwargs["write_concern"] for c in db.db.get_collection.call_args_list]
+    assert concerns == [WriteConcern(w="majority", j=True), WriteConcern(w=1, j=False)]
+
+
+def test_collection_without_profile_uses_client_default(fake_client_factory):
+    db = MongoDatabase()
+    assert write_concern_for("sin_perfil") is None
+    assert db._write_collection("sin_perfil") is db.db["sin_perfil"]
+
+
+def test_stream_yields_lazily_and_closes_cursor(fake_client_factory):
+    db = MongoDatabase()
+    cursor = MagicMock()
+    cursor.__iter__.return_value = iter([{"_id": 1}, {"_id": 2}])
+    db.db["users"].find.return_value = cursor
+
+    docs = db.stream("users", {"role": "user"}, batch_size=10)
+    cursor.close.assert_not_called()  # el generador aún no se ha consumido
+    assert list(docs) == [{"_id": 1}, {"_id": 2}]
+
+    kwargs = db.db["users"].find.call_args.kwargs
+    assert kwargs["batch_size"] == 10
+    assert kwargs["max_time_ms"] == db_mongo.Config.MONGO_MAX_TIME_MS
+    cursor.close.assert_called_once()
+
+    cursor.__iter__.return_value = iter([])
+    list(db.stream("users", max_time_ms=0))  # 0 = sin límite (export, carga de revocaciones)
+    assert db.db["users"].find.call_args.kwargs["max_time_ms"] is None
+
+
+def test_find_page_requests_one_extra_document(fake_client_factory):
+    db = MongoDatabase()
+    cursor = MagicMock()
+    cursor.__iter__.return_value = iter([{"_id": i} for i in range(3)])
+    db.db["users"].find.return_value = cursor
+
+    page = db.find_page("users", page=2, page_size=2)
+
+    kwargs = db.db["users"].find.call_args.kwargs
+    assert (kwargs["skip"], kwargs["limit"]) == (2, 3)
+    assert page["items"] == [{"_id": 0}, {"_id": 1}]
+    assert page["has_next"] is True
+
+
+def test_read_preference_for_builds_mode_with_staleness_and_tags():
+    pref = read_preference_for("secondaryPreferred", 90, "workload:analytics")
+
+    assert pref.mongos_mode == "secondaryPreferred"
+    assert pref.max_staleness == 90
+    assert pref.tag_sets == [{"workload": "analytics"}, {}]
+    assert read_preference_for("primary").mongos_mode == "primary"
+    with pytest.raises(ValueError):
+        read_preference_for("cualquiera")
+
+
+def test_reads_default_to_primary_and_admin_reads_are_routed(fake_client_factory):
+    db = MongoDatabase()
+    db.count_documents("users", {"username": "neo"})
+    db.db.get_collection.assert_not_called()
+
+    pref = read_preference_for("secondaryPreferred", 90)
+    db.aggregate("session_audit", [], read_preference=pref)
+    assert db.db.get_collection.call_args.kwargs["read_preference"] is pref
+
+    db.db.get_collection.reset_mock()
+    db.aggregate("session_audit", [], transactional=True, read_preference=pref)
+    db.db.get_collection.assert_not_called()  # las transacciones leen del primario
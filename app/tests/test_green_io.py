@@ -0,0 +1,27 @@
+import sys
+
+import pytest
+from eventlet import patcher
+
+from app.utils.green_io import ensure_green_io, green_io_problems
+
+
+def test_refuses_unpatched_process(monkeypatch):
+    monkeypatch.setattr(patcher, "is_monkey_patched", lambda name: name != "socket")
+
+    with pytest.raises(RuntimeError, match="'socket' no está parcheado"):
+        ensure_green_io()
+
+
+def test_reports_modules_imported_before_patch(monkeypatch):
+    monkeypatch.setattr(patcher, "is_monkey_patched", lambda name: True)
+
+    problems = green_io_problems(preloaded={"pymongo"})
+    assert any("pymongo" in p for p in problems)
+
+
+def test_accepts_fully_patched_process(monkeypatch):
+    monkeypatch.setattr(patcher, "is_monkey_patched", lambda name: True)
+    monkeypatch.delitem(sys.modules, "dns.query", raising=False)
+
+    ensure_green_io()
@@ -0,0 +1,85 @@
+from datetime import datetime, timezone
+from unittest.mock import MagicMock
+
+import pytest
+from flask import Flask
+
+from app.auth.services.introspection_service import IntrospectionService
+from app.backend import routes
+from app.model.token_generator import TokenGenerator
+from app.utils.token_cache import IntrospectionCache
+from app.utils.token_digest import token_hash
+from app.utils.token_epoch import TokenEpochCache
+
+
+@pytest.fixture
+def service(key_paths):
+    IntrospectionCache.clear()
+    svc = IntrospectionService.__new__(IntrospectionService)
+    svc.tg = TokenGenerator()
+    svc.auth_dao = MagicMock()
+    svc.blacklist_dao = MagicMock()
+    svc.blacklist_dao.find_revoked.return_value = []
+    svc.user_dao = MagicMock()
+    svc.user_dao.get_token_epoch.return_value = 0
+    TokenEpochCache.clear()
+    yield svc
+    IntrospectionCache.clear()
+
+
+def _issue(tg, jti, username="neo"):
+    return tg.create_tokens({"username": username, "rol": "User", "device_id": "d1", "jti": jti})
+
+
+def test_batch_results_in_order_with_one_revocation_query(service):
+    first, second = _issue(service.tg, "jti_1"), _issue(service.tg, "jti_2")
+    service.auth_dao.find_by_jtis.return_value = [
+        {"jti": "jti_1", "refresh_token_hash": token_hash(first.refresh_token), "revoked_at": None},
+        {"jti": "jti_2", "refresh_token": "rotado", "revoked_at": datetime.now(timezone.utc)},
+    ]
+
+    results = service.introspect([first.access_token, "basura", second.access_token, first.refresh_token])
+
+    assert [r["active"] for r in results] == [True, False, False, True]
+    assert results[0]["jti"] == "jti_1" and results[0]["token_type"] == "access"
+    assert results[3]["token_type"] == "refresh"
+    service.blacklist_dao.find_revoked.assert_called_once()
+    service.auth_dao.find_by_jtis.assert_called_once()
+
+
+def test_rotated_refresh_and_blacklisted_tokens_are_inactive(service):
+    issued = _issue(service.tg, "jti_1")
+    service.auth_dao.find_by_jtis.return_value = [{"jti": "jti_1", "refresh_token": "otro", "revoked_at": None}]
+    service.blacklist_dao.find_revoked.return_value = [{"token": issued.access_token}]
+
+    assert service.introspect([issued.access_token, issued.refresh_token]) == [{"active": False}, {"active": False}]
+
+
+def test_results_are_cached(service):
+    issued = _issue(service.tg, "jti_1")
+    service.auth_dao.find_by_jtis.return_value = []
+
+    service.introspect([issued.access_token])
+    service.introspect([issued.access_token])
+
+    assert service.auth_dao.find_by_jtis.call_count == 1
+
+
+def test_endpoint_requires_client_secret(monkeypatch):
+    app = Flask(__name__)
+    app.register_blueprint(routes.backend_bp, url_prefix="/api")
+    client = app.test_client()
+    service = MagicMock()
+    service.introspect.return_value = [{"active": False}, {"active": False}]
+    monkeypatch.setattr(routes, "IntrospectionService", lambda: service)
+
+    monkeypatch.setattr(routes.Config, "INTROSPECTION_CLIENT_SECRET", None)
+    assert client.post("/api/auth/introspect", json={"token": "x"}).status_code == 404
+
+    monkeypatch.setattr(routes.Config, "INTROSPECTION_CLIENT_SECRET", "s3cret")
+    assert client.post("/api/auth/introspect", json={"token": "x"}).status_code == 401
+
+    headers = {"Authorization": "Bearer s3cret"}
+    response = client.post("/api/auth/introspect", json={"tokens": ["a", "b"]}, headers=headers)
+    assert response.get_json() == {"results": [{"active": False}, {"active": False}]}
+    assert client.post("/api/auth/introspect", json={"tokens": []}, headers=headers).status_code == 400
@@ -0,0 +1,145 @@
+import os
+from unittest.mock import MagicMock
+
+import jwt
+import pytest
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import ed25519
+from flask import Flask
+
+from app.auth.exceptions.auth_exceptions import AuthException
+from app.backend.routes_wellknown import wellknown_bp
+from app.model import token_generator
+from app.model.token_generator import TokenGenerator
+from app.utils.key_ring import KeyRing
+from app.utils.token_cache import VerifiedTokenCache
+
+
+def test_keys_are_parsed_once_per_process(key_paths):
+    loads = KeyRing.loads
+    first, second = TokenGenerator(), TokenGenerator()
+
+    access = first.create_tokens({"username": "neo", "rol": "User", "jti": "jti_1"}).access_token
+    decoded = second.verify_token(access)
+
+    assert decoded["sub"] == "neo"
+    assert first.private_key is second.private_key
+    assert KeyRing.loads - loads == 2  # una privada + una pública
+
+
+def test_key_is_reloaded_when_pem_changes(key_paths, write_key_pair, tmp_path, monkeypatch):
+    monkeypatch.setattr(token_generator.Config, "JWT_KEY_RELOAD_CHECK_SECONDS", 0)
+    private_path, _ = key_paths
+    before = KeyRing.get(private_path, is_private=True)
+
+    new_private, _ = write_key_pair(tmp_path, "rotated")
+    os.replace(new_private, private_path)
+    os.utime(private_path, ns=(0, os.stat(private_path).st_mtime_ns + 1_000_000))
+
+    after = KeyRing.get(private_path, is_private=True)
+    assert after is not before
+    assert KeyRing.get(private_path, is_private=True) is after
+
+
+def test_missing_key_returns_none(tmp_path):
+    assert KeyRing.get(str(tmp_path / "no_existe.pem")) is None
+
+
+def test_tokens_carry_kid_and_previous_keys_still_verify(key_paths, write_key_pair, tmp_path, monkeypatch):
+    monkeypatch.setattr(token_generator.Config, "JWT_KEY_RELOAD_CHECK_SECONDS", 0)
+    previous_dir = tmp_path / "previous"
+    previous_dir.mkdir()
+    monkeypatch.setattr(token_generator.Config, "JWT_PREVIOUS_KEYS_DIR", str(previous_dir))
+    private_path, public_path = key_paths
+    tg = TokenGenerator()
+    old_access = tg.create_tokens({"username": "neo", "rol": "User", "jti": "jti_1"}).access_token
+    old_kid = tg.signing_kid
+    assert jwt.get_unverified_header(old_access)["kid"] == old_kid
+
+    # Rotación: la pública actual pasa al directorio de anteriores y se escribe un par nuevo
+    os.replace(public_path, previous_dir / "old_public.pem")
+    new_private, new_public = write_key_pair(tmp_path, "rotated")
+    os.replace(new_private, private_path)
+    os.replace(new_public, public_path)
+
+    new_access = tg.create_tokens({"username": "neo", "rol": "User", "jti": "jti_2"}).access_token
+    assert jwt.get_unverified_header(new_access)["kid"] != old_kid
+    assert tg.verify_token(old_access)["jti"] == "jti_1"
+    assert tg.verify_token(new_access)["jti"] == "jti_2"
+    assert set(KeyRing.verification_keys()) == {old_kid, tg.signing_kid}
+
+
+def test_unknown_kid_is_rejected(key_paths):
+    tg = TokenGenerator()
+    forged = jwt.encode({"sub": "neo", "type": "access"}, tg.private_key, algorithm="RS256", headers={"kid": "otro"})
+    with pytest.raises(AuthException):
+        tg.verify_token(forged)
+
+
+def test_jwks_endpoint_is_cacheable(key_paths):
+    app = Flask(__name__)
+    app.register_blueprint(wellknown_bp)
+    client = app.test_client()
+
+    response = client.get("/.well-known/jwks.json")
+    [key] = response.get_json()["keys"]
+    assert key["kid"] == TokenGenerator().signing_kid
+    assert {"kty", "n", "e", "alg", "use"} <= key.keys()
+    assert "max-age" in response.headers["Cache-Control"]
+
+    cached = client.get("/.well-known/jwks.json", headers={"If-None-Match": response.headers["ETag"]})
+    assert cached.status_code == 304
+
+
+def test_algorithm_per_token_type_and_multi_algorithm_verification(key_paths, tmp_path, monkeypatch):
+    ed_private = ed25519.Ed25519PrivateKey.generate()
+    ed_private_path, ed_public_path = tmp_path / "ed_private.pem", tmp_path / "ed_public.pem"
+    ed_private_path.write_bytes(ed_private.private_bytes(
+        serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()))
+    ed_public_path.write_bytes(ed_private.public_key().public_bytes(
+        serialization.Encoding.PEM, serialization.PublicFormat.SubjectPublicKeyInfo))
+    monkeypatch.setattr(token_generator.Config, "PATH_PRIVATE_KEY_EDDSA", str(ed_private_path))
+    monkeypatch.setattr(token_generator.Config, "PATH_PUBLIC_KEY_EDDSA", str(ed_public_path))
+    monkeypatch.setitem(token_generator.Config.JWT_ALGORITHMS, "access", "EdDSA")
+
+    tg = TokenGenerator()
+    access, refresh, _, _ = tg.create_tokens({"username": "neo", "rol": "User", "jti": "jti_1"})
+
+    assert jwt.get_unverified_header(access)["alg"] == "EdDSA"
+    assert jwt.get_unverified_header(refresh)["alg"] == "RS256"
+    assert tg.verify_token(access)["jti"] == "jti_1"
+    assert tg.verify_token(refresh, expected_type="refresh")["jti"] == "jti_1"
+
+    # Un algoritmo retirado de JWT_ACCEPTED_ALGORITHMS deja de verificarse
+    VerifiedTokenCache.clear()
+    monkeypatch.setattr(token_generator.Config, "JWT_ACCEPTED_ALGORITHMS", ["RS256"])
+    with pytest.raises(AuthException):
+        tg.verify_token(access)
+
+
+def test_verify_token_uses_verified_token_cache(key_paths, monkeypatch):
+    tg = TokenGenerator()
+    access = tg.create_tokens({"username": "neo", "rol": "User", "jti": "jti_1"}).access_token
+    decode = MagicMock(wraps=tg._decode)
+    monkeypatch.setattr(tg, "_decode", decode)
+
+    first = tg.verify_token(access)
+    first["mutated"] = True  # el llamador recibe una copia
+    second = tg.verify_token(access)
+
+    assert decode.call_count == 1
+    assert "mutated" not in second
+    error, _ = tg.verify_token(access, expected_type="refresh")  # el tipo se sigue validando
+    assert "error" in error
+
+
+def test_create_tokens_returns_issued_claims(key_paths):
+    tg = TokenGenerator()
+    issued = tg.create_tokens({"username": "neo", "rol": "User", "device_id": "d1", "jti": "jti_1"})
+
+    assert issued.access_claims == tg.verify_token(issued.access_token)
+    assert issued.refresh_claims == tg.verify_token(issued.refresh_token, expected_type="refresh")
+
+    reissued = tg.reissue_access_token(issued.refresh_token)
+    assert reissued.refresh_token == issued.refresh_token
+    assert reissued.access_claims == tg.verify_token(reissued.access_token)
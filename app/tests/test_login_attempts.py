@@ -0,0 +1,54 @@
+import logging
+from datetime import datetime, timedelta, timezone
+from unittest.mock import MagicMock
+
+import mongomock
+import pytest
+
+from app.auth.services.user_service import UserService
+from app.dao.user_dao import UserDAO
+from app.model.user import User
+from app.utils.db_mongo import MongoDatabase
+
+
+@pytest.fixture
+def user_dao():
+    db = MongoDatabase.__new__(MongoDatabase)
+    db.client = mongomock.MongoClient(tz_aware=True, tzinfo=timezone.utc)
+    db.db, db.logger = db.client["mdbManageToken"], logging.getLogger("test")
+    dao = UserDAO.__new__(UserDAO)
+    dao.db, dao.users = db, "users"
+    db.db.users.insert_one({"username": "neo", "password": "x", "rol": "User", "failed_attempts": 0, "blocked_until": None})
+    return dao
+
+
+def test_failed_attempts_increment_then_block(user_dao):
+    assert user_dao.record_login_attempt("neo", False, 3, 120).failed_attempts == 1
+    assert user_dao.record_login_attempt("neo", False, 3, 120).failed_attempts == 2
+
+    blocked = user_dao.record_login_attempt("neo", False, 3, 120)
+    assert blocked.failed_attempts == 0 and blocked.is_blocked_now()
+    # Bloqueado: ni fallos ni logins correctos modifican el documento
+    assert user_dao.record_login_attempt("neo", True, 3, 120) is None
+    assert user_dao.record_login_attempt("neo", False, 3, 120) is None
+
+
+def test_success_resets_and_expired_block_is_ignored(user_dao):
+    user_dao.db.db.users.update_one({"username": "neo"}, {"$set": {
+        "failed_attempts": 2, "blocked_until": datetime.now(timezone.utc) - timedelta(seconds=1)}})
+
+    user = user_dao.record_login_attempt("neo", True, 3, 120)
+
+    assert (user.failed_attempts, user.blocked_until) == (0, None)
+
+
+def test_clean_successful_login_skips_the_write():
+    service = UserService.__new__(UserService)
+    service.MAX_ATTEMPTS, service.BLOCK_TIME_SECONDS, service.user_dao = 3, 120, MagicMock()
+    user = User(username="neo", password="x", rol="User")
+
+    assert service.register_login_attempt(user, success=True) is user
+    service.user_dao.record_login_attempt.assert_not_called()
+
+    service.register_login_attempt(user, success=False)
+    service.user_dao.record_login_attempt.assert_called_once_with("neo", False, 3, 120)
@@ -0,0 +1,82 @@
+import logging
+from datetime import datetime, timezone
+
+import mongomock
+import pytest
+from flask import jsonify
+
+from app.benchmarks.bench_refresh_modes import USER_AGENT, build_app
+from app.midleware.jwt_guard import jwt_required_custom
+from app.model.user import User
+from app.utils import crypto_executor
+from app.utils.crypto_executor import CryptoExecutor
+from app.utils.db_mongo import MongoDatabase
+from app.utils.revocation_set import RevocationSet
+from app.utils.token_epoch import TokenEpochCache
+
+PASSWORD = "secreto"
+
+
+@pytest.fixture
+def client(key_paths):
+    RevocationSet.clear()
+    TokenEpochCache.clear()
+    MongoDatabase._client_bulk_write = None
+    db = MongoDatabase.__new__(MongoDatabase)
+    db.logger = logging.getLogger("test")
+    db.client = mongomock.MongoClient(tz_aware=True, tzinfo=timezone.utc)
+    db.db = db.client["mdbManageToken"]
+    now = datetime.now(timezone.utc)
+    db.db.users.insert_one({"username": "neo@example.com", "email": "neo@example.com", "rol": "User",
+                            "password": User.hash_password(PASSWORD), "created_at": now, "updated_at": now,
+                            "failed_attempts": 0, "blocked_until": None, "token_epoch": 0})
+    app = build_app(db)
+
+    @app.route("/protegido")
+    @jwt_required_custom
+    def protegido(payload):
+        return jsonify({"jti": payload["jti"]})
+
+    yield app.test_client()
+    RevocationSet.clear()
+    TokenEpochCache.clear()
+    MongoDatabase._client_bulk_write = None
+
+
+def _login(client):
+    response = client.post("/api/auth/acceso", json={"username": "neo@example.com", "password": PASSWORD,
+                                                     "device": "d1", "rol": "User", "user_agent": USER_AGENT})
+    assert response.status_code == 200, response.get_json()
+    return response.get_json()
+
+
+def _access(client, tokens):
+    return client.get("/protegido", headers={"Authorization": f"Bearer {tokens['access_token']}",
+                                             "X-Token-Type": "access"})
+
+
+def test_relogin_after_logout_issues_a_new_jti(client):
+    first = _login(client)
+    assert _access(client, first).status_code == 200
+
+    response = client.post("/api/auth/logout", headers={"Authorization": f"Bearer {first['refresh_token']}",
+                                                        "X-Token-Type": "refresh"},
+                           json={"access_token": first["access_token"], "refresh_token": first["refresh_token"],
+                                 "device_id": "d1", "reason": "logout", "user_agent": USER_AGENT})
+    assert response.status_code == 200, response.get_json()
+    assert _access(client, first).get_json()["code"] == "RevokedToken"
+
+    second = _login(client)
+    assert second["refresh_token"] != first["refresh_token"]
+    assert _access(client, second).status_code == 200
+
+
+def test_full_crypto_queue_answers_503(client, monkeypatch):
+    monkeypatch.setattr(crypto_executor.Config, "CRYPTO_MAX_QUEUE", 1)
+    monkeypatch.setattr(CryptoExecutor, "queued", 1)
+
+    response = client.post("/api/auth/acceso", json={"username": "neo@example.com", "password": PASSWORD,
+                                                     "device": "d1", "rol": "User", "user_agent": USER_AGENT})
+
+    assert response.status_code == 503
+    assert response.get_json()["code"] == "CryptoQueueFull"
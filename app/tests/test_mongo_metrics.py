@@ -0,0 +1,62 @@
+from types import SimpleNamespace
+
+from flask import Flask
+
+from app.utils.mongo_metrics import CommandMetrics
+
+
+def _event(command_name, command=None, request_id=1, duration_micros=0, reply=None):
+    return SimpleNamespace(
+        command_name=command_name,
+        command=command or {},
+        connection_id=("localhost", 27017),
+        request_id=request_id,
+        duration_micros=duration_micros,
+        reply=reply or {}
+    )
+
+
+def test_metrics_grouped_by_endpoint_collection_and_command():
+    metrics = CommandMetrics()
+    app = Flask(__name__)
+    app.add_url_rule("/api/auth/refresh", endpoint="backend_bp.refresh", view_func=lambda: "", methods=["POST"])
+
+    with app.test_request_context("/api/auth/refresh", method="POST"):
+        metrics.started(_event("find", {"find": "refresh_tokens"}, request_id=1))
+        metrics.succeeded(_event("find", request_id=1, duration_micros=3000,
+                                 reply={"cursor": {"firstBatch": [{}, {}]}}))
+        metrics.started(_event("insert", {"insert": "session_audit"}, request_id=2))
+        metrics.failed(_event("insert", request_id=2, duration_micros=40000))
+
+    snapshot = metrics.snapshot(endpoint="backend_bp.refresh")
+
+    assert [(s["collection"], s["command"]) for s in snapshot] == [("session_audit", "insert"), ("refresh_tokens", "find")]
+    insert, find = snapshot
+    assert insert["failures"] == 1 and insert["buckets"]["le_50"] == 1
+    assert find["documents"] == 2 and find["p50_ms"] == 5.0
+
+
+def test_get_more_uses_collection_field_and_reset_clears():
+    metrics = CommandMetrics()
+    metrics.started(_event("getMore", {"getMore": 123, "collection": "users"}))
+    metrics.succeeded(_event("getMore", duration_micros=500, reply={"cursor": {"nextBatch": [{}]}}))
+
+    [stats] = metrics.snapshot()
+    assert (stats["endpoint"], stats["collection"], stats["documents"]) == ("-", "users", 1)
+    assert "users.getMore" in metrics.log_line()
+
+    metrics.reset()
+    assert metrics.snapshot() == []
+
+
+def test_unmatched_urls_share_one_endpoint_key():
+    metrics = CommandMetrics()
+    app = Flask(__name__)
+
+    for path in ("/wp-login.php", "/.env"):
+        with app.test_request_context(path):
+            metrics.started(_event("find", {"find": "users"}))
+            metrics.succeeded(_event("find", duration_micros=100))
+
+    [stats] = metrics.snapshot()
+    assert (stats["endpoint"], stats["count"]) == ("-", 2)
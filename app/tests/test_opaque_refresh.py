@@ -0,0 +1,81 @@
+from datetime import datetime, timedelta, timezone
+from unittest.mock import MagicMock
+
+import pytest
+
+from app.auth.services.auth_service import AuthService
+from app.auth.services.introspection_service import IntrospectionService
+from app.dao.auth_dao import AuthDao
+from app.model.token_generator import TokenGenerator
+from app.utils.token_cache import IntrospectionCache
+from app.utils.token_digest import token_hash
+from app.utils.token_epoch import TokenEpochCache
+
+
+@pytest.fixture
+def tg(key_paths):
+    generator = TokenGenerator()
+    generator.opaque_refresh = True
+    return generator
+
+
+def _stored(refresh_token, **overrides):
+    doc = {"username": "neo", "device_id": "d1", "jti": "jti_1", "rol": "User", "epoch": 2,
+           "refresh_token": refresh_token, "refresh_token_hash": token_hash(refresh_token),
+           "expires_at": datetime.now(timezone.utc) + timedelta(minutes=6), "revoked_at": None}
+    doc.update(overrides)
+    return doc
+
+
+def test_opaque_refresh_is_random_and_access_stays_jwt(tg):
+    issued = tg.create_tokens({"username": "neo", "rol": "User", "device_id": "d1", "jti": "jti_1"})
+    again = tg.create_tokens({"username": "neo", "rol": "User", "device_id": "d1", "jti": "jti_1"})
+
+    assert TokenGenerator.is_opaque(issued.refresh_token) and issued.refresh_token != again.refresh_token
+    assert not TokenGenerator.is_opaque(issued.access_token)
+    assert issued.refresh_claims["type"] == "refresh" and issued.refresh_claims["jti"] == "jti_1"
+
+
+def test_auth_service_resolves_opaque_refresh_from_stored_document(tg):
+    refresh = tg.create_tokens({"username": "neo", "rol": "User", "device_id": "d1", "jti": "jti_1"}).refresh_token
+    service = AuthService.__new__(AuthService)
+    service.gt, service.dm = tg, MagicMock()
+    service.dm.get_refresh_token.return_value = _stored(refresh)
+
+    payload = service.get_token_payload(refresh)
+    assert (payload["sub"], payload["jti"], payload["rol"], payload["epoch"]) == ("neo", "jti_1", "User", 2)
+    assert AuthService.token_epoch_of(_stored(refresh)) == 2
+
+    reissued = service.reissue_access_token(refresh, _stored(refresh))
+    assert tg.verify_token(reissued.access_token)["jti"] == "jti_1"
+    assert reissued.access_claims["epoch"] == 2
+
+    service.dm.get_refresh_token.return_value = None
+    assert service.get_token_payload(refresh) is None
+
+
+def test_upsert_stores_role_and_epoch_only_when_given():
+    base = dict(username="neo", device_id="d1", jti="j1", refresh_token="r", refresh_attempts=0,
+                browser=None, os=None, ip_address=None)
+    assert "rol" not in AuthDao.refresh_token_upsert(**base)[1]["$set"]
+    update = AuthDao.refresh_token_upsert(**base, rol="User", epoch=3)[1]["$set"]
+    assert (update["rol"], update["epoch"]) == ("User", 3)
+
+
+def test_introspection_resolves_opaque_refresh_by_digest(tg):
+    IntrospectionCache.clear()
+    TokenEpochCache.clear()
+    refresh = tg.create_tokens({"username": "neo", "rol": "User", "device_id": "d1", "jti": "jti_1"}).refresh_token
+    service = IntrospectionService.__new__(IntrospectionService)
+    service.tg, service.auth_dao, service.blacklist_dao, service.user_dao = tg, MagicMock(), MagicMock(), MagicMock()
+    service.blacklist_dao.find_revoked.return_value = []
+    service.user_dao.get_token_epoch.return_value = 2
+    service.auth_dao.find_by_token_hashes.return_value = [_stored(refresh)]
+    service.auth_dao.find_by_jtis.return_value = [_stored(refresh)]
+
+    results = service.introspect([refresh, "desconocido"])
+
+    assert results[0]["active"] and results[0]["token_type"] == "refresh" and results[0]["sub"] == "neo"
+    assert results[1] == {"active": False}
+    service.auth_dao.find_by_token_hashes.assert_called_once()
+    IntrospectionCache.clear()
@@ -0,0 +1,56 @@
+from unittest.mock import MagicMock
+
+import pytest
+
+from app.auth.services.user_service import UserService
+from app.benchmarks import calibrate_password_hasher
+from app.model.user import User
+from app.utils import password_hasher
+from app.utils.password_hasher import BcryptHasher
+
+
+@pytest.fixture(autouse=True)
+def fast_bcrypt(monkeypatch):
+    monkeypatch.setattr(password_hasher.Config, "PASSWORD_HASHER", "bcrypt")
+    monkeypatch.setattr(password_hasher.Config, "PASSWORD_BCRYPT_ROUNDS", 5)
+    monkeypatch.setattr(password_hasher.Config, "PASSWORD_REHASH_ON_LOGIN", True)
+    password_hasher.password_hasher.cache_clear()
+    yield
+    password_hasher.password_hasher.cache_clear()
+
+
+def test_bcrypt_rounds_and_rehash_detection():
+    hashed = User.hash_password("secreto")
+
+    assert hashed.startswith("$2b$05$")
+    assert User.verify_password("secreto", hashed)
+    assert not User.verify_password("otro", hashed)
+    assert not password_hasher.needs_rehash(hashed)
+    assert password_hasher.needs_rehash(BcryptHasher(rounds=4).hash("secreto"))
+    assert not User.verify_password("secreto", "no-es-un-hash")
+
+
+def test_login_rehashes_outdated_hash():
+    old_hash = BcryptHasher(rounds=4).hash("secreto")
+    user = User(username="neo", password=old_hash, rol="User")
+    user_dao = MagicMock()
+    user_dao.find_by_username.return_value = user
+    user_dao.update.return_value = {"success": True}
+    service = UserService.__new__(UserService)
+    service.user_dao = user_dao
+
+    assert service.authenticate_user("neo", "secreto") is user
+
+    query, update = user_dao.update.call_args.args
+    assert query["password"] == old_hash  # solo si nadie cambió la contraseña entretanto
+    assert update["$set"]["password"].startswith("$2b$05$")
+    assert user.password == update["$set"]["password"]
+
+
+def test_calibration_picks_largest_cost_under_budget(monkeypatch):
+    monkeypatch.setattr(calibrate_password_hasher, "measure", lambda hasher, samples=3: 2 ** hasher.rounds / 100)
+
+    result = calibrate_password_hasher.calibrate_bcrypt(target_ms=50)
+
+    assert result["params"] == {"rounds": 12}  # 2^12/100 = 41 ms; 13 rondas = 82 ms
+    assert calibrate_password_hasher.env_lines(result) == ["PASSWORD_HASHER=bcrypt", "PASSWORD_BCRYPT_ROUNDS=12"]
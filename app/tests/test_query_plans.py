@@ -0,0 +1,55 @@
+import os
+from datetime import timezone
+
+import pytest
+from pymongo import MongoClient
+from pymongo.errors import PyMongoError
+
+from app.benchmarks.query_plans import (ALLOWED_FULL_SCANS, capture_shapes, explain, plan_problems, plan_summary,
+                                        prepare_database)
+from app.utils.db_create import INDEXES
+
+SHAPES = capture_shapes()
+
+
+@pytest.fixture(scope="module")
+def plan_db():
+    """Base temporal en un mongod local (MONGO_EXPLAIN_URI, ej. mongodb://localhost:27017)"""
+    uri = os.getenv("MONGO_EXPLAIN_URI")
+    if not uri:
+        pytest.skip("MONGO_EXPLAIN_URI no definido: se omiten los explain()")
+    client = MongoClient(uri, serverSelectionTimeoutMS=2000, tz_aware=True, tzinfo=timezone.utc)
+    try:
+        client.admin.command("ping")
+    except PyMongoError as e:
+        pytest.skip(f"mongod no disponible: {e}")
+    name = f"query_plans_{os.getpid()}"
+    yield prepare_database(client, name)
+    client.drop_database(name)
+    client.close()
+
+
+def test_every_dao_query_targets_an_indexed_collection():
+    assert SHAPES
+    assert {shape.collection for shape in SHAPES} <= INDEXES.keys()
+
+
+def test_plan_problems_flags_collscan_and_key_ratio():
+    assert plan_problems({"stages": ["FETCH", "IXSCAN"], "keys_examined": 3, "docs_examined": 3, "returned": 3}) == []
+    assert plan_problems({"stages": ["COLLSCAN"], "keys_examined": 0, "docs_examined": 5, "returned": 1}) == ["COLLSCAN"]
+    problems = plan_problems({"stages": ["IXSCAN"], "keys_examined": 500, "docs_examined": 0, "returned": 1})
+    assert problems == ["keys_examined=500 para 1 devueltos"]
+
+
+def test_expected_indexes_exist(plan_db):
+    for collection, indexes in INDEXES.items():
+        names = set(plan_db[collection].index_information())
+        assert {index.document["name"] for index in indexes} <= names
+
+
+@pytest.mark.parametrize("shape", SHAPES, ids=[shape.name for shape in SHAPES])
+def test_query_plan_uses_index(plan_db, shape):
+    if shape.name.split("#")[0] in ALLOWED_FULL_SCANS:
+        pytest.skip(ALLOWED_FULL_SCANS[shape.name.split("#")[0]])
+    summary = plan_summary(explain(plan_db, shape))
+    assert plan_problems(summary) == [], summary
@@ -0,0 +1,203 @@
+import logging
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+import mongomock
+import pytest
+from bson import ObjectId
+from pymongo import InsertOne
+from pymongo.errors import InvalidOperation
+
+from app.auth.exceptions.auth_exceptions import AuthException
+from app.auth.services.audit_service import AuditService
+from app.auth.services.refresh_service import RefreshService
+from app.dao.audit_dao import AuditLogDAO
+from app.dao.auth_dao import AuthDao
+from app.dao.session_dao import SessionDAO
+from app.model.token_generator import TokenGenerator
+from app.utils.db_mongo import MongoDatabase
+from app.utils.token_digest import token_hash
+from app.utils.token_epoch import TokenEpochCache
+
+
+@pytest.fixture
+def mock_db():
+    return mongomock.MongoClient(tz_aware=True, tzinfo=timezone.utc)["mdbManageToken"]
+
+
+@pytest.fixture
+def auth_dao(mock_db):
+    dao = AuthDao()
+    dao.db = mock_db
+    dao.collection = mock_db["refresh_tokens"]
+    return dao
+
+
+@pytest.fixture
+def database(mock_db):
+    db = MongoDatabase.__new__(MongoDatabase)
+    db.client, db.db, db.logger = mock_db.client, mock_db, logging.getLogger("test")
+    MongoDatabase._client_bulk_write = None
+    yield db
+    MongoDatabase._client_bulk_write = None
+
+
+def _stored(refresh_token="rtok", **overrides):
+    doc = {"username": "neo", "device_id": "d1", "jti": "jti_1", "rol": "User", "epoch": 0,
+           "refresh_token": refresh_token, "refresh_token_hash": token_hash(refresh_token), "refresh_attempts": 0,
+           "expires_at": datetime.now(timezone.utc) + timedelta(minutes=6), "revoked_at": None,
+           "browser": "Firefox", "ip_address": "10.0.0.1", "user_id": ObjectId(), "session_id": ObjectId()}
+    doc.update(overrides)
+    return doc
+
+
+def _rotate(auth_dao, device_id="d1"):
+    expires_at = datetime.now(timezone.utc) + AuthDao.REFRESH_TOKEN_TTL
+    return auth_dao.rotate_refresh_token("rtok", device_id, "rtok-2", expires_at, "Chrome", "Linux", "10.0.0.2")
+
+
+def test_rotate_refresh_token_validates_and_rotates_in_one_step(auth_dao):
+    auth_dao.collection.insert_one(_stored())
+
+    previous = _rotate(auth_dao)
+
+    assert previous["browser"] == "Firefox" and previous["refresh_attempts"] == 0
+    doc = auth_dao.collection.find_one({"username": "neo"})
+    assert doc["refresh_token_hash"] == token_hash("rtok-2") and doc["refresh_attempts"] == 1
+    assert doc["browser"] == "Chrome"
+    assert _rotate(auth_dao) is None  # el refresh anterior ya no coincide
+
+
+@pytest.mark.parametrize("overrides, device_id", [
+    ({}, "otro"),
+    ({"revoked_at": datetime.now(timezone.utc)}, "d1"),
+    ({"refresh_attempts": AuthDao.MAX_REFRESH_ATTEMPTS}, "d1"),
+    ({"expires_at": datetime.now(timezone.utc) - timedelta(seconds=1)}, "d1"),
+])
+def test_rotate_refresh_token_rejects_without_writing(auth_dao, overrides, device_id):
+    auth_dao.collection.insert_one(_stored(**overrides))
+
+    assert _rotate(auth_dao, device_id) is None
+    assert auth_dao.collection.find_one({"username": "neo"})["refresh_token_hash"] == token_hash("rtok")
+
+
+def test_bulk_write_falls_back_to_one_bulk_per_collection(database):
+    user_id = ObjectId()
+    database.db.active_sessions.insert_one({"user_id": user_id, "browser": "Firefox"})
+    session = {"_id": ObjectId(), "user_id": user_id, "browser": "Firefox", "ip_address": "10.0.0.1"}
+    service = AuditService.__new__(AuditService)
+    service.session_dao, service.audit_log_dao = SessionDAO(db=database), AuditLogDAO.__new__(AuditLogDAO)
+    service.audit_log_dao.session_audit = "session_audit"
+
+    writes = service.refresh_activity_writes(session, "rtok-2", "10.0.0.2", "Chrome")
+    result = database.bulk_write_with_log(writes, context="test")
+
+    assert result["success"] and result["round_trips"] == 2
+    assert (result["inserted_count"], result["modified_count"]) == (2, 1)
+    stored = database.db.active_sessions.find_one({"user_id": user_id})
+    assert (stored["browser"], stored["reason"], stored["refresh_token_hash"]) == ("Chrome", "user_agent_change", token_hash("rtok-2"))
+    assert {e["event_type"] for e in database.db.session_audit.find()} == {"user_agent_change", "refresh_token"}
+
+
+def test_bulk_write_uses_client_bulk_write_when_supported(database):
+    class Client:
+        def __init__(self, error=None):
+            self.error, self.calls = error, []
+
+        def bulk_write(self, models, write_concern=None):
+            self.calls.append(models)
+            if self.error:
+                raise self.error
+            return SimpleNamespace(inserted_count=1, modified_count=0)
+
+    database.client = Client()
+    result = database.bulk_write_with_log([("session_audit", InsertOne, {"document": {"x": 1}})])
+    assert result["round_trips"] == 1 and MongoDatabase._client_bulk_write is True
+
+    MongoDatabase._client_bulk_write = None
+    database.client = Client(InvalidOperation("MongoClient.bulk_write requires MongoDB server version 8.0+."))
+    result = database.bulk_write_with_log([("session_audit", InsertOne, {"document": {"x": 1}})])
+    assert result["success"] and result["round_trips"] == 1 and MongoDatabase._client_bulk_write is False
+    assert database.db.session_audit.count_documents({}) == 1
+
+
+@pytest.fixture
+def service(key_paths):
+    TokenEpochCache.clear()
+    tg = TokenGenerator()
+    tg.opaque_refresh = True
+    svc = RefreshService.__new__(RefreshService)
+    svc.tg = tg
+    svc.auth_dao, svc.user_dao, svc.session_dao, svc.audit_service, svc.dm, svc.db = (MagicMock() for _ in range(6))
+    svc.user_dao.get_token_epoch.return_value = 0
+    svc.audit_service.refresh_activity_writes.return_value = [("session_audit", None, {})]
+    svc.db.bulk_write_with_log.return_value = {"success": True}
+    yield svc
+    TokenEpochCache.clear()
+
+
+def test_refresh_service_rotates_with_two_round_trips(service):
+    service.auth_dao.rotate_refresh_token.return_value = _stored()
+    service.dm.get_refresh_token.return_value = _stored()  # refresh opaco: usuario y epoch por digest
+
+    issued = service.rotate("rtok", "d1", "Chrome", "Linux", "10.0.0.2")
+
+    assert TokenGenerator.is_opaque(issued.refresh_token) and issued.refresh_token != "rtok"
+    assert service.tg.verify_token(issued.access_token)["jti"] == "jti_1"
+    assert issued.refresh_claims["sub"] == "neo"
+    service.db.bulk_write_with_log.assert_called_once()
+    service.dm.get_refresh_token.assert_called_once()
+    service.user_dao.find_by_username.assert_not_called()
+
+
+def test_refresh_service_backfills_session_reference_for_legacy_tokens(service):
+    service.auth_dao.rotate_refresh_token.return_value = _stored(user_id=None, session_id=None)
+    service.dm.get_refresh_token.return_value = _stored()
+    service.user_dao.find_by_username.return_value = SimpleNamespace(id=str(ObjectId()))
+    service.session_dao.get_active_session_by_Id.return_value = {"_id": ObjectId(), "user_id": ObjectId()}
+
+    service.rotate("rtok", "d1", "Chrome", "Linux", "10.0.0.2")
+
+    service.auth_dao.session_ref_write.assert_called_once()
+    assert len(service.db.bulk_write_with_log.call_args.args[0]) == 2
+
+
+@pytest.mark.parametrize("stored, code, status", [
+    (None, "InvalidTokenError", 401),
+    (_stored(device_id="otro"), "DeviceMismatch", 403),
+    (_stored(revoked_at=datetime.now(timezone.utc)), "RevokedToken", 401),
+    (_stored(refresh_attempts=3), "MaxAttemptsExceeded", 403),
+    (_stored(expires_at=datetime.now(timezone.utc)), "Expired", 401),
+])
+def test_refresh_service_explains_rejection(service, stored, code, status):
+    service.auth_dao.rotate_refresh_token.return_value = None
+    service.dm.get_refresh_token.return_value = stored
+
+    with pytest.raises(AuthException) as exc:
+        service.rotate("rtok", "d1", "Chrome", "Linux", "10.0.0.2")
+
+    assert (exc.value.code, exc.value.status) == (code, status)
+    service.db.bulk_write_with_log.assert_not_called()
+
+
+@pytest.mark.parametrize("opaque", [True, False])
+def test_refresh_service_rejects_stale_epoch_without_rotating(service, opaque):
+    service.tg.opaque_refresh = opaque
+    refresh_token = "rtok" if opaque else service.tg.create_tokens(
+        {"username": "neo", "rol": "User", "device_id": "d1", "jti": "jti_1", "epoch": 0}).refresh_token
+    service.dm.get_refresh_token.return_value = _stored(refresh_token)
+    service.user_dao.get_token_epoch.return_value = 1
+
+    with pytest.raises(AuthException) as exc:
+        service.rotate(refresh_token, "d1", "Chrome", "Linux", "10.0.0.2")
+    assert exc.value.code == "RevokedToken"
+    service.auth_dao.rotate_refresh_token.assert_not_called()
+
+
+def test_rotation_filter_requires_current_epoch(auth_dao):
+    auth_dao.collection.insert_one(_stored(epoch=0))
+    expires_at = datetime.now(timezone.utc) + AuthDao.REFRESH_TOKEN_TTL
+
+    assert auth_dao.rotate_refresh_token("rtok", "d1", "rtok-2", expires_at, "Chrome", "Linux", "10.0.0.2", min_epoch=1) is None
+    assert auth_dao.collection.find_one({"username": "neo"})["refresh_attempts"] == 0
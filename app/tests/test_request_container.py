@@ -0,0 +1,43 @@
+from unittest.mock import MagicMock
+
+import pytest
+from flask import Flask, g
+
+from app.auth.services.session_service import SessionService
+from app.auth.services.user_service import UserService
+from app.utils import db_mongo
+from app.utils.db_mongo import MongoClientRegistry
+from app.utils.request_container import provide
+
+
+@pytest.fixture
+def app(monkeypatch):
+    monkeypatch.setattr(db_mongo, "MongoClient", MagicMock())
+    monkeypatch.setattr(MongoClientRegistry, "_clients", {})
+    return Flask(__name__)
+
+
+def test_each_object_is_built_once_per_request(app):
+    with app.test_request_context("/api/auth/acceso"):
+        user_service = provide(UserService)
+        # UserService -> AuthDao -> (SessionDAO, AuditLogDAO), UserDAO y un MongoDatabase compartido
+        assert g.container.built == {
+            "UserService": 1, "AuthDao": 1, "SessionDAO": 1,
+            "AuditLogDAO": 1, "UserDAO": 1, "MongoDatabase": 1
+        }
+
+        assert provide(UserService) is user_service
+        session_service = provide(SessionService)
+        assert session_service.session_dao is user_service.auth_dao.session_dao
+        assert g.container.constructed == 7
+
+
+def test_requests_do_not_share_instances(app):
+    with app.test_request_context("/"):
+        first = provide(UserService)
+    with app.test_request_context("/"):
+        assert provide(UserService) is not first
+
+
+def test_outside_request_builds_new_instances(app):
+    assert provide(SessionService) is not provide(SessionService)
@@ -0,0 +1,138 @@
+import time
+from datetime import datetime, timedelta, timezone
+
+import jwt
+import mongomock
+import pytest
+from flask import Flask, jsonify
+from pymongo.errors import AutoReconnect
+
+from app.midleware.jwt_guard import jwt_required_custom
+from app.model.token_generator import TokenGenerator
+from app.utils import revocation_set
+from app.utils.revocation_set import BloomFilter, RevocationSet
+from app.utils.token_epoch import TokenEpochCache
+
+
+class StreamingDB:
+    """Expone stream() de MongoDatabase sobre una base mongomock"""
+
+    def __init__(self, db):
+        self.db = db
+
+    def stream(self, collection, query=None, projection=None, max_time_ms=None):
+        return iter(self.db[collection].find(query or {}, projection))
+
+
+@pytest.fixture(autouse=True)
+def empty_set(monkeypatch):
+    monkeypatch.setattr(revocation_set.Config, "REVOCATION_BLOOM_CAPACITY", 4)
+    RevocationSet.clear()
+    yield
+    RevocationSet.clear()
+
+
+def test_bloom_filter_has_no_false_negatives():
+    bloom = BloomFilter(1000, 0.01)
+    for i in range(1000):
+        bloom.add(f"jti-{i}")
+
+    assert all(f"jti-{i}" in bloom for i in range(1000))
+    assert sum(f"otro-{i}" in bloom for i in range(1000)) < 50
+
+
+def test_set_grows_past_bloom_capacity():
+    RevocationSet.add_many(f"jti-{i}" for i in range(10))
+
+    assert all(RevocationSet.is_revoked(f"jti-{i}") for i in range(10))
+    assert not RevocationSet.is_revoked("jti-vigente")
+    assert RevocationSet.stats()["bloom_capacity"] >= 10
+
+
+def test_bootstrap_and_change_events():
+    db = mongomock.MongoClient().db
+    now = datetime.now(timezone.utc)
+    legacy = jwt.encode({"jti": "jti_3"}, "k" * 32, algorithm="HS256")  # entradas antiguas: solo el token
+    db.token_blacklist.insert_many([
+        {"token": "t1", "jti": "jti_1", "revoked_at": now},
+        {"token": "t2", "jti": "jti_2", "revoked_at": None},
+        {"token": legacy, "revoked_at": now},
+        {"token": "no-es-jwt", "revoked_at": now},
+    ])
+
+    assert RevocationSet.bootstrap(StreamingDB(db)) == 2
+    assert RevocationSet.ready and RevocationSet.is_revoked("jti_1") and RevocationSet.is_revoked("jti_3")
+    assert not RevocationSet.is_revoked("jti_2")
+
+    RevocationSet.apply_change({"operationType": "update", "fullDocument": {"token": "t2", "jti": "jti_2", "revoked_at": now}})
+    assert RevocationSet.is_revoked("jti_2")
+
+
+def test_guard_rejects_revoked_jti_without_querying(key_paths):
+    app = Flask(__name__)
+
+    @app.route("/protegido")
+    @jwt_required_custom
+    def protegido(payload):
+        return jsonify({"sub": payload["sub"]})
+
+    access = TokenGenerator().create_tokens({"username": "neo", "rol": "User", "jti": "jti_1"}).access_token
+    TokenEpochCache.set("neo", 0)
+    client = app.test_client()
+    headers = {"Authorization": f"Bearer {access}", "X-Token-Type": "access"}
+
+    assert client.get("/protegido", headers=headers).status_code == 200
+    RevocationSet.add("jti_1")
+    response = client.get("/protegido", headers=headers)
+    assert response.status_code == 401
+    assert response.get_json()["code"] == "RevokedToken"
+
+
+def test_poll_survives_transient_mongo_errors():
+    db = mongomock.MongoClient().db
+    streaming = StreamingDB(db)
+    calls = {"n": 0}
+
+    def flaky_stream(collection, query=None, projection=None, **kwargs):
+        calls["n"] += 1
+        if calls["n"] == 2:
+            raise AutoReconnect("primario no disponible")
+        return StreamingDB.stream(streaming, collection, query, projection, **kwargs)
+
+    streaming.stream = flaky_stream
+
+    class Stop(Exception):
+        pass
+
+    class FakeSocketIO:
+        sleeps = 0
+
+        def sleep(self, seconds):
+            FakeSocketIO.sleeps += 1
+            if FakeSocketIO.sleeps == 2:
+                db.token_blacklist.insert_one({"jti": "jti_1", "revoked_at": datetime.now(timezone.utc)})
+            if FakeSocketIO.sleeps == 3:
+                raise Stop
+
+    with pytest.raises(Stop):
+        revocation_set._poll(streaming, FakeSocketIO())
+
+    # bootstrap, consulta fallida (AutoReconnect) y consulta siguiente con la revocación
+    assert calls["n"] == 3 and RevocationSet.is_revoked("jti_1")
+
+
+def test_bootstrap_skips_expired_revocations_and_prune_evicts(monkeypatch):
+    monkeypatch.setattr(revocation_set.Config, "ACCESS_TOKEN_EXP_SECONDS", "300")
+    db = mongomock.MongoClient().db
+    now = datetime.now(timezone.utc)
+    db.token_blacklist.insert_many([
+        {"token": "t1", "jti": "jti_viejo", "revoked_at": now - timedelta(days=30)},
+        {"token": "t2", "jti": "jti_reciente", "revoked_at": now},
+    ])
+
+    assert RevocationSet.bootstrap(StreamingDB(db)) == 1
+    assert RevocationSet.is_revoked("jti_reciente") and not RevocationSet.is_revoked("jti_viejo")
+
+    RevocationSet.add("jti_vencido", expires_at=time.time() - 1)
+    assert RevocationSet.prune() == 1
+    assert not RevocationSet.is_revoked("jti_vencido") and RevocationSet.is_revoked("jti_reciente")
@@ -96,6 +96,12 @@ def test_get_active_session(mock_dao):
     assert result["device_id"] == "device123"
     mock_dao.db.find_one.assert_called()
 
+def test_find_previous_session_filters_by_user_and_device(mock_dao):
+    user_id = ObjectId()
+    mock_dao.find_previous_session(user_id, "device123")
+    args = mock_dao.db.find_one.call_args.args
+    assert args[1] == {"user_id": user_id, "device_id": "device123"}
+
 def test_device_id_exists(mock_dao):
     result = mock_dao.device_id_exists("device123")
     assert result["device_id"] == "device123"
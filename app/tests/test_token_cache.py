@@ -0,0 +1,59 @@
+import time
+
+import pytest
+
+from app.utils import token_cache
+from app.utils.token_cache import VerifiedTokenCache
+
+
+@pytest.fixture(autouse=True)
+def empty_cache(monkeypatch):
+    monkeypatch.setattr(token_cache.Config, "JWT_VERIFY_CACHE_SIZE", 2)
+    monkeypatch.setattr(token_cache.Config, "JWT_VERIFY_CACHE_TTL", 60)
+    VerifiedTokenCache.clear()
+    yield
+    VerifiedTokenCache.clear()
+
+
+def _claims(jti, sub="neo", exp_in=300):
+    return {"sub": sub, "jti": jti, "type": "access", "exp": int(time.time()) + exp_in}
+
+
+def test_hit_miss_and_lru_eviction():
+    assert VerifiedTokenCache.get("token-a") is None
+    VerifiedTokenCache.put("token-a", _claims("a"))
+    VerifiedTokenCache.put("token-b", _claims("b"))
+    assert VerifiedTokenCache.get("token-a")["jti"] == "a"  # a pasa a ser el más reciente
+
+    VerifiedTokenCache.put("token-c", _claims("c"))
+
+    assert VerifiedTokenCache.get("token-b") is None
+    stats = VerifiedTokenCache.stats()
+    assert (stats["hits"], stats["misses"], stats["evictions"], stats["size"]) == (1, 2, 1, 2)
+
+
+def test_entries_expire_with_the_token():
+    VerifiedTokenCache.put("expired", _claims("x", exp_in=-1))
+    VerifiedTokenCache.put("short", _claims("s", exp_in=1))
+
+    assert VerifiedTokenCache.get("expired") is None
+    time.sleep(1.1)
+    assert VerifiedTokenCache.get("short") is None
+
+
+def test_invalidation_by_jti_token_and_subject():
+    VerifiedTokenCache.put("access-1", _claims("jti-1"))
+    VerifiedTokenCache.put("refresh-1", {**_claims("jti-1"), "type": "refresh"})
+    VerifiedTokenCache.invalidate_token("access-1")
+    assert VerifiedTokenCache.get("refresh-1") is None  # mismo jti
+
+    VerifiedTokenCache.put("access-2", _claims("jti-2", sub="trinity"))
+    VerifiedTokenCache.invalidate_subject("trinity")
+    assert VerifiedTokenCache.get("access-2") is None
+    assert VerifiedTokenCache.stats()["invalidations"] == 3
+
+
+def test_cache_disabled_with_size_zero(monkeypatch):
+    monkeypatch.setattr(token_cache.Config, "JWT_VERIFY_CACHE_SIZE", 0)
+    VerifiedTokenCache.put("token-a", _claims("a"))
+    assert VerifiedTokenCache.get("token-a") is None
@@ -0,0 +1,61 @@
+from datetime import datetime, timedelta, timezone
+from unittest.mock import MagicMock
+
+import mongomock
+from pymongo import ASCENDING
+
+from app.dao.auth_dao import AuthDao
+from app.utils.db_create import INDEXES, LEGACY_INDEXES, migrate_refresh_token_hashes
+from app.utils.db_manager import DbManager
+from app.utils.token_digest import stored_token_matches, token_hash
+
+REFRESH = "eyJhbGciOiJSUzI1NiJ9." + "x" * 780
+
+
+def test_digest_has_fixed_size():
+    assert len(token_hash(REFRESH)) == len(token_hash("corto")) == 64
+    assert token_hash(None) is None
+
+
+def test_stored_token_matches_digest_and_legacy_documents():
+    assert stored_token_matches({"refresh_token_hash": token_hash(REFRESH)}, REFRESH)
+    assert not stored_token_matches({"refresh_token_hash": token_hash("otro")}, REFRESH)
+    assert stored_token_matches({"refresh_token": REFRESH}, REFRESH)  # sin migrar
+
+
+def test_writes_and_lookups_use_the_digest():
+    dao = AuthDao(db=MagicMock())
+    query, update = dao.refresh_token_upsert(username="neo", device_id="d1", jti="j1", refresh_token=REFRESH,
+                                             refresh_attempts=0, browser=None, os=None, ip_address=None)
+    assert update["$set"]["refresh_token_hash"] == token_hash(REFRESH)
+
+    query, _ = dao.revoke_refresh_token_query("neo", "d1", REFRESH)
+    assert query["refresh_token_hash"] == token_hash(REFRESH) and "refresh_token" not in query
+
+    manager = DbManager.__new__(DbManager)
+    manager.conexion, manager.refresh_tokens = MagicMock(), "refresh_tokens"
+    manager.get_refresh_token(REFRESH)
+    assert manager.conexion.find_one.call_args.args[1] == {"refresh_token_hash": token_hash(REFRESH)}
+
+
+def test_migration_backfills_digests_and_drops_legacy_indexes():
+    db = mongomock.MongoClient(tz_aware=True, tzinfo=timezone.utc).db
+    now = datetime.now(timezone.utc)
+    db.refresh_tokens.create_index([("refresh_token", ASCENDING), ("device_id", ASCENDING), ("expires_at", ASCENDING)],
+                                   name="idx_refresh_token_device_expiry")
+    db.active_sessions.create_index([("refresh_token", ASCENDING)], unique=True, name="idx_refresh_token")
+    db.refresh_tokens.insert_many([
+        {"username": "neo", "device_id": f"d{i}", "refresh_token": f"{REFRESH}{i}", "expires_at": now + timedelta(minutes=6)}
+        for i in range(5)
+    ])
+    db.active_sessions.insert_many([{"device_id": "d1", "refresh_token": REFRESH}, {"device_id": "d2", "refresh_token": None}])
+
+    assert migrate_refresh_token_hashes(db, batch_size=2) == {"refresh_tokens": 5, "active_sessions": 1}
+    assert all(doc["refresh_token_hash"] == token_hash(doc["refresh_token"]) for doc in db.refresh_tokens.find())
+    assert db.active_sessions.find_one({"device_id": "d1"})["refresh_token_hash"] == token_hash(REFRESH)
+    for collection, legacy in LEGACY_INDEXES.items():
+        names = db[collection].index_information().keys()
+        assert not set(legacy) & names
+        assert {index.document["name"] for index in INDEXES[collection]} <= names
+
+    assert migrate_refresh_token_hashes(db) == {"refresh_tokens": 0, "active_sessions": 0}
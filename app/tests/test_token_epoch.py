@@ -0,0 +1,76 @@
+from unittest.mock import MagicMock
+
+import mongomock
+import pytest
+from pymongo import ReturnDocument
+from flask import Flask, jsonify
+
+from app.auth.services.auth_service import AuthService
+from app.dao.user_dao import UserDAO
+from app.midleware.jwt_guard import jwt_required_custom
+from app.model.token_generator import TokenGenerator
+from app.utils.token_epoch import TokenEpochCache, epoch_is_current
+
+
+class EpochDB:
+    """find_one / find_one_and_update de MongoDatabase sobre mongomock"""
+
+    def __init__(self, db):
+        self.db = db
+
+    def find_one(self, collection, query=None, projection=None):
+        return self.db[collection].find_one(query or {}, projection)
+
+    def find_one_and_update(self, collection, query, update, projection=None, upsert=False):
+        return self.db[collection].find_one_and_update(query, update, projection=projection, upsert=upsert,
+                                                       return_document=ReturnDocument.AFTER)
+
+
+@pytest.fixture
+def user_dao():
+    TokenEpochCache.clear()
+    db = mongomock.MongoClient().db
+    db.users.insert_one({"username": "neo", "rol": "User"})
+    dao = UserDAO.__new__(UserDAO)
+    dao.db, dao.users = EpochDB(db), "users"
+    yield dao
+    TokenEpochCache.clear()
+
+
+def _auth_service(user_dao):
+    service = AuthService.__new__(AuthService)
+    service.user_dao = user_dao
+    return service
+
+
+def test_revoke_all_is_one_write_and_updates_local_cache(user_dao):
+    loader = MagicMock(wraps=user_dao.get_token_epoch)
+    assert epoch_is_current({"sub": "neo"}, loader)  # tokens sin claim epoch = 0
+
+    assert _auth_service(user_dao).revoke_all_tokens_for_user("neo") == 1
+
+    assert not epoch_is_current({"sub": "neo", "epoch": 0}, loader)
+    assert epoch_is_current({"sub": "neo", "epoch": 1}, loader)
+    assert loader.call_count == 1  # el resto sale de la cache
+    assert _auth_service(user_dao).revoke_all_tokens_for_user("nadie") is None
+
+
+def test_guard_rejects_tokens_from_previous_epoch(key_paths, user_dao):
+    app = Flask(__name__)
+
+    @app.route("/protegido")
+    @jwt_required_custom
+    def protegido(payload):
+        return jsonify({"epoch": payload.get("epoch")})
+
+    tg = TokenGenerator()
+    issued = tg.create_tokens({"username": "neo", "rol": "User", "jti": "jti_1", "epoch": 0})
+    TokenEpochCache.set("neo", 0)
+    client = app.test_client()
+    headers = {"Authorization": f"Bearer {issued.access_token}", "X-Token-Type": "access"}
+    assert client.get("/protegido", headers=headers).status_code == 200
+
+    _auth_service(user_dao).revoke_all_tokens_for_user("neo")
+
+    assert client.get("/protegido", headers=headers).get_json()["code"] == "RevokedToken"
+    assert tg.reissue_access_token(issued.refresh_token).access_claims["epoch"] == 0
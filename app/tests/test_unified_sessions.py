@@ -0,0 +1,96 @@
+from datetime import datetime, timedelta, timezone
+
+import mongomock
+import pytest
+from bson import ObjectId
+
+from app.auth.services.audit_service import AuditService
+from app.config import Config
+from app.dao.audit_dao import AuditLogDAO
+from app.dao.auth_dao import AuthDao
+from app.utils.db_create import migrate_to_unified_sessions
+from app.utils.session_schema import sessions_collection
+from app.utils.token_digest import token_hash
+
+
+@pytest.fixture
+def unified(monkeypatch):
+    monkeypatch.setattr(Config, "SESSION_SCHEMA", "unified")
+
+
+@pytest.fixture
+def mock_db():
+    return mongomock.MongoClient(tz_aware=True, tzinfo=timezone.utc)["mdbManageToken"]
+
+
+def _session_doc(user_id):
+    return {"user_id": user_id, "device_id": "d1", "ip_address": "10.0.0.1", "browser": "Firefox", "os": "Linux",
+            "login_at": datetime.now(timezone.utc), "is_revoked": False, "status": "active", "reason": "login"}
+
+
+def test_sessions_collection_follows_schema(monkeypatch):
+    assert sessions_collection("refresh_tokens") == "refresh_tokens"
+    monkeypatch.setattr(Config, "SESSION_SCHEMA", "unified")
+    assert sessions_collection("refresh_tokens") == sessions_collection("active_sessions") == Config.UNIFIED_SESSIONS_COLLECTION
+
+
+def test_upsert_merges_session_fields_without_overriding_token():
+    session = {"_id": ObjectId(), **_session_doc(ObjectId()), "refresh_token": "viejo", "username": "otro"}
+    _, update = AuthDao.refresh_token_upsert(username="neo", device_id="d1", jti="j1", refresh_token="r",
+                                             refresh_attempts=0, browser="Chrome", os=None, ip_address=None,
+                                             session_id=ObjectId(), session=session)
+
+    assert "_id" not in update["$set"] and "session_id" not in update["$set"] and "username" not in update["$set"]
+    assert (update["$set"]["refresh_token"], update["$set"]["browser"]) == ("r", "Chrome")
+    assert (update["$set"]["status"], update["$set"]["login_at"]) == ("active", session["login_at"])
+
+
+@pytest.mark.parametrize("browser, reason", [("Firefox", "refresh_token"), ("Chrome", "user_agent_change")])
+def test_unified_rotation_updates_session_in_the_same_write(unified, mock_db, browser, reason):
+    dao = AuthDao(db=mock_db)
+    assert dao.collection.name == Config.UNIFIED_SESSIONS_COLLECTION
+    dao.collection.insert_one({**_session_doc(ObjectId()), "username": "neo", "refresh_token": "rtok",
+                               "refresh_token_hash": token_hash("rtok"), "refresh_attempts": 0, "revoked_at": None,
+                               "expires_at": datetime.now(timezone.utc) + timedelta(minutes=6)})
+
+    previous = dao.rotate_refresh_token("rtok", "d1", "rtok-2", datetime.now(timezone.utc) + AuthDao.REFRESH_TOKEN_TTL,
+                                        browser, "Linux", "10.0.0.2")
+
+    doc = dao.collection.find_one({"username": "neo"})
+    assert previous["_id"] == doc["_id"] and previous["browser"] == "Firefox"
+    assert (doc["refresh_token_hash"], doc["refresh_attempts"], doc["reason"]) == (token_hash("rtok-2"), 1, reason)
+    assert (doc["browser"], doc["ip_address"], doc["status"]) == (browser, "10.0.0.2", "active")
+    assert doc["last_refresh_at"] is not None
+
+
+def test_refresh_activity_without_session_write_only_audits():
+    service = AuditService.__new__(AuditService)
+    service.session_dao, service.audit_log_dao = None, AuditLogDAO.__new__(AuditLogDAO)
+    service.audit_log_dao.session_audit = "session_audit"
+    session = {"_id": ObjectId(), "user_id": ObjectId(), "browser": "Firefox", "ip_address": "10.0.0.1"}
+
+    writes = service.refresh_activity_writes(session, "rtok-2", "10.0.0.2", "Chrome", include_session=False)
+
+    assert {collection for collection, _, _ in writes} == {"session_audit"}
+    assert {w[2]["document"]["event_type"] for w in writes} == {"user_agent_change", "refresh_token"}
+
+
+def test_migration_merges_token_and_session_and_is_idempotent(mock_db):
+    user_id, other_id = ObjectId(), ObjectId()
+    mock_db.users.insert_many([{"_id": user_id, "username": "neo"}, {"_id": other_id, "username": "trinity"}])
+    session_id = mock_db.active_sessions.insert_one(_session_doc(user_id)).inserted_id
+    mock_db.active_sessions.insert_one({**_session_doc(other_id), "device_id": "d2"})
+    mock_db.refresh_tokens.insert_one({"username": "neo", "device_id": "d1", "refresh_token": "r", "browser": "Chrome",
+                                       "refresh_token_hash": token_hash("r"), "session_id": session_id})
+
+    assert migrate_to_unified_sessions(mock_db) == {Config.UNIFIED_SESSIONS_COLLECTION: 2}
+
+    target = mock_db[Config.UNIFIED_SESSIONS_COLLECTION]
+    merged = target.find_one({"username": "neo", "device_id": "d1"})
+    assert merged["_id"] == session_id and merged["user_id"] == user_id and "session_id" not in merged
+    assert (merged["browser"], merged["status"], merged["refresh_token"]) == ("Chrome", "active", "r")
+    assert target.find_one({"username": "trinity", "device_id": "d2"})["user_id"] == other_id
+
+    migrate_to_unified_sessions(mock_db)
+    assert target.count_documents({}) == 2
+    assert mock_db.refresh_tokens.count_documents({}) == 1 and mock_db.active_sessions.count_documents({}) == 2
@@ -0,0 +1,169 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Ejecutor acotado para operaciones criptográficas intensivas en CPU.
+
+bcrypt.checkpw y la firma RS256 tardan milisegundos de CPU pura: ejecutadas
+en el greenlet del request congelan el hub de eventlet y todos los demás
+requests esperan. CryptoExecutor las envía a hilos reales del sistema
+(eventlet.tpool si el proceso está parcheado, ThreadPoolExecutor si no) y
+limita cuántas corren a la vez con Config.CRYPTO_MAX_CONCURRENCY. Cada
+operación registra el tiempo de espera en cola y el de ejecución.
+"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Iterable, Optional, TypeVar
+
+from icecream import ic
+
+from app.auth.exceptions.auth_exceptions import AuthException
+from app.config import Config
+from app.utils.mongo_metrics import CommandStats
+
+T = TypeVar("T")
+
+
+def _eventlet_patched() -> bool:
+    try:
+        from eventlet import patcher
+    except ImportError:
+        return False
+    return patcher.is_monkey_patched("thread")
+
+
+class CryptoExecutor:
+    """
+    Pool por proceso para bcrypt y firma JWT.
+
+    Modos (Config.CRYPTO_EXECUTOR): "auto" (tpool con eventlet, hilos si no),
+    "tpool", "threads" o "inline" (sin offload, solo métricas).
+    Config.CRYPTO_MAX_QUEUE > 0 rechaza con 503 cuando hay demasiadas
+    operaciones esperando turno.
+    """
+    _lock = threading.Lock()
+    _slots: Optional[threading.BoundedSemaphore] = None
+    _pool: Optional[ThreadPoolExecutor] = None
+    _mode: Optional[str] = None
+    _wait: dict[str, CommandStats] = {}
+    _run: dict[str, CommandStats] = {}
+    in_flight = 0
+    queued = 0
+    max_queued = 0
+    rejected = 0
+
+    @classmethod
+    def mode(cls) -> str:
+        if cls._mode is None:
+            mode = Config.CRYPTO_EXECUTOR
+            if mode == "auto":
+                mode = "tpool" if _eventlet_patched() else "threads"
+            cls._mode = mode
+        return cls._mode
+
+    @classmethod
+    def run(cls, operation: str, fn: Callable[..., T], *args, **kwargs) -> T:
+        """Ejecuta fn(*args, **kwargs) en el pool y devuelve su resultado (o propaga su excepción)"""
+        slots = cls._semaphore()
+        with cls._lock:
+            if 0 < Config.CRYPTO_MAX_QUEUE <= cls.queued:
+                cls.rejected += 1
+                raise AuthException("Servidor ocupado, reintente en unos segundos", "CryptoQueueFull", 503)
+            cls.queued += 1
+            cls.max_queued = max(cls.max_queued, cls.queued)
+        queued_at = time.perf_counter()
+        slots.acquire()
+        started_at = time.perf_counter()
+        with cls._lock:
+            cls.queued -= 1
+            cls.in_flight += 1
+            cls._observe(cls._wait, operation, (started_at - queued_at) * 1000)
+        failed = True
+        try:
+            result = cls._dispatch(fn, *args, **kwargs)
+            failed = False
+            return result
+        finally:
+            slots.release()
+            with cls._lock:
+                cls.in_flight -= 1
+                cls._observe(cls._run, operation, (time.perf_counter() - started_at) * 1000, failed)
+
+    @classmethod
+    def map(cls, operation: str, fn: Callable[..., T], items: Iterable) -> list[T]:
+        """fn(item) para cada item, en paralelo dentro del límite de concurrencia; resultados en orden"""
+        items = list(items)
+        if len(items) <= 1 or cls.mode() == "inline":
+            return [cls.run(operation, fn, item) for item in items]
+        # Los llamadores solo esperan turno (con eventlet son greenthreads); el trabajo va al pool
+        with ThreadPoolExecutor(max_workers=min(len(items), max(1, Config.CRYPTO_MAX_CONCURRENCY))) as callers:
+            return list(callers.map(lambda item: cls.run(operation, fn, item), items))
+
+    @classmethod
+    def _dispatch(cls, fn: Callable[..., T], *args, **kwargs) -> T:
+        mode = cls.mode()
+        if mode == "tpool":
+            from eventlet import tpool
+            return tpool.execute(fn, *args, **kwargs)
+        if mode == "threads":
+            return cls._executor().submit(fn, *args, **kwargs).result()
+        return fn(*args, **kwargs)
+
+    @classmethod
+    def _semaphore(cls) -> threading.BoundedSemaphore:
+        if cls._slots is None:
+            with cls._lock:
+                if cls._slots is None:
+                    size = max(1, Config.CRYPTO_MAX_CONCURRENCY)
+                    if cls.mode() == "tpool":
+                        from eventlet import tpool
+                        tpool.set_num_threads(size)
+                    cls._slots = threading.BoundedSemaphore(size)
+                    ic(f"🔐 Ejecutor criptográfico: modo={cls.mode()} concurrencia={size}")
+        return cls._slots
+
+    @classmethod
+    def _executor(cls) -> ThreadPoolExecutor:
+        if cls._pool is None:
+            with cls._lock:
+                if cls._pool is None:
+                    cls._pool = ThreadPoolExecutor(max_workers=max(1, Config.CRYPTO_MAX_CONCURRENCY),
+                                                   thread_name_prefix="crypto")
+        return cls._pool
+
+    @staticmethod
+    def _observe(table: dict, operation: str, duration_ms: float, failed: bool = False) -> None:
+        stats = table.get(operation)
+        if stats is None:
+            stats = table[operation] = CommandStats()
+        stats.observe(duration_ms, failed=failed)
+
+    @classmethod
+    def stats(cls) -> dict:
+        with cls._lock:
+            return {
+                "mode": cls.mode(),
+                "max_concurrency": Config.CRYPTO_MAX_CONCURRENCY,
+                "max_queue": Config.CRYPTO_MAX_QUEUE,
+                "in_flight": cls.in_flight,
+                "queued": cls.queued,
+                "max_queued": cls.max_queued,
+                "rejected": cls.rejected,
+                "operations": {
+                    operation: {"wait": cls._wait[operation].to_json(), "run": cls._run[operation].to_json()}
+                    for operation in cls._run
+                }
+            }
+
+    @classmethod
+    def reset(cls) -> None:
+        """Descarta pool, semáforo y métricas (se recrean con la Config actual)"""
+        with cls._lock:
+            if cls._pool is not None:
+                cls._pool.shutdown(wait=False)
+            cls._pool = None
+            cls._slots = None
+            cls._mode = None
+            cls._wait = {}
+            cls._run = {}
+            cls.in_flight = cls.queued = cls.max_queued = cls.rejected = 0
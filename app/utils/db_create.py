@@ -1,17 +1,195 @@
 # from pymongo import DESCENDING, MongoClient, ASCENDING, errors
 from app.config import Config
-from pymongo import ASCENDING, DESCENDING, errors
-from pymongo.mongo_client import MongoClient, OperationFailure
-from pymongo.server_api import ServerApi
+from pymongo import ASCENDING, DESCENDING, IndexModel, ReplaceOne, UpdateOne, errors
+from pymongo.mongo_client import OperationFailure
 from datetime import datetime, timezone
 from icecream import ic
 
-# client = MongoClient("mongodb://localhost:27017/")
-client = MongoClient(Config.MONGO_URI_CLUSTER_X509, tls=True, tlsCertificateKeyFile=Config.MONGODB_X509, server_api=ServerApi('1'),tz_aware=True, tzinfo=timezone.utc)
-db = client[Config.MONGO_DB]
+from app.utils.db_mongo import MongoClientRegistry
+from app.utils.session_schema import unified_sessions
+from app.utils.token_digest import token_hash
+
+# Índices por colección. Cada consulta de los DAOs debe poder resolverse con
+# alguno de ellos: app/tests/test_query_plans.py lo verifica con explain().
+INDEXES: dict[str, list[IndexModel]] = {
+    "refresh_tokens": [
+        # Previene duplicados: solo un refresh_token activo por device + user
+        IndexModel([("username", ASCENDING), ("device_id", ASCENDING)], name="idx_device_user"),
+        # Búsquedas de refresh_token válidos (por device y no expirados); por digest, no por el JWT completo
+        IndexModel([("refresh_token_hash", ASCENDING), ("device_id", ASCENDING), ("expires_at", ASCENDING)], name="idx_refresh_token_hash_device_expiry"),
+        IndexModel([("username", ASCENDING), ("update_at", ASCENDING), ("expires_at", ASCENDING)], name="idx_username_update_expires_at"),
+        # Eliminación automática de tokens expirados
+        IndexModel([("expires_at", ASCENDING)], expireAfterSeconds=0, name="idx_ttl_expired_refresh_tokens"),
+        IndexModel([("username", ASCENDING)], name="idx_user_sessions"),
+        # AuthDao.is_token_in_use: username + used_at != null
+        IndexModel([("username", ASCENDING), ("used_at", ASCENDING)], name="idx_username_used_at"),
+        # AuthDao.revoke_token_by_jti / revoke_token_by_device_id
+        IndexModel([("jti", ASCENDING)], name="idx_jti"),
+        IndexModel([("device_id", ASCENDING)], name="idx_device_id")
+    ],
+    "session_audit": [
+        IndexModel([("session_id", ASCENDING), ("device_id", ASCENDING), ("timestamp", DESCENDING)], name="idx_session_device_id_timestamp"),
+        IndexModel([("user_id", ASCENDING)], name="idx_user_id"),
+        IndexModel([("session_id", ASCENDING)], name="idx_session_id"),
+        IndexModel([("event_type", ASCENDING)], name="idx_event_type"),
+        IndexModel([("timestamp", ASCENDING)], name="idx_timestamp"),
+        # AuditLogDAO.get_logs_audit filtrado por usuario y ordenado por fecha
+        IndexModel([("user_id", ASCENDING), ("timestamp", DESCENDING)], name="idx_user_id_timestamp")
+    ],
+    "active_sessions": [
+        # 🔍 Búsqueda rápida por usuario
+        IndexModel([("user_id", ASCENDING)], name="idx_user_id"),
+        # 🔍 Consultas por dispositivo + usuario
+        IndexModel([("user_id", ASCENDING), ("device_id", ASCENDING)], name="idx_user_device_id"),
+        # ⚠️ Buscar sesiones activas rápido
+        IndexModel([("status", ASCENDING), ("is_revoked", ASCENDING)], name="idx_status_revoked"),
+        # 📅 Orden por fecha de login (útil para paneles)
+        IndexModel([("login_at", DESCENDING)], name="idx_login_at"),
+        # 🔐 Índice para revocar tokens por refresh_token (digest; sesiones sin token quedan fuera)
+        IndexModel([("refresh_token_hash", ASCENDING)], unique=True, name="idx_refresh_token_hash",
+                   partialFilterExpression={"refresh_token_hash": {"$type": "string"}}),
+        # ⚙️ Índice compuesto para filtros complejos (opcional)
+        IndexModel([("user_id", ASCENDING), ("status", ASCENDING), ("is_revoked", ASCENDING)], name="idx_user_id_status_revoked")
+    ],
+    "users": [
+        IndexModel([("username", ASCENDING)], unique=True, name="idx_unique_username"),
+        IndexModel([("email", ASCENDING)], unique=True, sparse=True, name="idx_unique_email"),  # sparse permite nulos
+        IndexModel([("rol", ASCENDING)], name="idx_rol"),
+        IndexModel([("blocked_until", ASCENDING)], name="idx_blocked_until")
+    ],
+    "token_blacklist": [
+        IndexModel([("token", ASCENDING)], unique=True, name="idx_unique_token"),
+        # TokenBlacklistDao.is_token_revoked cuenta por jti
+        IndexModel([("jti", ASCENDING)], sparse=True, name="idx_jti"),
+        # RevocationSet: carga y consulta periódica por revoked_at reciente
+        IndexModel([("revoked_at", ASCENDING)], name="idx_revoked_at")
+    ]
+}
+
+# Esquema unificado (Config.SESSION_SCHEMA=unified): los índices de ambas colecciones en una.
+# Sin TTL: la sesión sobrevive a la expiración de su refresh, como en active_sessions.
+UNIFIED_SESSION_INDEXES: list[IndexModel] = [
+    # Un documento por usuario + device (clave del upsert del login)
+    IndexModel([("username", ASCENDING), ("device_id", ASCENDING)], unique=True, name="idx_unique_user_device"),
+    *[index for index in INDEXES["refresh_tokens"]
+      if index.document["name"] not in ("idx_device_user", "idx_ttl_expired_refresh_tokens")],
+    *INDEXES["active_sessions"]
+]
+
+# Índices reemplazados; migrate_refresh_token_hashes los elimina tras completar los digests
+LEGACY_INDEXES: dict[str, list[str]] = {
+    "refresh_tokens": ["idx_refresh_token_device_expiry"],
+    "active_sessions": ["idx_refresh_token"]
+}
+
+
+def get_database():
+    """Base de datos de la aplicación (cliente compartido del proceso)"""
+    return MongoClientRegistry.get_client()[Config.MONGO_DB]
+
+
+def ensure_indexes(database=None) -> None:
+    """Crea (o completa) los índices de INDEXES; create_indexes es idempotente"""
+    database = database if database is not None else get_database()
+    collections = dict(INDEXES)
+    if unified_sessions():
+        collections[Config.UNIFIED_SESSIONS_COLLECTION] = UNIFIED_SESSION_INDEXES
+    for collection, indexes in collections.items():
+        try:
+            database[collection].create_indexes(indexes)
+            ic(f"Índices de '{collection}' verificados")
+        except OperationFailure as e:
+            ic(f"Error creando índices de '{collection}': {e}")
+
+
+def migrate_refresh_token_hashes(database=None, batch_size: int = 1000) -> dict:
+    """
+    Completa refresh_token_hash en los documentos anteriores al digest y
+    elimina los índices sobre el JWT completo (LEGACY_INDEXES). Idempotente.
+    """
+    database = database if database is not None else get_database()
+    summary = {}
+    for collection in LEGACY_INDEXES:
+        pending = database[collection].find(
+            {"refresh_token_hash": {"$exists": False}, "refresh_token": {"$type": "string"}},
+            {"_id": 1, "refresh_token": 1}
+        )
+        updated, batch = 0, []
+        for doc in pending:
+            batch.append(UpdateOne({"_id": doc["_id"]}, {"$set": {"refresh_token_hash": token_hash(doc["refresh_token"])}}))
+            if len(batch) >= batch_size:
+                updated += database[collection].bulk_write(batch, ordered=False).modified_count
+                batch = []
+        if batch:
+            updated += database[collection].bulk_write(batch, ordered=False).modified_count
+        summary[collection] = updated
+        ic(f"🔑 '{collection}': {updated} digests de refresh_token completados")
+
+    # Los índices nuevos antes de quitar los viejos: las búsquedas nunca quedan sin índice
+    ensure_indexes(database)
+    for collection, names in LEGACY_INDEXES.items():
+        existing = database[collection].index_information()
+        if not {index.document["name"] for index in INDEXES[collection]} <= existing.keys():
+            ic(f"⚠️ Faltan índices nuevos en '{collection}': se conservan los anteriores")
+            continue
+        for name in names:
+            if name in existing:
+                database[collection].drop_index(name)
+                ic(f"🗑️ Índice '{name}' de '{collection}' eliminado")
+    return summary
+
+
+def migrate_to_unified_sessions(database=None, batch_size: int = 1000) -> dict:
+    """
+    Copia refresh_tokens + active_sessions al esquema unificado: un documento por
+    (usuario, device) con el estado del refresh y el de la sesión. La sesión de un
+    usuario se une al refresh de su mismo device y conserva su _id (session_audit lo
+    referencia). Idempotente (ReplaceOne por username + device_id); las colecciones
+    originales no se tocan, para poder volver a SESSION_SCHEMA=split.
+    """
+    database = database if database is not None else get_database()
+    target = database[Config.UNIFIED_SESSIONS_COLLECTION]
+    target.create_indexes(UNIFIED_SESSION_INDEXES)
+
+    usernames = {doc["_id"]: doc["username"] for doc in database.users.find({}, {"username": 1})}
+    user_ids = {username: user_id for user_id, username in usernames.items()}
+    sessions = {(doc.get("user_id"), doc.get("device_id")): doc for doc in database.active_sessions.find({})}
+
+    written, batch = 0, []
+
+    def flush() -> int:
+        result = target.bulk_write(batch, ordered=False)
+        return result.upserted_count + result.modified_count
+
+    for token in database.refresh_tokens.find({}):
+        user_id = token.get("user_id") or user_ids.get(token.get("username"))
+        session = sessions.pop((user_id, token.get("device_id")), {})
+        # El refresh manda en los campos compartidos (refresh_token, ip, navegador)
+        merged = {**session, **token, "_id": session.get("_id", token["_id"]), "user_id": user_id}
+        merged.pop("session_id", None)
+        batch.append(ReplaceOne({"username": merged["username"], "device_id": merged["device_id"]}, merged, upsert=True))
+        if len(batch) >= batch_size:
+            written += flush()
+            batch = []
+
+    # Sesiones sin refresh de su device
+    for session in sessions.values():
+        username = usernames.get(session.get("user_id"))
+        if username is None:
+            continue
+        batch.append(ReplaceOne({"username": username, "device_id": session.get("device_id")},
+                                {**session, "username": username}, upsert=True))
+        if len(batch) >= batch_size:
+            written += flush()
+            batch = []
+    if batch:
+        written += flush()
+    ic(f"🧩 '{Config.UNIFIED_SESSIONS_COLLECTION}': {written} sesiones unificadas")
+    return {Config.UNIFIED_SESSIONS_COLLECTION: written}
 
 
 def db_create_collection():
+    db = get_database()
     # 1. Crear colección con validación opcional
     try:
         # Crear colección (si no existe)
@@ -27,6 +205,11 @@ def db_create_collection():
                                 "device_id":    {"bsonType": "string","description": "Identificador único del dispositivo"},
                                 "jti":          {"bsonType": "string","description": "Token ID (único por refresh)"},
                                 "refresh_token":{"bsonType": "string","description": "Token refresh JWT"},
+                                "refresh_token_hash":{"bsonType": "string","description": "SHA-256 del refresh token (campo indexado)"},
+                                "rol":          {"bsonType": ["string", "null"],"description": "Rol del usuario (claims de refresh opacos)"},
+                                "epoch":        {"bsonType": ["int", "long"],"minimum": 0,"description": "token_epoch del usuario al emitir el refresh"},
+                                "user_id":      {"bsonType": "objectId","description": "Usuario dueño del refresh"},
+                                "session_id":   {"bsonType": "objectId","description": "_id en active_sessions (refresh sin búsqueda de sesión)"},
                                 "created_at":   {"bsonType": "date","description": "Fecha de creación del token"},
                                 "update_at":    {"bsonType": ["date", "null"],"description": "Fecha de actualización del token"},
                                 "expires_at":   {"bsonType": "date","description": "Fecha de expiración"},
@@ -48,33 +231,7 @@ def db_create_collection():
                 ic("La colección ya existe, continuando con los índices...")
             # 2. Crear índices para máxima eficiencia
             try:
-                # Previene duplicados: solo un refresh_token activo por device + user
-                db.refresh_tokens.create_index(
-                    [("username", ASCENDING), ("device_id", ASCENDING)],
-                    name="idx_device_user"
-                )
-
-                # Búsquedas de refresh_token válidos (por device y no expirados)
-                db.refresh_tokens.create_index(
-                    [("refresh_token", ASCENDING), ("device_id", ASCENDING), ("expires_at", ASCENDING)],
-                    name="idx_refresh_token_device_expiry"
-                )
-
-                db.refresh_tokens.create_index(
-                    [("username", ASCENDING), ("update_at", ASCENDING), ("expires_at", ASCENDING)],
-                    name="idx_username_update_expires_at"
-                )
-
-                # Eliminación automática de tokens expirados
-                db.refresh_tokens.create_index(
-                    [("expires_at", ASCENDING)],
-                    expireAfterSeconds=0,
-                    name="idx_ttl_expired_refresh_tokens"
-                )
-                db.refresh_tokens.create_index(
-                    [("username", ASCENDING)],
-                    name="idx_user_sessions"
-                )
+                db.refresh_tokens.create_indexes(INDEXES["refresh_tokens"])
                 ic("Índices creados con éxito")
             except OperationFailure as e:
                 ic(f"Error creando índice: {e}")
@@ -105,26 +262,7 @@ def db_create_collection():
             except errors.CollectionInvalid as e:
                 ic(f"La colección ya existe, continuando con los índices... {e}")
             try:
-                db.session_audit.create_index(
-                    [("session_id", ASCENDING), ("device_id", ASCENDING), ("timestamp", DESCENDING)],
-                    name="idx_session_device_id_timestamp"
-                )
-                db.session_audit.create_index(
-                    [("user_id", ASCENDING)],
-                    name="idx_user_id"
-                )
-                db.session_audit.create_index(
-                    [("session_id", ASCENDING)],
-                    name="idx_session_id"
-                )
-                db.session_audit.create_index(
-                    [("event_type", ASCENDING)],
-                    name="idx_event_type"
-                )
-                db.session_audit.create_index(
-                    [("timestamp", ASCENDING)],
-                    name="idx_timestamp"
-                )
+                db.session_audit.create_indexes(INDEXES["session_audit"])
             except errors.OperationFailure as e:
                 ic(f"Error creando índice: {e}")
         elif "active_sessions" not in db.list_collection_names():
@@ -160,6 +298,10 @@ def db_create_collection():
                                 "bsonType": "string",
                                 "description": "Token de actualización asociado a la sesión"
                                 },
+                                "refresh_token_hash": {
+                                "bsonType": ["string", "null"],
+                                "description": "SHA-256 del refresh token (campo indexado)"
+                                },
                                 "is_revoked": {
                                 "bsonType": "bool",
                                 "description": "Indica si la sesión ha sido revocada manualmente o por seguridad"
@@ -191,28 +333,8 @@ def db_create_collection():
             except errors.CollectionInvalid as e:
                 ic("La colección ya existe, continuando con los índices...")
             try:
-                # Índices sugeridos
-                # 🔍 Búsqueda rápida por usuario
-                db.active_sessions.create_index([("user_id", ASCENDING)], name="idx_user_id")
-
-                 # 🔍 Consultas por dispositivo + usuario
-                db.active_sessions.create_index([("user_id", ASCENDING), ("device_id", ASCENDING)], name="idx_user_device_id")
-
-                 # ⚠️ Buscar sesiones activas rápido
-                db.active_sessions.create_index([("status", ASCENDING), ("is_revoked", ASCENDING)], name="idx_status_revoked")
-
-                 # 📅 Orden por fecha de login (útil para paneles)
-                db.active_sessions.create_index([("login_at", DESCENDING)], name="idx_login_at")
-
-                 # 🔐 Índice para revocar tokens por refresh_token
-                db.active_sessions.create_index([("refresh_token", ASCENDING)], unique=True, name="idx_refresh_token")
-
-                 # ⚙️ Índice compuesto para filtros complejos (opcional)
-                db.active_sessions.create_index([("user_id", ASCENDING), ("status", ASCENDING), ("is_revoked", ASCENDING)], name="idx_user_id_status_revoked")
-                # db.active_sessions.create_index("user_id", name="idx_user_id")
-                # db.active_sessions.create_index("device_id", name="idx_device_id")
-                # db.active_sessions.create_index("refresh_token", unique=True, name="idx_refresh_token")
-                # db.active_sessions.create_index([("status", ASCENDING), ("is_revoked", ASCENDING)], name="idx_status_revoked")
+                # Índices sugeridos (ver INDEXES["active_sessions"])
+                db.active_sessions.create_indexes(INDEXES["active_sessions"])
             except errors.OperationFailure as e:
                 ic(f"Error creando índice: {e}")
         elif "users" not in db.list_collection_names():
@@ -254,6 +376,11 @@ def db_create_collection():
                          "blocked_until": {
                             "bsonType": ["date", "null"],
                             "description": "Verificar Bloqueo"
+                        },
+                        "token_epoch": {
+                            "bsonType": ["int", "long"],
+                            "minimum": 0,
+                            "description": "Versión de tokens; incrementarla revoca todos los tokens del usuario"
                         }
                     }
                 }
@@ -263,10 +390,7 @@ def db_create_collection():
             )
                # Crear índices únicos para username y email
             try:
-                db.users.create_index("username", unique=True, name="idx_unique_username")
-                db.users.create_index([("email", ASCENDING)], unique=True, sparse=True, name="idx_unique_email")  # sparse permite nulos
-                db.users.create_index([("rol", ASCENDING)], name="idx_rol")
-                db.users.create_index([("blocked_until", ASCENDING)], name="idx_blocked_until")
+                db.users.create_indexes(INDEXES["users"])
             except errors.OperationFailure as e:
                 ic(f"Error creando índice: {e}")
             ic("Colección 'users' creada con validación de esquema")
@@ -290,12 +414,8 @@ def db_create_collection():
                 validationAction="error"
             )
             try:
-                db.token_blacklist.create_index(
-                    [("token", ASCENDING)],
-                    unique=True,
-                    name="idx_unique_token"
-                )
-                ic("Índice único 'jti' creado con sparse=True")
+                db.token_blacklist.create_indexes(INDEXES["token_blacklist"])
+                ic("Índices 'token' (único) y 'jti' (sparse) creados")
             except errors.OperationFailure as e:
                 ic(f"Error creando índice: {e}")
             ic("Colección 'token_blacklist' creada")
@@ -321,6 +441,7 @@ def db_create_collection():
         ic(f"La colección ya existe -> {e}")
 
 def db_create_user():
+    db = get_database()
     db.users.insert_one({
     "username": "admin@example.com",
     "password": "$2b$12$xOjASwdN4rZxUgztrC.WPO1UeLDt4mmM0NWZUH8k7ZyaHl8PUVxi6",
@@ -355,6 +476,10 @@ def db_create_user():
 def main():
     # db_create_user()
     db_create_collection()
+    # Colecciones ya existentes: digests de refresh_token e índices nuevos
+    migrate_refresh_token_hashes()
+    if unified_sessions():
+        migrate_to_unified_sessions()
 
 if __name__ == "__main__":
     main()
@@ -6,21 +6,24 @@ from flask import Blueprint, request
 
 from app.utils.db_mongo import MongoDatabase
 from app.model.token_generator import TokenGenerator
+from app.utils.request_container import provide
+from app.utils.session_schema import sessions_collection
+from app.utils.token_digest import token_hash
 
 db_Manager_bp = Blueprint("dbManager", __name__)
 
 class DbManager:
     def __init__(self):
-        self.conexion = MongoDatabase()
-        self.generate_token = TokenGenerator()
-        self.refresh_tokens = "refresh_tokens"
+        self.conexion = provide(MongoDatabase)
+        self.generate_token = provide(TokenGenerator)
+        self.refresh_tokens = sessions_collection("refresh_tokens")
         self.token_blacklist = "token_blacklist"
         self.global_tokens = "global_tokens"
         self.session_audit = "session_audit"
-        self.active_sessions = "active_sessions"
+        self.active_sessions = sessions_collection("active_sessions")
    
     def get_active_devices(self,username: str):
-        devices = self.conexion.find(self.refresh_tokens,
+        devices = self.conexion.stream(self.refresh_tokens,
             {"username": username, "revoked_at": None, "expires_at": {"$gt": datetime.now(timezone.utc)}},
             {"_id": 0, "device_id": 1, "user_agent": 1, "ip_address": 1, "expires_at": 1}
         )
@@ -41,7 +44,7 @@ class DbManager:
         token = self.conexion.find_one(
             self.refresh_tokens,
             {
-                "refresh_token": refresh_token,
+                "refresh_token_hash": token_hash(refresh_token),
                 "device_id": device_id,
                 "expires_at": {"$gt": datetime.now(timezone.utc)}
             }
@@ -53,7 +56,7 @@ class DbManager:
         return True  # Válido
     
     def get_refresh_token(self, refresh_token: str) -> dict | None:
-        query = {"refresh_token": refresh_token}
+        query = {"refresh_token_hash": token_hash(refresh_token)}
         doc = self.conexion.find_one(self.refresh_tokens, query)
         return doc 
                                      
@@ -127,7 +130,7 @@ class DbManager:
             "last_refresh_at": 1
         }
 
-        return list(self.conexion.find(self.active_sessions, query, projection).sort("last_refresh_at", -1))
+        return list(self.conexion.stream(self.active_sessions, query, projection, sort=[("last_refresh_at", -1)]))
 
     # return list(self.conexion.find(self.refresh_tokens, query, projection))
     def log_audit_event(self, 
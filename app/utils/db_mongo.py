@@ -1,26 +1,248 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
+from contextlib import contextmanager
 from datetime import timezone
+from functools import lru_cache
 import json
+import os
+import threading
 import traceback
 import logging
-from typing import Optional
+from typing import Any, Callable, Iterator, Optional, Union
+from pymongo import ReturnDocument
+from pymongo.client_session import ClientSession
+from pymongo.errors import InvalidOperation
 from pymongo.mongo_client import MongoClient, PyMongoError
+from pymongo.read_preferences import Nearest, Primary, PrimaryPreferred, Secondary, SecondaryPreferred
 from pymongo.server_api import ServerApi
+from pymongo.write_concern import WriteConcern
 from pymongo.results import InsertOneResult, UpdateResult
 from app.config import Config
+from app.utils.mongo_metrics import command_metrics
+from app.utils.session_schema import sessions_collection
 from icecream import ic
 from app.extensions import socketio  # Importar la instancia global de SocketIO
 
+class MongoClientRegistry:
+    """
+    Registro de MongoClient compartidos por proceso.
+
+    Cada combinación (uri, certificado) tiene un único cliente con su pool de
+    conexiones; los DAOs lo reutilizan en vez de abrir un cliente nuevo
+    (resolución SRV + handshake TLS/X.509) en cada instancia. Tras un fork el
+    hijo descarta los clientes heredados y crea los suyos.
+    """
+    _clients: dict[tuple, MongoClient] = {}
+    _pid: int = os.getpid()
+    _lock = threading.Lock()
+
+    @classmethod
+    def get_client(cls, uri: Optional[str] = None, tls_certificate_key_file: Optional[str] = None) -> MongoClient:
+        """Devuelve el cliente compartido para la uri, creándolo si no existe"""
+        cls._check_fork()
+        uri = uri or Config.MONGO_URI_CLUSTER_X509
+        tls_certificate_key_file = tls_certificate_key_file or Config.MONGODB_X509
+        key = (uri, tls_certificate_key_file)
+        client = cls._clients.get(key)
+        if client is None:
+            with cls._lock:
+                client = cls._clients.get(key)
+                if client is None:
+                    client = cls._build_client(uri, tls_certificate_key_file)
+                    cls._clients[key] = client
+        return client
+
+    @classmethod
+    def pool_options(cls) -> dict:
+        """Opciones del pool y listeners de monitoreo configurados en Config"""
+        return {
+            "minPoolSize": Config.MONGO_MIN_POOL_SIZE,
+            "maxPoolSize": Config.MONGO_MAX_POOL_SIZE,
+            "maxIdleTimeMS": Config.MONGO_MAX_IDLE_TIME_MS,
+            "event_listeners": [command_metrics] if Config.MONGO_COMMAND_MONITORING else []
+        }
+
+    @classmethod
+    def _build_client(cls, uri: Optional[str], tls_certificate_key_file: Optional[str]) -> MongoClient:
+        try:
+            client = MongoClient(
+                uri,
+                tls=True,
+                tlsCertificateKeyFile=tls_certificate_key_file,
+                server_api=ServerApi('1'),
+                tz_aware=True,
+                tzinfo=timezone.utc,
+                **cls.pool_options()
+            )
+            ic(f"MongoClient creado para el proceso {os.getpid()}")
+            return client
+        except PyMongoError as e:
+            ic(f"Error al crear MongoClient: {e}")
+            raise
+
+    @classmethod
+    def warmup(cls) -> None:
+        """
+        Crea el cliente al arrancar y hace un ping: MongoClient es perezoso, sin una
+        ida y vuelta la primera conexión (TLS + auth) la pagaría el primer request.
+        """
+        try:
+            cls.get_client().admin.command("ping")
+        except PyMongoError as e:
+            ic(f"No se pudo precalentar MongoClient: {e}")
+
+    @classmethod
+    def _check_fork(cls) -> None:
+        if cls._pid != os.getpid():
+            cls._reset_after_fork()
+
+    @classmethod
+    def _reset_after_fork(cls) -> None:
+        # Los sockets del padre no son válidos en el hijo: no se cierran, se descartan
+        cls._clients = {}
+        cls._pid = os.getpid()
+        cls._lock = threading.Lock()
+
+    @classmethod
+    def close_all(cls) -> None:
+        """Cierra todos los clientes del proceso actual"""
+        with cls._lock:
+            for client in cls._clients.values():
+                client.close()
+            cls._clients = {}
+        ic("Clientes MongoDB cerrados")
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=MongoClientRegistry._reset_after_fork)
+
+
+def insert_summary(result: InsertOneResult, context: str = "") -> dict:
+    """Resultado de insert_with_log (compartido con la variante async)"""
+    prefix = f"[{context}] " if context else ""
+    if result.acknowledged and result.inserted_id:
+        msg = f"{prefix}✅ Documento insertado correctamente: {result.inserted_id}"
+    else:
+        msg = f"{prefix}⚠️ Inserción sin confirmación o sin ID."
+    return {
+        "success": True,
+        "context": context,
+        "acknowledged": result.acknowledged,
+        "inserted_id": result.inserted_id,
+        "message": msg
+    }
+
+
+def update_summary(result: UpdateResult, context: str = "") -> dict:
+    """Resultado de update_with_log (compartido con la variante async)"""
+    prefix = f"[{context}] " if context else ""
+    if not result.acknowledged:
+        # w:0 -> el servidor no informa contadores
+        return {
+            "success": True,
+            "context": context,
+            "matched_count": None,
+            "modified_count": None,
+            "acknowledged": False,
+            "message": f"{prefix}⚠️ Actualización sin confirmación (w:0)."
+        }
+    if result.matched_count == 0:
+        msg = f"{prefix}⚠️ No se encontró ningún documento para actualizar."
+    elif result.modified_count == 0:
+        msg = f"{prefix}ℹ️ Documento encontrado, pero no hubo cambios (ya estaba actualizado)."
+    else:
+        msg = f"{prefix}✅ Documento actualizado correctamente."
+    return {
+        "success": True,
+        "context": context,
+        "matched_count": result.matched_count,
+        "modified_count": result.modified_count,
+        "acknowledged": result.acknowledged,
+        "message": msg
+    }
+
+
+def bulk_summary(inserted_count: int, modified_count: int, round_trips: int, context: str = "") -> dict:
+    """Resultado de bulk_write_with_log"""
+    prefix = f"[{context}] " if context else ""
+    return {
+        "success": True,
+        "context": context,
+        "inserted_count": inserted_count,
+        "modified_count": modified_count,
+        "round_trips": round_trips,
+        "message": f"{prefix}✅ Lote escrito: {inserted_count} insertados, {modified_count} modificados ({round_trips} ida(s) y vuelta)."
+    }
+
+
+def error_summary(error: PyMongoError, action: str, context: str = "") -> dict:
+    """Resultado de error de las operaciones *_with_log"""
+    prefix = f"[{context}] " if context else ""
+    return {
+        "success": False,
+        "context": context,
+        "error": str(error),
+        "trace": traceback.format_exc(),
+        "message": f"{prefix}❌ Error al {action} en MongoDB: {error.__class__.__name__}: {error}"
+    }
+
+
+@lru_cache(maxsize=None)
+def write_concern_for(collection: str) -> Optional[WriteConcern]:
+    """Write concern del perfil configurado para la colección (None = default del cliente)"""
+    profile = Config.MONGO_WRITE_CONCERNS.get(collection)
+    return WriteConcern(**profile) if profile else None
+
+
+_READ_MODES = {
+    "primary": Primary,
+    "primaryPreferred": PrimaryPreferred,
+    "secondary": Secondary,
+    "secondaryPreferred": SecondaryPreferred,
+    "nearest": Nearest
+}
+# Cualquiera de las read preferences públicas de pymongo
+ReadPreference = Union[Primary, PrimaryPreferred, Secondary, SecondaryPreferred, Nearest]
+
+
+def read_preference_for(mode: str, max_staleness_seconds: int = -1, tags: Optional[str] = None) -> ReadPreference:
+    """
+    Construye la read preference a partir de su nombre.
+
+    :param mode: primary, primaryPreferred, secondary, secondaryPreferred o nearest
+    :param max_staleness_seconds: Retraso máximo tolerado del secundario (-1 = sin límite)
+    :param tags: Tag set "clave:valor,clave:valor" para elegir miembros del replica set
+    """
+    if mode not in _READ_MODES:
+        raise ValueError(f"Read preference desconocida: {mode}")
+    if mode == "primary":
+        return Primary()
+    tag_sets = None
+    if tags:
+        tag_sets = [dict(pair.split(":", 1) for pair in tags.split(",")), {}]  # {} = cualquier miembro si no hay coincidencias
+    return _READ_MODES[mode](tag_sets=tag_sets, max_staleness=max_staleness_seconds)
+
+
+@lru_cache(maxsize=None)
+def admin_read_preference() -> ReadPreference:
+    """Read preference de las lecturas de administración (Config.MONGO_ADMIN_*)"""
+    return read_preference_for(
+        Config.MONGO_ADMIN_READ_PREFERENCE,
+        Config.MONGO_ADMIN_MAX_STALENESS_SECONDS,
+        Config.MONGO_ADMIN_READ_TAGS
+    )
+
+
 class MongoDatabase:
+    # None = aún no se sabe si el servidor admite bulkWrite de cliente (MongoDB >= 8.0)
+    _client_bulk_write: Optional[bool] = None
+
     def __init__(self) -> None:
         """Inicializa la conexión a MongoDB"""
         self.db_name = Config.MONGO_DB
         self.uri = Config.MONGO_URI_CLUSTER_X509
         self.client: Optional[MongoClient] = None
-        self.tls = True
         self.tlsCertificateKeyFile = Config.MONGODB_X509
-        self.server_api=ServerApi('1')
         self.db = None
         self.connect()
          # Configurar logger correctamente
@@ -33,25 +255,32 @@ class MongoDatabase:
             self.logger.addHandler(handler)
 
     def connect(self) -> None:
-        """Conecta a MongoDB"""
-        try:
-            self.client = MongoClient(self.uri, tls=self.tls, tlsCertificateKeyFile=self.tlsCertificateKeyFile, server_api=self.server_api,tz_aware=True, tzinfo=timezone.utc)
-            self.db = self.client[self.db_name]
-            ic(f"Conectado a MongoDB -> {self.db_name}")
-        except PyMongoError as e:
-            ic(f"Error al conectar a MongoDB: {e}")
-            raise
+        """Obtiene el cliente compartido del proceso"""
+        self.client = MongoClientRegistry.get_client(self.uri, self.tlsCertificateKeyFile)
+        self.db = self.client[self.db_name]
 
     def close(self) -> None:
-        """Cierra la conexión a MongoDB"""
-        if self.client:
-            self.client.close()
-            ic("Conexión a MongoDB cerrada")
+        """Libera la referencia al cliente (el pool compartido sigue abierto)"""
+        self.client = None
+        self.db = None
+
+    def _write_collection(self, collection: str):
+        """Colección con el write concern de su perfil de durabilidad"""
+        write_concern = write_concern_for(collection)
+        if write_concern is None:
+            return self.db[collection]
+        return self.db.get_collection(collection, write_concern=write_concern)
+
+    def _read_collection(self, collection: str, read_preference: Optional[ReadPreference] = None):
+        """Colección con la read preference pedida (None = la del cliente, primario)"""
+        if read_preference is None:
+            return self.db[collection]
+        return self.db.get_collection(collection, read_preference=read_preference)
 
     def insert_one(self, collection: str, document: dict) -> InsertOneResult:
         """Inserta un solo documento"""
         try:
-            return self.db[collection].insert_one(document)
+            return self._write_collection(collection).insert_one(document)
         except PyMongoError as e:
             ic(f"Error al insertar: {e}")
             raise
@@ -59,24 +288,84 @@ class MongoDatabase:
     def insert_many(self, collection: str, documents: list[dict]) -> list:
         """Inserta múltiples documentos"""
         try:
-            result = self.db[collection].insert_many(documents)
+            result = self._write_collection(collection).insert_many(documents)
             ic("Documentos insertados en batch correctamente")
             return result.inserted_ids
         except PyMongoError as e:
             ic(f"Error en batch insert: {e}")
             raise
 
-    def find(self, collection: str, query: Optional[dict] = None, projection: Optional[dict] = None) -> list[dict]:
+    def find(self, collection: str, query: Optional[dict] = None, projection: Optional[dict] = None,
+             read_preference: Optional[ReadPreference] = None) -> list[dict]:
         """Realiza una búsqueda y retorna una lista de documentos"""
         query = query or {}
         projection = projection or {}
         try:
-            result = list(self.db[collection].find(query, projection))
+            result = list(self._read_collection(collection, read_preference).find(query, projection))
             return result if result else None
         except PyMongoError as e:
             ic(f"Error en búsqueda: {e}")
             return None
 
+    def stream(self, collection: str, query: Optional[dict] = None, projection: Optional[dict] = None,
+               sort: Optional[list[tuple[str, int]]] = None, limit: int = 0, skip: int = 0,
+               batch_size: Optional[int] = None, max_time_ms: Optional[int] = None,
+               read_preference: Optional[ReadPreference] = None) -> Iterator[dict]:
+        """
+        Itera los documentos por lotes sin materializar el resultado completo.
+
+        :param sort: Lista de (campo, dirección), ej. [("login_at", -1)]
+        :param limit: Máximo de documentos (0 = sin límite)
+        :param batch_size: Documentos por getMore (default Config.MONGO_STREAM_BATCH_SIZE)
+        :param max_time_ms: Tiempo máximo del servidor (default Config.MONGO_MAX_TIME_MS, 0 = sin límite)
+        :param read_preference: Miembro del replica set que atiende la lectura (default primario)
+        """
+        cursor = self._read_collection(collection, read_preference).find(
+            query or {},
+            projection or None,
+            sort=sort,
+            limit=limit,
+            skip=skip,
+            batch_size=batch_size or Config.MONGO_STREAM_BATCH_SIZE,
+            max_time_ms=(max_time_ms if max_time_ms is not None else Config.MONGO_MAX_TIME_MS) or None
+        )
+        try:
+            yield from cursor
+        except PyMongoError as e:
+            ic(f"Error en stream: {e}")
+            raise
+        finally:
+            cursor.close()
+
+    def iter_batches(self, collection: str, query: Optional[dict] = None, projection: Optional[dict] = None,
+                     batch_size: Optional[int] = None, **kwargs) -> Iterator[list[dict]]:
+        """Agrupa stream() en listas de batch_size documentos"""
+        batch_size = batch_size or Config.MONGO_STREAM_BATCH_SIZE
+        batch = []
+        for doc in self.stream(collection, query, projection, batch_size=batch_size, **kwargs):
+            batch.append(doc)
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    def find_page(self, collection: str, query: Optional[dict] = None, projection: Optional[dict] = None,
+                  page: int = 1, page_size: int = 50, sort: Optional[list[tuple[str, int]]] = None,
+                  max_time_ms: Optional[int] = None, read_preference: Optional[ReadPreference] = None) -> dict:
+        """Devuelve una página de resultados; pide un documento extra para saber si hay siguiente"""
+        page = max(int(page), 1)
+        page_size = max(int(page_size), 1)
+        items = list(self.stream(collection, query, projection, sort=sort, skip=(page - 1) * page_size,
+                                 limit=page_size + 1, batch_size=page_size + 1, max_time_ms=max_time_ms,
+                                 read_preference=read_preference))
+        return {
+            "items": items[:page_size],
+            "page": page,
+            "page_size": page_size,
+            "has_next": len(items) > page_size
+        }
+
     def find_one(self, collection: str, query: Optional[dict] = None, projection: Optional[dict] = None) -> Optional[dict]:
         """Devuelve un solo documento"""
         query = query or {}
@@ -88,11 +377,22 @@ class MongoDatabase:
             ic(f"Error en find_one: {e}")
             return None
 
-    def count_documents(self, collection: str, filtro: Optional[dict] = None) -> int:
+    def find_one_and_update(self, collection: str, query: dict, update: dict, projection: Optional[dict] = None,
+                            upsert: bool = False, return_document: ReturnDocument = ReturnDocument.AFTER) -> Optional[dict]:
+        """Actualiza un documento y lo devuelve en una sola ida y vuelta (None si no coincide ninguno)"""
+        try:
+            return self._write_collection(collection).find_one_and_update(
+                query, update, projection=projection or None, upsert=upsert, return_document=return_document)
+        except PyMongoError as e:
+            ic(f"Error en find_one_and_update: {e}")
+            raise
+
+    def count_documents(self, collection: str, filtro: Optional[dict] = None,
+                        read_preference: Optional[ReadPreference] = None) -> int:
         """Cuenta documentos que cumplan cierto filtro (vacío = total)"""
         filtro = filtro or {}
         try:
-            return self.db[collection].count_documents(filtro)
+            return self._read_collection(collection, read_preference).count_documents(filtro)
         except PyMongoError as e:
             ic(f"Error en find_one: {e}")
             raise
@@ -100,7 +400,7 @@ class MongoDatabase:
     def update_many(self, collection: str, query: dict, update: dict):
         """Actualiza múltiples documentos que coincidan con la consulta"""
         try:
-            result = self.db[collection].update_many(filter=query,update=update,upsert=True)
+            result = self._write_collection(collection).update_many(filter=query,update=update,upsert=True)
             ic(f"Documentos coincidentes: {result.matched_count}")
             ic(f"Documentos modificados: {result.modified_count}")
             if result.modified_count > 0:
@@ -116,12 +416,12 @@ class MongoDatabase:
 
     def update_one_revoked(self, collection: str, query: dict, update: dict, upsert: bool) -> UpdateResult:
         """Actualiza un solo documento"""
-        return self.db[collection].update_one(query, update, upsert)
+        return self._write_collection(collection).update_one(query, update, upsert)
 
     def update_mark_token_as_used(self, collection: str, query: dict, update: dict, upsert: bool):
         """Actualiza un solo documento"""
         try:
-            result = self.db[collection].update_one(query, update, upsert)
+            result = self._write_collection(collection).update_one(query, update, upsert)
             if result.modified_count == 1:
                 ic(f"Documento actualizado exitosamente. {result.modified_count}")
             elif result.matched_count == 1 and result.modified_count == 0:
@@ -136,7 +436,7 @@ class MongoDatabase:
     def update_one(self, collection: str, query: dict, update: dict, upsert: bool):
         """Actualiza un solo documento"""
         try:
-            result = self.db[collection].update_one(query, update, upsert)
+            result = self._write_collection(collection).update_one(query, update, upsert)
             if result.modified_count == 1:
                 ic(f"Documento actualizado exitosamente. {result.modified_count}")
             elif result.matched_count == 1 and result.modified_count == 0:
@@ -151,7 +451,7 @@ class MongoDatabase:
     def delete_one(self, collection: str, query: dict) -> bool:
         """Elimina un documento"""
         try:
-            result = self.db[collection].delete_one(query)
+            result = self._write_collection(collection).delete_one(query)
             ic(f"Documentos eliminados: {result.deleted_count}")
             return result.deleted_count > 0
         except PyMongoError as e:
@@ -159,7 +459,7 @@ class MongoDatabase:
             raise
 
     def watch_sessions_for_admin(self):
-        with self.db["refresh_tokens"].watch() as stream:
+        with self.db[sessions_collection("refresh_tokens")].watch() as stream:
             ic("⏱️ Escuchando cambios en sesiones...")
             for change in stream:
                 ic("🔄 Cambio detectado:", json.dumps(change, indent=2))
@@ -170,48 +470,77 @@ class MongoDatabase:
                 # Enviar evento, notificación o actualizar cache, etc.
                 socketio.emit('admin_session_update', {"msg": "Sesión de admin actualizada"}, broadcast=True)
 
-    def insert_with_log(self, collection: str, document: dict, context: str = "") -> dict:
+    def watch_revocations(self, resume_after: Optional[dict] = None):
+        """Change stream de token_blacklist (insert/update/replace) con el documento completo; usar con with"""
+        pipeline = [{"$match": {"operationType": {"$in": ["insert", "update", "replace"]}}}]
+        ic("⏱️ Escuchando revocaciones en token_blacklist...")
+        return self.db["token_blacklist"].watch(pipeline, full_document="updateLookup", resume_after=resume_after)
+
+    @contextmanager
+    def _session_scope(self, transactional: bool):
         """
-        Realiza un insert_one seguro con manejo de errores y log contextual.
+        Abre sesión + transacción solo si se pide; las escrituras de un único
+        documento ya son atómicas y van directo a la colección (session=None).
+        """
+        if not transactional:
+            yield None
+            return
+        with self.client.start_session() as session:
+            with session.start_transaction():
+                yield session
 
-        :param collection: Colección PyMongo (db.coleccion)
-        :param document: Documento a insertar (dict)
-        :param context: Nombre del módulo o acción (ej: "Login", "AuditLog")
+    def run_in_transaction(self, callback: Callable[[ClientSession], Any], context: str = "") -> dict:
+        """
+        Ejecuta un flujo multi-documento dentro de una transacción.
+
+        :param callback: Función que recibe la sesión y realiza las operaciones
+        :param context: Contexto para el log (ej. "Rotar Token")
         :return: Dict con resultado y mensaje
         """
         prefix = f"[{context}] " if context else ""
 
         try:
             with self.client.start_session() as session:
-                with session.start_transaction():
-                    result: InsertOneResult = self.db[collection].insert_one(document, session=session)
-                    if result.acknowledged and result.inserted_id:
-                        msg = f"{prefix}✅ Documento insertado correctamente: {result.inserted_id}"
-                    else:
-                        msg = f"{prefix}⚠️ Inserción sin confirmación o sin ID."
-                    self.logger.info(msg)
-                    return {
-                        "success": True,
-                        "context": context,
-                        "acknowledged": result.acknowledged,
-                        "inserted_id": result.inserted_id,
-                        "message": msg
-                    }
- 
-        except PyMongoError as e:
-            msg = f"{prefix}❌ Error al insertar en MongoDB: {e.__class__.__name__}: {e}"
-            self.logger.error(msg)
-            ic(msg)
-            traceback.print_exc()
+                result = session.with_transaction(callback)
+            msg = f"{prefix}✅ Transacción confirmada."
+            self.logger.info(msg)
             return {
-                "success": False,
-                "error": str(e),
+                "success": True,
                 "context": context,
-                "trace": traceback.format_exc(),
+                "result": result,
                 "message": msg
             }
+        except PyMongoError as e:
+            summary = error_summary(e, "ejecutar la transacción", context)
+            self.logger.error(summary["message"])
+            traceback.print_exc()
+            return summary
+
+    def insert_with_log(self, collection: str, document: dict, context: str = "", transactional: bool = False) -> dict:
+        """
+        Realiza un insert_one seguro con manejo de errores y log contextual.
+
+        :param collection: Colección PyMongo (db.coleccion)
+        :param document: Documento a insertar (dict)
+        :param context: Nombre del módulo o acción (ej: "Login", "AuditLog")
+        :param transactional: Ejecutar dentro de una transacción (por defecto no)
+        :return: Dict con resultado y mensaje
+        """
+        try:
+            with self._session_scope(transactional) as session:
+                result: InsertOneResult = self._write_collection(collection).insert_one(document, session=session)
+            summary = insert_summary(result, context)
+            self.logger.info(summary["message"])
+            return summary
+ 
+        except PyMongoError as e:
+            summary = error_summary(e, "insertar", context)
+            self.logger.error(summary["message"])
+            ic(summary["message"])
+            traceback.print_exc()
+            return summary
 
-    def update_with_log(self, collection: str, query: dict, update: dict, upsert: bool, context: str = "") -> dict:
+    def update_with_log(self, collection: str, query: dict, update: dict, upsert: bool, context: str = "", transactional: bool = False) -> dict:
         """
         Realiza un update_one seguro con manejo de errores y log contextual.
 
@@ -219,60 +548,79 @@ class MongoDatabase:
         :param query: Filtro para seleccionar el documento a actualizar
         :param update: Operación de actualización (ej. {"$set": {...}})
         :param context: Contexto para el log (ej. "Logout", "AuditUpdate")
+        :param transactional: Ejecutar dentro de una transacción (por defecto no)
         :return: Diccionario con el resultado de la operación
         """
-        prefix = f"[{context}] " if context else ""
+        try:
+            with self._session_scope(transactional) as session:
+                result: UpdateResult = self._write_collection(collection).update_one(query, update, upsert, session=session)
+            summary = update_summary(result, context)
+            self.logger.info(summary["message"])
+            return summary
+
+        except PyMongoError as e:
+            summary = error_summary(e, "actualizar", context)
+            self.logger.error(summary["message"])
+            traceback.print_exc()
+            return summary
 
+    def bulk_write_with_log(self, writes: list[tuple[str, type, dict]], context: str = "") -> dict:
+        """
+        Escrituras independientes sobre varias colecciones en una sola ida y vuelta.
+
+        :param writes: (colección, InsertOne | UpdateOne | ..., kwargs de la operación)
+        :param context: Contexto para el log (ej. "Refresh")
+        :return: Dict con resultado, contadores y round_trips
+        Usa el bulkWrite de cliente (MongoDB >= 8.0) con el write concern de la
+        primera colección; en servidores anteriores, un bulk_write por colección.
+        """
+        if not writes:
+            return bulk_summary(0, 0, 0, context)
         try:
-            with self.client.start_session() as session:
-                with session.start_transaction():
-                    result: UpdateResult = self.db[collection].update_one(query, update, upsert, session=session)
-                    if result.matched_count == 0:
-                        msg = f"{prefix}⚠️ No se encontró ningún documento para actualizar."
-                    elif result.modified_count == 0:
-                        msg = f"{prefix}ℹ️ Documento encontrado, pero no hubo cambios (ya estaba actualizado)."
-                    else:
-                        msg = f"{prefix}✅ Documento actualizado correctamente."
-
-                    self.logger.info(msg)
-                    return {
-                        "success": True,
-                        "context": context,
-                        "matched_count": result.matched_count,
-                        "modified_count": result.modified_count,
-                        "acknowledged": result.acknowledged,
-                        "message": msg
-                    }
+            if MongoDatabase._client_bulk_write is not False and callable(getattr(type(self.client), "bulk_write", None)):
+                models = [op(**kwargs, namespace=f"{self.db.name}.{collection}") for collection, op, kwargs in writes]
+                try:
+                    result = self.client.bulk_write(models, write_concern=write_concern_for(writes[0][0]))
+                    MongoDatabase._client_bulk_write = True
+                    summary = bulk_summary(result.inserted_count, result.modified_count, 1, context)
+                    self.logger.info(summary["message"])
+                    return summary
+                except InvalidOperation:
+                    # Servidor < 8.0: el driver lo rechaza antes de enviar nada
+                    MongoDatabase._client_bulk_write = False
+
+            grouped: dict[str, list] = {}
+            for collection, op, kwargs in writes:
+                grouped.setdefault(collection, []).append(op(**kwargs))
+            inserted = modified = 0
+            for collection, models in grouped.items():
+                result = self._write_collection(collection).bulk_write(models)
+                inserted += result.inserted_count
+                modified += result.modified_count
+            summary = bulk_summary(inserted, modified, len(grouped), context)
+            self.logger.info(summary["message"])
+            return summary
 
         except PyMongoError as e:
-            msg = f"{prefix}❌ Error al actualizar en MongoDB: {e.__class__.__name__}: {e}"
-            self.logger.error(msg)
+            summary = error_summary(e, "escribir en lote", context)
+            self.logger.error(summary["message"])
             traceback.print_exc()
-            return {
-                "success": False,
-                "context": context,
-                "error": str(e),
-                "trace": traceback.format_exc(),
-                "message": msg
-            }
+            return summary
 
-    def aggregate(self, collection: str, pipeline: list):
+    def aggregate(self, collection: str, pipeline: list, transactional: bool = False,
+                  read_preference: Optional[ReadPreference] = None):
+        """Ejecuta el pipeline; dentro de una transacción se lee siempre del primario"""
         try:
-            with self.client.start_session() as session:
-                with session.start_transaction():
-                    result = list(self.db[collection].aggregate(pipeline=pipeline,session=session))
-                    self.logger.info("[AGGREGATE]: %s", result)
-                    return result
+            with self._session_scope(transactional) as session:
+                source = self.db[collection] if transactional else self._read_collection(collection, read_preference)
+                result = list(source.aggregate(pipeline=pipeline,session=session))
+            self.logger.info("[AGGREGATE]: %s", result)
+            return result
         except PyMongoError as e:
-            msg = f"❌ Error al List en MongoDB: {e.__class__.__name__}: {e}"
-            self.logger.error(msg)
+            summary = error_summary(e, "List")
+            self.logger.error(summary["message"])
             traceback.print_exc()
-            return {
-                "success": False,
-                "error": str(e),
-                "trace": traceback.format_exc(),
-                "message": msg
-            }
+            return summary
         
 
 
@@ -0,0 +1,166 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import asyncio
+import logging
+import os
+import traceback
+import weakref
+from datetime import timezone
+from typing import Optional
+
+from icecream import ic
+from pymongo import AsyncMongoClient
+from pymongo.errors import PyMongoError
+from pymongo.server_api import ServerApi
+
+from app.config import Config
+from app.utils.db_mongo import MongoClientRegistry, ReadPreference, error_summary, insert_summary, update_summary, write_concern_for
+
+
+class AsyncMongoClientRegistry:
+    """
+    Registro de AsyncMongoClient compartidos.
+
+    Un AsyncMongoClient queda ligado al event loop en el que se usa, así que
+    se guarda uno por (loop, uri, certificado); el pool se configura con las
+    mismas opciones que MongoClientRegistry.
+    """
+    _clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, dict]" = weakref.WeakKeyDictionary()
+    _pid: int = os.getpid()
+
+    @classmethod
+    def get_client(cls, uri: Optional[str] = None, tls_certificate_key_file: Optional[str] = None) -> AsyncMongoClient:
+        """Devuelve el cliente del event loop actual, creándolo si no existe"""
+        if cls._pid != os.getpid():
+            cls._clients = weakref.WeakKeyDictionary()
+            cls._pid = os.getpid()
+        uri = uri or Config.MONGO_URI_CLUSTER_X509
+        tls_certificate_key_file = tls_certificate_key_file or Config.MONGODB_X509
+        loop_clients = cls._clients.setdefault(asyncio.get_running_loop(), {})
+        key = (uri, tls_certificate_key_file)
+        if key not in loop_clients:
+            loop_clients[key] = AsyncMongoClient(
+                uri,
+                tls=True,
+                tlsCertificateKeyFile=tls_certificate_key_file,
+                server_api=ServerApi('1'),
+                tz_aware=True,
+                tzinfo=timezone.utc,
+                **MongoClientRegistry.pool_options()
+            )
+            ic(f"AsyncMongoClient creado para el proceso {os.getpid()}")
+        return loop_clients[key]
+
+    @classmethod
+    async def close_all(cls) -> None:
+        """Cierra los clientes del event loop actual"""
+        loop_clients = cls._clients.pop(asyncio.get_running_loop(), {})
+        for client in loop_clients.values():
+            await client.close()
+
+
+class AsyncMongoDatabase:
+    """
+    Variante asyncio de MongoDatabase con la misma API y los mismos
+    resultados (find_one, insert_with_log, update_with_log, aggregate, ...).
+    """
+
+    def __init__(self) -> None:
+        self.db_name = Config.MONGO_DB
+        self.uri = Config.MONGO_URI_CLUSTER_X509
+        self.tlsCertificateKeyFile = Config.MONGODB_X509
+        self.client: Optional[AsyncMongoClient] = None
+        self.db = None
+        self.logger = logging.getLogger("MongoMonitor")
+
+    def connect(self) -> None:
+        """Obtiene el cliente del event loop actual"""
+        self.client = AsyncMongoClientRegistry.get_client(self.uri, self.tlsCertificateKeyFile)
+        self.db = self.client[self.db_name]
+
+    def _collection(self, collection: str):
+        if self.db is None:
+            self.connect()
+        return self.db[collection]
+
+    def _read_collection(self, collection: str, read_preference: Optional[ReadPreference] = None):
+        """Colección con la read preference pedida (None = la del cliente, primario)"""
+        if read_preference is None:
+            return self._collection(collection)
+        if self.db is None:
+            self.connect()
+        return self.db.get_collection(collection, read_preference=read_preference)
+
+    def _write_collection(self, collection: str):
+        """Colección con el write concern de su perfil de durabilidad"""
+        write_concern = write_concern_for(collection)
+        if write_concern is None:
+            return self._collection(collection)
+        if self.db is None:
+            self.connect()
+        return self.db.get_collection(collection, write_concern=write_concern)
+
+    async def find(self, collection: str, query: Optional[dict] = None, projection: Optional[dict] = None) -> list[dict]:
+        """Realiza una búsqueda y retorna una lista de documentos"""
+        try:
+            result = await self._collection(collection).find(query or {}, projection or {}).to_list()
+            return result if result else None
+        except PyMongoError as e:
+            ic(f"Error en búsqueda: {e}")
+            return None
+
+    async def find_one(self, collection: str, query: Optional[dict] = None, projection: Optional[dict] = None) -> Optional[dict]:
+        """Devuelve un solo documento"""
+        try:
+            result = await self._collection(collection).find_one(query or {}, projection or {})
+            return result if result else None
+        except PyMongoError as e:
+            ic(f"Error en find_one: {e}")
+            return None
+
+    async def count_documents(self, collection: str, filtro: Optional[dict] = None,
+                              read_preference: Optional[ReadPreference] = None) -> int:
+        """Cuenta documentos que cumplan cierto filtro (vacío = total)"""
+        try:
+            return await self._read_collection(collection, read_preference).count_documents(filtro or {})
+        except PyMongoError as e:
+            ic(f"Error en count_documents: {e}")
+            raise
+
+    async def insert_with_log(self, collection: str, document: dict, context: str = "") -> dict:
+        """insert_one con el mismo resultado que MongoDatabase.insert_with_log"""
+        try:
+            result = await self._write_collection(collection).insert_one(document)
+            summary = insert_summary(result, context)
+            self.logger.info(summary["message"])
+            return summary
+        except PyMongoError as e:
+            summary = error_summary(e, "insertar", context)
+            self.logger.error(summary["message"])
+            traceback.print_exc()
+            return summary
+
+    async def update_with_log(self, collection: str, query: dict, update: dict, upsert: bool, context: str = "") -> dict:
+        """update_one con el mismo resultado que MongoDatabase.update_with_log"""
+        try:
+            result = await self._write_collection(collection).update_one(query, update, upsert)
+            summary = update_summary(result, context)
+            self.logger.info(summary["message"])
+            return summary
+        except PyMongoError as e:
+            summary = error_summary(e, "actualizar", context)
+            self.logger.error(summary["message"])
+            traceback.print_exc()
+            return summary
+
+    async def aggregate(self, collection: str, pipeline: list, read_preference: Optional[ReadPreference] = None):
+        try:
+            cursor = await self._read_collection(collection, read_preference).aggregate(pipeline)
+            result = await cursor.to_list()
+            self.logger.info("[AGGREGATE]: %s", result)
+            return result
+        except PyMongoError as e:
+            summary = error_summary(e, "List")
+            self.logger.error(summary["message"])
+            traceback.print_exc()
+            return summary
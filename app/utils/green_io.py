@@ -0,0 +1,42 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Verificación del modo de concurrencia con eventlet.
+
+El servidor de app.py corre sobre el hub de eventlet: si socket, select,
+thread y time no están parcheados, cada llamada bloqueante de pymongo
+(sockets, resolución SRV con dnspython, handshake TLS) congela el hub y el
+proceso atiende un request a la vez.
+"""
+import sys
+from typing import Iterable
+
+from icecream import ic
+
+# Módulos que eventlet.monkey_patch() debe haber reemplazado
+REQUIRED_PATCHES = ("socket", "select", "thread", "time")
+# Módulos que deben importarse después del parche (capturan primitivas al importarse).
+# app.py los busca en sys.modules antes de llamar a eventlet.monkey_patch().
+LATE_IMPORTS = ("pymongo",)
+
+
+def green_io_problems(preloaded: Iterable[str] = ()) -> list[str]:
+    """Devuelve la lista de motivos por los que la I/O no es cooperativa"""
+    from eventlet import patcher
+
+    problems = [f"'{name}' no está parcheado" for name in REQUIRED_PATCHES if not patcher.is_monkey_patched(name)]
+    problems += [f"'{name}' se importó antes de eventlet.monkey_patch()" for name in sorted(preloaded)]
+
+    if "dns.query" in sys.modules:
+        dns_socket = getattr(sys.modules["dns.query"], "socket", None)
+        if dns_socket is not None and not dns_socket.socket.__module__.startswith("eventlet"):
+            problems.append("dnspython usa sockets bloqueantes (resolución SRV)")
+    return problems
+
+
+def ensure_green_io(preloaded: Iterable[str] = ()) -> None:
+    """Se niega a arrancar el servidor eventlet en un estado parcialmente parcheado"""
+    problems = green_io_problems(preloaded)
+    if problems:
+        raise RuntimeError("I/O no cooperativa con eventlet: " + "; ".join(problems))
+    ic("✅ I/O cooperativa con eventlet (socket, dns, tls, pymongo)")
@@ -0,0 +1,198 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import base64
+import hashlib
+import json
+import os
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Optional
+
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import ec, ed25519, rsa
+from icecream import ic
+from jwt.algorithms import ECAlgorithm, OKPAlgorithm, RSAAlgorithm
+
+from app.config import Config
+
+# Miembros obligatorios de cada tipo de clave para el thumbprint (RFC 7638)
+_THUMBPRINT_MEMBERS = {"RSA": ("e", "kty", "n"), "EC": ("crv", "kty", "x", "y"), "OKP": ("crv", "kty", "x")}
+
+
+def public_jwk(public_key) -> dict:
+    """JWK público (sin kid) de una clave RSA, EC o Ed25519"""
+    if isinstance(public_key, rsa.RSAPublicKey):
+        jwk = RSAAlgorithm.to_jwk(public_key, as_dict=True)
+        jwk.pop("key_ops", None)
+        return {**jwk, "alg": "RS256"}
+    if isinstance(public_key, ec.EllipticCurvePublicKey):
+        if not isinstance(public_key.curve, ec.SECP256R1):
+            raise ValueError(f"Curva no soportada: {public_key.curve.name} (ES256 requiere P-256)")
+        return {**ECAlgorithm.to_jwk(public_key, as_dict=True), "alg": "ES256"}
+    if isinstance(public_key, ed25519.Ed25519PublicKey):
+        return {**OKPAlgorithm.to_jwk(public_key, as_dict=True), "alg": "EdDSA"}
+    raise ValueError(f"Tipo de clave no soportado: {type(public_key).__name__}")
+
+
+def key_paths(algorithm: str) -> tuple[Optional[str], Optional[str]]:
+    """(privada, pública) configuradas para el algoritmo"""
+    if algorithm == "RS256":
+        return Config.PATH_PRIVATE_KEY, Config.PATH_PUBLIC_KEY
+    if algorithm == "ES256":
+        return Config.PATH_PRIVATE_KEY_ES256, Config.PATH_PUBLIC_KEY_ES256
+    if algorithm == "EdDSA":
+        return Config.PATH_PRIVATE_KEY_EDDSA, Config.PATH_PUBLIC_KEY_EDDSA
+    raise ValueError(f"Algoritmo JWT no soportado: {algorithm}")
+
+
+def key_id(public_key) -> str:
+    """kid = thumbprint SHA-256 del JWK (RFC 7638); estable entre procesos y reinicios"""
+    jwk = public_jwk(public_key)
+    members = {name: jwk[name] for name in _THUMBPRINT_MEMBERS[jwk["kty"]]}
+    digest = hashlib.sha256(json.dumps(members, separators=(",", ":"), sort_keys=True).encode()).digest()
+    return base64.urlsafe_b64encode(digest).rstrip(b"=").decode()
+
+
+@dataclass(frozen=True)
+class _KeyEntry:
+    key: Any
+    kid: Optional[str]
+    algorithm: Optional[str]
+    stamp: Optional[tuple[int, int]]  # (mtime_ns, tamaño) del PEM al cargarlo
+    checked_at: float
+
+
+class KeyRing:
+    """
+    Anillo de claves PEM compartido por proceso.
+
+    Cada archivo se lee y parsea una sola vez; los TokenGenerator reutilizan
+    el objeto de clave ya construido. Como mucho cada
+    Config.JWT_KEY_RELOAD_CHECK_SECONDS se hace un stat() del archivo y, si
+    cambió su mtime o su tamaño, la clave se recarga sin reiniciar el proceso.
+
+    Rotación: las claves públicas anteriores se dejan en
+    Config.JWT_PREVIOUS_KEYS_DIR; se siguen aceptando las
+    Config.JWT_KEY_HISTORY más recientes.
+    """
+    _entries: dict[tuple[str, bool], _KeyEntry] = {}
+    _previous: tuple[float, tuple[str, ...]] = (float("-inf"), ())
+    _lock = threading.Lock()
+    loads = 0  # lecturas + parseos de PEM realizados (para métricas/tests)
+
+    @classmethod
+    def get(cls, path: Optional[str], is_private: bool = False):
+        """Clave privada/pública de path (None si el archivo no existe)"""
+        entry = cls._entry(path, is_private)
+        return entry.key if entry else None
+
+    @classmethod
+    def kid(cls, path: Optional[str], is_private: bool = False) -> Optional[str]:
+        """kid de la clave de path (para una privada, el de su clave pública)"""
+        entry = cls._entry(path, is_private)
+        return entry.kid if entry else None
+
+    @classmethod
+    def algorithm(cls, path: Optional[str], is_private: bool = False) -> Optional[str]:
+        """Algoritmo JWS que corresponde al tipo de la clave (RS256, ES256, EdDSA)"""
+        entry = cls._entry(path, is_private)
+        return entry.algorithm if entry else None
+
+    @classmethod
+    def _entry(cls, path: Optional[str], is_private: bool) -> Optional[_KeyEntry]:
+        if not path:
+            return None
+        key = (path, is_private)
+        entry = cls._entries.get(key)
+        now = time.monotonic()
+        if entry is not None and now - entry.checked_at < Config.JWT_KEY_RELOAD_CHECK_SECONDS:
+            return entry
+        with cls._lock:
+            entry = cls._entries.get(key)
+            stamp = cls._stamp(path)
+            if entry is None or entry.stamp != stamp:
+                if entry is not None:
+                    ic(f"🔁 Clave {'privada' if is_private else 'pública'} modificada en disco, recargando {path}")
+                loaded = cls._load(path, is_private)
+                kid = algorithm = None
+                if loaded is not None:
+                    public = loaded.public_key() if is_private else loaded
+                    kid, algorithm = key_id(public), public_jwk(public)["alg"]
+                entry = _KeyEntry(loaded, kid, algorithm, stamp, now)
+            else:
+                entry = _KeyEntry(entry.key, entry.kid, entry.algorithm, stamp, now)
+            cls._entries[key] = entry
+            return entry
+
+    @staticmethod
+    def _stamp(path: str) -> Optional[tuple[int, int]]:
+        try:
+            st = os.stat(path)
+            return st.st_mtime_ns, st.st_size
+        except FileNotFoundError:
+            return None
+
+    @classmethod
+    def _load(cls, path: str, is_private: bool):
+        try:
+            with open(path, "rb") as f:
+                content = f.read()
+            cls.loads += 1
+            return serialization.load_pem_private_key(content, password=None) if is_private else serialization.load_pem_public_key(content)
+        except FileNotFoundError:
+            ic(f"⚠️ Clave {'privada' if is_private else 'pública'} no encontrada en {path}")
+            return None
+
+    @classmethod
+    def previous_public_paths(cls) -> tuple[str, ...]:
+        """PEM públicos de JWT_PREVIOUS_KEYS_DIR, del más reciente al más antiguo (máx. JWT_KEY_HISTORY)"""
+        directory = Config.JWT_PREVIOUS_KEYS_DIR
+        if not directory or Config.JWT_KEY_HISTORY <= 0:
+            return ()
+        checked_at, paths = cls._previous
+        now = time.monotonic()
+        if now - checked_at < Config.JWT_KEY_RELOAD_CHECK_SECONDS:
+            return paths
+        try:
+            candidates = [os.path.join(directory, name) for name in os.listdir(directory) if name.endswith(".pem")]
+            candidates.sort(key=lambda p: os.stat(p).st_mtime_ns, reverse=True)
+        except FileNotFoundError:
+            candidates = []
+        paths = tuple(candidates[:Config.JWT_KEY_HISTORY])
+        cls._previous = (now, paths)
+        return paths
+
+    @classmethod
+    def verification_keys(cls) -> dict[str, Any]:
+        """kid -> clave pública: las actuales de cada algoritmo aceptado y las anteriores aún aceptadas"""
+        return {kid: entry.key for kid, entry in cls._verification_entries().items()}
+
+    @classmethod
+    def verification_key(cls, kid: str) -> tuple[Any, Optional[str]]:
+        """(clave pública, algoritmo) del kid; (None, None) si no se acepta"""
+        entry = cls._verification_entries().get(kid)
+        return (entry.key, entry.algorithm) if entry else (None, None)
+
+    @classmethod
+    def _verification_entries(cls) -> dict[str, _KeyEntry]:
+        accepted = Config.JWT_ACCEPTED_ALGORITHMS
+        current = [key_paths(algorithm)[1] for algorithm in accepted]
+        entries = {}
+        for path in (*current, *cls.previous_public_paths()):
+            entry = cls._entry(path, is_private=False)
+            if entry and entry.key is not None and entry.algorithm in accepted:
+                entries.setdefault(entry.kid, entry)
+        return entries
+
+    @classmethod
+    def jwks(cls) -> dict:
+        """Documento JWKS (RFC 7517) con las claves de verificación"""
+        return {"keys": [{**public_jwk(key), "kid": kid, "use": "sig"} for kid, key in cls.verification_keys().items()]}
+
+    @classmethod
+    def clear(cls) -> None:
+        """Olvida las claves cargadas (se vuelven a leer en el próximo get)"""
+        with cls._lock:
+            cls._entries = {}
+            cls._previous = (float("-inf"), ())
@@ -0,0 +1,164 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Métricas de comandos MongoDB por endpoint.
+
+CommandMetrics es un CommandListener de pymongo: cada comando (find, insert,
+update, aggregate, getMore, ...) se agrega en un histograma de latencia por
+(endpoint de Flask, colección, comando), junto con los documentos devueltos
+y los fallos. Permite ver, por ejemplo, si /api/auth/refresh es lento por
+refresh_tokens, active_sessions o session_audit.
+"""
+import bisect
+import logging
+import threading
+import time
+from typing import Optional
+
+from flask import has_request_context, request
+from pymongo import monitoring
+
+# Límites superiores (ms) de los buckets del histograma; el último es +inf
+BUCKETS_MS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500)
+# Comandos cuyo primer campo no es la colección
+_COLLECTION_FIELD = {"getMore": "collection"}
+
+
+def _collection_of(event: monitoring.CommandStartedEvent) -> str:
+    field = _COLLECTION_FIELD.get(event.command_name, event.command_name)
+    value = event.command.get(field)
+    return value if isinstance(value, str) else "-"
+
+
+def _current_endpoint() -> str:
+    # Solo endpoints registrados: una URL sin ruta (404) no abre una clave nueva
+    if has_request_context():
+        return request.endpoint or "-"
+    return "-"
+
+
+def _documents_returned(reply: dict) -> int:
+    cursor = reply.get("cursor")
+    if isinstance(cursor, dict):
+        return len(cursor.get("firstBatch") or cursor.get("nextBatch") or [])
+    return int(reply.get("n", 0) or 0)
+
+
+class CommandStats:
+    """Histograma y contadores de un (endpoint, colección, comando)"""
+
+    __slots__ = ("count", "failures", "total_ms", "max_ms", "documents", "buckets")
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.failures = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.documents = 0
+        self.buckets = [0] * (len(BUCKETS_MS) + 1)
+
+    def observe(self, duration_ms: float, documents: int = 0, failed: bool = False) -> None:
+        self.count += 1
+        self.failures += int(failed)
+        self.total_ms += duration_ms
+        self.max_ms = max(self.max_ms, duration_ms)
+        self.documents += documents
+        self.buckets[bisect.bisect_left(BUCKETS_MS, duration_ms)] += 1
+
+    def percentile(self, q: float) -> Optional[float]:
+        """Cota superior (ms) del bucket que contiene el percentil q"""
+        if not self.count:
+            return None
+        target = q * self.count
+        seen = 0
+        for i, n in enumerate(self.buckets):
+            seen += n
+            if seen >= target:
+                return float(BUCKETS_MS[i]) if i < len(BUCKETS_MS) else self.max_ms
+        return self.max_ms
+
+    def to_json(self) -> dict:
+        return {
+            "count": self.count,
+            "failures": self.failures,
+            "avg_ms": round(self.total_ms / self.count, 3) if self.count else 0.0,
+            "p50_ms": self.percentile(0.5),
+            "p95_ms": self.percentile(0.95),
+            "p99_ms": self.percentile(0.99),
+            "max_ms": round(self.max_ms, 3),
+            "documents": self.documents,
+            "buckets": dict(zip([f"le_{b}" for b in BUCKETS_MS] + ["inf"], self.buckets))
+        }
+
+
+class CommandMetrics(monitoring.CommandListener):
+    """CommandListener que agrega los comandos en histogramas en memoria"""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._stats: dict[tuple[str, str, str], CommandStats] = {}
+        # (connection_id, request_id) -> (endpoint, colección) entre started y succeeded/failed
+        self._pending: dict[tuple, tuple[str, str]] = {}
+        self.started_at = time.time()
+
+    def started(self, event: monitoring.CommandStartedEvent) -> None:
+        self._pending[(event.connection_id, event.request_id)] = (_current_endpoint(), _collection_of(event))
+
+    def succeeded(self, event: monitoring.CommandSucceededEvent) -> None:
+        self._record(event, _documents_returned(event.reply), failed=False)
+
+    def failed(self, event: monitoring.CommandFailedEvent) -> None:
+        self._record(event, 0, failed=True)
+
+    def _record(self, event, documents: int, failed: bool) -> None:
+        endpoint, collection = self._pending.pop((event.connection_id, event.request_id), ("-", "-"))
+        key = (endpoint, collection, event.command_name)
+        with self._lock:
+            stats = self._stats.get(key)
+            if stats is None:
+                stats = self._stats[key] = CommandStats()
+            stats.observe(event.duration_micros / 1000.0, documents, failed)
+
+    def snapshot(self, endpoint: Optional[str] = None) -> list[dict]:
+        """Agregados ordenados por tiempo total (descendente)"""
+        with self._lock:
+            items = [(key, stats.to_json(), stats.total_ms) for key, stats in self._stats.items()
+                     if endpoint is None or key[0] == endpoint]
+        items.sort(key=lambda item: item[2], reverse=True)
+        return [{"endpoint": e, "collection": c, "command": cmd, **data} for (e, c, cmd), data, _ in items]
+
+    def reset(self) -> None:
+        with self._lock:
+            self._stats.clear()
+            self.started_at = time.time()
+
+    def log_line(self, top: int = 5) -> str:
+        """Resumen de una línea con los comandos que más tiempo acumulan"""
+        parts = [
+            f"{s['endpoint']} {s['collection']}.{s['command']} n={s['count']} avg={s['avg_ms']}ms "
+            f"p95={s['p95_ms']}ms fail={s['failures']}"
+            for s in self.snapshot()[:top]
+        ]
+        return "[MONGO METRICS] " + (" | ".join(parts) if parts else "sin comandos")
+
+
+command_metrics = CommandMetrics()
+
+_log_task_started = False
+
+
+def start_metrics_log(interval: int) -> None:
+    """Escribe periódicamente un resumen de command_metrics (interval <= 0 lo desactiva)"""
+    global _log_task_started
+    if interval <= 0 or _log_task_started:
+        return
+    _log_task_started = True
+    from app.extensions import socketio
+    logger = logging.getLogger("MongoMonitor")
+
+    def _loop():
+        while True:
+            socketio.sleep(interval)
+            logger.info(command_metrics.log_line())
+
+    socketio.start_background_task(_loop)
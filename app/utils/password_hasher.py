@@ -0,0 +1,130 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Hashers de contraseñas intercambiables.
+
+El algoritmo y su costo se eligen en Config (PASSWORD_HASHER y parámetros);
+la verificación acepta cualquier formato conocido y lee el costo del propio
+hash, así que cambiar la configuración no invalida contraseñas existentes:
+needs_rehash() indica cuáles deben re-hashearse en el próximo login.
+argon2id requiere el paquete opcional argon2-cffi.
+"""
+from functools import lru_cache
+
+import bcrypt
+
+from app.config import Config
+
+
+class BcryptHasher:
+    """bcrypt ($2b$) con número de rondas configurable (costo = 2^rounds)"""
+    name = "bcrypt"
+
+    def __init__(self, rounds: int = 12) -> None:
+        self.rounds = rounds
+
+    @staticmethod
+    def identifies(hashed: str) -> bool:
+        return hashed.startswith(("$2a$", "$2b$", "$2y$"))
+
+    def hash(self, plain_password: str) -> str:
+        return bcrypt.hashpw(plain_password.encode("utf-8"), bcrypt.gensalt(rounds=self.rounds)).decode("utf-8")
+
+    def verify(self, plain_password: str, hashed: str) -> bool:
+        try:
+            return bcrypt.checkpw(plain_password.encode("utf-8"), hashed.encode("utf-8"))
+        except ValueError:
+            return False  # hash malformado
+
+    def needs_rehash(self, hashed: str) -> bool:
+        if not self.identifies(hashed):
+            return True
+        try:
+            return int(hashed.split("$")[2]) != self.rounds
+        except (IndexError, ValueError):
+            return True
+
+    def params(self) -> dict:
+        return {"rounds": self.rounds}
+
+
+class Argon2Hasher:
+    """argon2id con costo de tiempo, memoria (KiB) y paralelismo configurables"""
+    name = "argon2id"
+
+    def __init__(self, time_cost: int = 3, memory_kib: int = 65536, parallelism: int = 4) -> None:
+        try:
+            from argon2 import PasswordHasher, Type
+        except ImportError as e:
+            raise RuntimeError("argon2id requiere el paquete argon2-cffi (pip install argon2-cffi)") from e
+        self.time_cost, self.memory_kib, self.parallelism = time_cost, memory_kib, parallelism
+        self._hasher = PasswordHasher(time_cost=time_cost, memory_cost=memory_kib,
+                                      parallelism=parallelism, type=Type.ID)
+
+    @staticmethod
+    def identifies(hashed: str) -> bool:
+        return hashed.startswith("$argon2id$")
+
+    def hash(self, plain_password: str) -> str:
+        return self._hasher.hash(plain_password)
+
+    def verify(self, plain_password: str, hashed: str) -> bool:
+        from argon2.exceptions import InvalidHashError, VerificationError
+        try:
+            return self._hasher.verify(hashed, plain_password)
+        except (VerificationError, InvalidHashError):
+            return False
+
+    def needs_rehash(self, hashed: str) -> bool:
+        if not self.identifies(hashed):
+            return True
+        from argon2.exceptions import InvalidHashError
+        try:
+            return self._hasher.check_needs_rehash(hashed)
+        except InvalidHashError:
+            return True
+
+    def params(self) -> dict:
+        return {"time_cost": self.time_cost, "memory_kib": self.memory_kib, "parallelism": self.parallelism}
+
+
+HASHERS = {"bcrypt": BcryptHasher, "argon2id": Argon2Hasher}
+
+
+def build_hasher(name: str, **params):
+    if name not in HASHERS:
+        raise ValueError(f"Hasher de contraseñas no soportado: {name}")
+    return HASHERS[name](**params)
+
+
+@lru_cache(maxsize=1)
+def password_hasher():
+    """Hasher configurado para los hashes nuevos (Config.PASSWORD_HASHER)"""
+    if Config.PASSWORD_HASHER == "argon2id":
+        return build_hasher("argon2id", time_cost=Config.PASSWORD_ARGON2_TIME_COST,
+                            memory_kib=Config.PASSWORD_ARGON2_MEMORY_KIB,
+                            parallelism=Config.PASSWORD_ARGON2_PARALLELISM)
+    return build_hasher(Config.PASSWORD_HASHER, rounds=Config.PASSWORD_BCRYPT_ROUNDS)
+
+
+def hasher_for(hashed: str):
+    """Hasher capaz de verificar hashed (el configurado si coincide el formato)"""
+    current = password_hasher()
+    if current.identifies(hashed):
+        return current
+    if Argon2Hasher.identifies(hashed):
+        return Argon2Hasher()
+    return BcryptHasher()  # el costo de bcrypt va en el hash; rounds solo afecta a hash()
+
+
+def hash_password(plain_password: str) -> str:
+    return password_hasher().hash(plain_password)
+
+
+def verify_password(plain_password: str, hashed: str) -> bool:
+    return hasher_for(hashed).verify(plain_password, hashed)
+
+
+def needs_rehash(hashed: str) -> bool:
+    """True si hashed no usa el algoritmo o los parámetros configurados"""
+    return password_hasher().needs_rehash(hashed)
@@ -0,0 +1,48 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+from collections import Counter
+from typing import Callable, Optional, TypeVar
+
+from flask import g, has_request_context
+
+T = TypeVar("T")
+
+
+class RequestContainer:
+    """
+    Contenedor de servicios y DAOs con alcance de request.
+
+    Vive en flask.g: cada clase se construye como mucho una vez por request y
+    la misma instancia se comparte entre rutas, guards, servicios y DAOs.
+    """
+
+    def __init__(self) -> None:
+        self._instances: dict[type, object] = {}
+        self.built = Counter()
+
+    @property
+    def constructed(self) -> int:
+        """Objetos construidos en este request"""
+        return sum(self.built.values())
+
+    def get(self, cls: type[T], factory: Optional[Callable[[], T]] = None) -> T:
+        instance = self._instances.get(cls)
+        if instance is None:
+            instance = factory() if factory else cls()
+            self._instances[cls] = instance
+            self.built[cls.__name__] += 1
+        return instance
+
+
+def request_container() -> RequestContainer:
+    """Contenedor del request actual (se crea al primer uso)"""
+    if "container" not in g:
+        g.container = RequestContainer()
+    return g.container
+
+
+def provide(cls: type[T], factory: Optional[Callable[[], T]] = None) -> T:
+    """Instancia compartida de cls en el request actual; fuera de un request, una nueva"""
+    if not has_request_context():
+        return factory() if factory else cls()
+    return request_container().get(cls, factory)
@@ -0,0 +1,290 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Conjunto en memoria de jti revocados, sincronizado con token_blacklist.
+
+Los guards consultan RevocationSet.is_revoked(jti) en cada request sin ir
+a Mongo. Un filtro de Bloom descarta con unas pocas lecturas de bits los
+jti no revocados (el caso normal); sus positivos se confirman contra el set
+exacto. Al arrancar se cargan de token_blacklist las revocaciones cuyo token
+aún puede estar vigente y después un change stream agrega cada revocación
+nueva; sin replica set (no hay change streams) se consulta periódicamente
+por revoked_at. Cada jti se descarta cuando su token expira.
+"""
+import hashlib
+import math
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Iterable, Optional
+
+import jwt
+from icecream import ic
+from pymongo.errors import OperationFailure, PyMongoError
+
+from app.config import Config
+
+
+# Vida de los tokens si no hay ACCESS_TOKEN_* configurados
+_DEFAULT_TOKEN_LIFETIME = 24 * 3600
+BLACKLIST_PROJECTION = {"_id": 0, "jti": 1, "token": 1, "revoked_at": 1}
+
+
+
+class BloomFilter:
+    """Filtro de Bloom con doble hashing sobre SHA-256"""
+
+    def __init__(self, capacity: int, error_rate: float = 0.001) -> None:
+        self.capacity = max(1, capacity)
+        self.error_rate = error_rate
+        self.size = max(8, int(-self.capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / self.capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, value: str) -> Iterable[int]:
+        digest = hashlib.sha256(value.encode()).digest()
+        h1, h2 = int.from_bytes(digest[:8], "big"), int.from_bytes(digest[8:16], "big") | 1
+        return ((h1 + i * h2) % self.size for i in range(self.hashes))
+
+    def add(self, value: str) -> None:
+        for pos in self._positions(value):
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+        self.count += 1
+
+    def __contains__(self, value: str) -> bool:
+        return all(self.bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(value))
+
+
+def token_lifetime() -> int:
+    """Vida máxima de un access token (segundos): pasado ese tiempo su revocación ya no hace falta"""
+    values = (Config.ACCESS_TOKEN_EXP_SECONDS, Config.ACCESS_TOKEN_EXP_ADMIN, Config.ACCESS_TOKEN_GLOBAL_EXP_SECONDS)
+    return max((int(v) for v in values if v), default=_DEFAULT_TOKEN_LIFETIME)
+
+
+class RevocationSet:
+    """Revocaciones por jti del proceso (Bloom + dict exacto jti → expiración del token)"""
+    _bloom = BloomFilter(Config.REVOCATION_BLOOM_CAPACITY, Config.REVOCATION_BLOOM_ERROR_RATE)
+    _exact: dict[str, float] = {}
+    _lock = threading.Lock()
+    ready = False          # True tras cargar token_blacklist
+    synced_at: Optional[float] = None
+    pruned_at = 0.0
+    checks = 0
+    bloom_positives = 0
+    false_positives = 0
+
+    @classmethod
+    def add(cls, jti: Optional[str], expires_at: Optional[float] = None) -> None:
+        """expires_at: exp (epoch) del token revocado; por defecto ahora + token_lifetime()"""
+        if not jti:
+            return
+        expires_at = expires_at if expires_at is not None else time.time() + token_lifetime()
+        with cls._lock:
+            if jti in cls._exact:
+                cls._exact[jti] = max(cls._exact[jti], expires_at)
+                return
+            if cls._bloom.count >= cls._bloom.capacity:
+                # Primero se descartan los vencidos; solo si sigue lleno se duplica
+                cls._prune_locked()
+                if cls._bloom.count >= cls._bloom.capacity:
+                    cls._rebuild(cls._bloom.capacity * 2)
+            cls._exact[jti] = expires_at
+            cls._bloom.add(jti)
+
+    @classmethod
+    def add_many(cls, jtis: Iterable[Optional[str]]) -> None:
+        for jti in jtis:
+            cls.add(jti)
+
+    @classmethod
+    def add_entries(cls, entries: Iterable[dict]) -> None:
+        """Entradas de token_blacklist (jti, token, revoked_at)"""
+        for entry in entries:
+            cls.add(cls.jti_of(entry), cls.expiry_of(entry))
+
+    @classmethod
+    def _rebuild(cls, capacity: int) -> None:
+        bloom = BloomFilter(capacity, Config.REVOCATION_BLOOM_ERROR_RATE)
+        for jti in cls._exact:
+            bloom.add(jti)
+        cls._bloom = bloom
+
+    @classmethod
+    def prune(cls) -> int:
+        """Quita los jti cuyos tokens ya expiraron; devuelve cuántos"""
+        with cls._lock:
+            return cls._prune_locked()
+
+    @classmethod
+    def _prune_locked(cls) -> int:
+        now = time.time()
+        cls.pruned_at = now
+        expired = [jti for jti, expires_at in cls._exact.items() if expires_at <= now]
+        if expired:
+            for jti in expired:
+                del cls._exact[jti]
+            # Un Bloom no admite borrados: se reconstruye con los vigentes
+            cls._rebuild(cls._bloom.capacity)
+        return len(expired)
+
+    @classmethod
+    def is_revoked(cls, jti: Optional[str]) -> bool:
+        """Consulta en memoria; nunca va a la base"""
+        if not jti:
+            return False
+        cls.checks += 1
+        if jti not in cls._bloom:
+            return False
+        cls.bloom_positives += 1
+        if jti in cls._exact:
+            return True
+        cls.false_positives += 1
+        return False
+
+    @staticmethod
+    def _claims_of(entry: dict) -> dict:
+        token = entry.get("token")
+        if not token:
+            return {}
+        try:
+            return jwt.decode(token, options={"verify_signature": False})
+        except jwt.InvalidTokenError:
+            return {}
+
+    @classmethod
+    def jti_of(cls, entry: dict) -> Optional[str]:
+        """jti de una entrada de token_blacklist (las antiguas solo guardan el token)"""
+        return entry.get("jti") or cls._claims_of(entry).get("jti")
+
+    @classmethod
+    def expiry_of(cls, entry: dict) -> float:
+        """exp del token revocado; sin exp legible, revoked_at + token_lifetime()"""
+        exp = cls._claims_of(entry).get("exp")
+        if isinstance(exp, (int, float)):
+            return float(exp)
+        revoked_at = entry.get("revoked_at")
+        if isinstance(revoked_at, datetime):
+            if revoked_at.tzinfo is None:
+                revoked_at = revoked_at.replace(tzinfo=timezone.utc)
+            return revoked_at.timestamp() + token_lifetime()
+        return time.time() + token_lifetime()
+
+    @staticmethod
+    def live_query(since: Optional[datetime] = None) -> dict:
+        """Revocaciones cuyo token aún puede estar vigente (revocado hace menos de token_lifetime())"""
+        oldest = datetime.now(timezone.utc) - timedelta(seconds=token_lifetime())
+        return {"revoked_at": {"$gte": max(since, oldest) if since else oldest}}
+
+    @classmethod
+    def bootstrap(cls, db) -> int:
+        """Carga las revocaciones aún vigentes de token_blacklist; devuelve cuántos jti hay en memoria"""
+        # Ventana acotada por token_lifetime(): sin el maxTimeMS de las lecturas normales
+        entries = db.stream("token_blacklist", cls.live_query(), BLACKLIST_PROJECTION, max_time_ms=0)
+        cls.add_entries(entries)
+        cls.ready = True
+        cls.synced_at = time.time()
+        ic(f"🚫 Revocaciones cargadas en memoria: {len(cls._exact)}")
+        return len(cls._exact)
+
+    @classmethod
+    def apply_change(cls, change: dict) -> None:
+        entry = change.get("fullDocument") or {}
+        if entry.get("revoked_at") is not None:
+            cls.add(cls.jti_of(entry), cls.expiry_of(entry))
+        cls.synced_at = time.time()
+        if cls.synced_at - cls.pruned_at >= Config.REVOCATION_POLL_SECONDS:
+            cls.prune()
+
+    @classmethod
+    def stats(cls) -> dict:
+        with cls._lock:
+            return {
+                "ready": cls.ready,
+                "size": len(cls._exact),
+                "bloom_capacity": cls._bloom.capacity,
+                "bloom_bits": cls._bloom.size,
+                "bloom_hashes": cls._bloom.hashes,
+                "checks": cls.checks,
+                "bloom_positives": cls.bloom_positives,
+                "false_positives": cls.false_positives,
+                "synced_at": cls.synced_at
+            }
+
+    @classmethod
+    def clear(cls) -> None:
+        with cls._lock:
+            cls._bloom = BloomFilter(Config.REVOCATION_BLOOM_CAPACITY, Config.REVOCATION_BLOOM_ERROR_RATE)
+            cls._exact = {}
+            cls.ready = False
+            cls.synced_at = None
+            cls.pruned_at = 0.0
+            cls.checks = cls.bloom_positives = cls.false_positives = 0
+
+
+# Código de error de Mongo cuando no hay replica set (change streams no disponibles)
+_CHANGE_STREAMS_UNSUPPORTED = 40573
+_CHANGE_STREAM_HISTORY_LOST = 286
+
+_sync_started = False
+
+
+def start_revocation_sync() -> None:
+    """Carga token_blacklist y mantiene RevocationSet al día en segundo plano"""
+    global _sync_started
+    if not Config.REVOCATION_SYNC or _sync_started:
+        return
+    _sync_started = True
+    from app.extensions import socketio
+    from app.utils.db_mongo import MongoDatabase
+
+    def _loop():
+        db = MongoDatabase()
+        resume_after = None
+        polling = False
+        while not polling:
+            try:
+                with db.watch_revocations(resume_after) as stream:
+                    # Carga inicial con el stream ya abierto: nada revocado entretanto se pierde
+                    if not RevocationSet.ready:
+                        RevocationSet.bootstrap(db)
+                    for change in stream:
+                        RevocationSet.apply_change(change)
+                        resume_after = change["_id"]
+            except OperationFailure as e:
+                if e.code == _CHANGE_STREAM_HISTORY_LOST:
+                    resume_after, RevocationSet.ready = None, False  # el oplog ya no cubre el hueco: recargar
+                if e.code != _CHANGE_STREAMS_UNSUPPORTED:
+                    ic(f"⚠️ Change stream de revocaciones interrumpido: {e}")
+                    socketio.sleep(Config.REVOCATION_POLL_SECONDS)
+                    continue
+                ic("⚠️ Sin change streams (no hay replica set): se consulta token_blacklist periódicamente")
+                polling = True
+            except PyMongoError as e:
+                ic(f"⚠️ Sincronización de revocaciones interrumpida: {e}")
+                socketio.sleep(Config.REVOCATION_POLL_SECONDS)
+        _poll(db, socketio)
+
+    socketio.start_background_task(_loop)
+
+
+def _poll(db, socketio) -> None:
+    """Consulta periódica de token_blacklist; un error de Mongo solo salta esa vuelta"""
+    # Ventanas solapadas: una revocación confirmada tarde se lee en la siguiente vuelta (add es idempotente)
+    overlap = timedelta(seconds=Config.REVOCATION_POLL_SECONDS)
+    since = datetime.now(timezone.utc)
+    while True:
+        try:
+            if not RevocationSet.ready:
+                RevocationSet.bootstrap(db)
+            else:
+                checked_at = datetime.now(timezone.utc)
+                entries = db.stream("token_blacklist", RevocationSet.live_query(since - overlap), BLACKLIST_PROJECTION)
+                RevocationSet.add_entries(entries)
+                RevocationSet.synced_at = time.time()
+                since = checked_at
+            RevocationSet.prune()
+        except PyMongoError as e:
+            # Sin avanzar since: la próxima vuelta vuelve a cubrir esta ventana
+            ic(f"⚠️ Consulta de revocaciones fallida, se reintenta: {e}")
+        socketio.sleep(Config.REVOCATION_POLL_SECONDS)
@@ -0,0 +1,20 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Esquema de sesiones (Config.SESSION_SCHEMA).
+
+split: refresh_tokens (username + device_id) y active_sessions (user_id).
+unified: un documento por (usuario, device) en Config.UNIFIED_SESSIONS_COLLECTION
+con el estado del refresh y de la sesión; login y refresh lo escriben una sola vez.
+Ver app.utils.db_create.migrate_to_unified_sessions.
+"""
+from app.config import Config
+
+
+def unified_sessions() -> bool:
+    return Config.SESSION_SCHEMA == "unified"
+
+
+def sessions_collection(split_collection: str) -> str:
+    """Colección real de refresh_tokens / active_sessions según el esquema"""
+    return Config.UNIFIED_SESSIONS_COLLECTION if unified_sessions() else split_collection
@@ -0,0 +1,196 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+import jwt
+
+from app.config import Config
+
+
+class VerifiedTokenCache:
+    """
+    Cache LRU (por proceso) de tokens ya verificados.
+
+    La clave es el SHA-256 del token; el valor son los claims decodificados,
+    válidos hasta el exp del token o Config.JWT_VERIFY_CACHE_TTL segundos
+    (lo que ocurra antes). Al revocar un jti o un usuario se eliminan sus
+    entradas. Config.JWT_VERIFY_CACHE_SIZE = 0 desactiva la cache.
+    """
+    _entries: "OrderedDict[str, tuple[dict, float]]" = OrderedDict()
+    _by_jti: dict[str, set[str]] = {}
+    _by_sub: dict[str, set[str]] = {}
+    _lock = threading.Lock()
+    hits = 0
+    misses = 0
+    evictions = 0
+    invalidations = 0
+
+    @staticmethod
+    def token_key(token: str) -> str:
+        return hashlib.sha256(token.encode()).hexdigest()
+
+    @classmethod
+    def get(cls, token: str) -> Optional[dict]:
+        """Copia de los claims cacheados, o None si no hay entrada vigente"""
+        if Config.JWT_VERIFY_CACHE_SIZE <= 0:
+            return None
+        key = cls.token_key(token)
+        with cls._lock:
+            entry = cls._entries.get(key)
+            if entry is None or entry[1] <= time.time():
+                if entry is not None:
+                    cls._remove(key)
+                cls.misses += 1
+                return None
+            cls._entries.move_to_end(key)
+            cls.hits += 1
+            return dict(entry[0])
+
+    @classmethod
+    def put(cls, token: str, claims: dict) -> None:
+        """Guarda claims recién verificados (hasta exp, con tope JWT_VERIFY_CACHE_TTL)"""
+        if Config.JWT_VERIFY_CACHE_SIZE <= 0:
+            return
+        now = time.time()
+        exp = claims.get("exp")
+        expires_at = now + Config.JWT_VERIFY_CACHE_TTL
+        if isinstance(exp, (int, float)):
+            expires_at = min(expires_at, float(exp))
+        if expires_at <= now:
+            return
+        key = cls.token_key(token)
+        with cls._lock:
+            if key in cls._entries:
+                cls._remove(key)
+            cls._entries[key] = (dict(claims), expires_at)
+            cls._index(cls._by_jti, claims.get("jti"), key)
+            cls._index(cls._by_sub, claims.get("sub"), key)
+            while len(cls._entries) > Config.JWT_VERIFY_CACHE_SIZE:
+                cls._remove(next(iter(cls._entries)))
+                cls.evictions += 1
+
+    @classmethod
+    def invalidate_token(cls, token: str) -> None:
+        """Elimina el token y cualquier otro token con su mismo jti"""
+        key = cls.token_key(token)
+        with cls._lock:
+            entry = cls._entries.get(key)
+            if entry is not None:
+                jti = entry[0].get("jti")
+                cls._remove(key)
+                cls.invalidations += 1
+        if entry is None:
+            jti = cls._unverified_jti(token)
+        cls.invalidate_jti(jti)
+
+    @staticmethod
+    def _unverified_jti(token: str) -> Optional[str]:
+        # Solo para localizar entradas a borrar; nunca para autorizar
+        try:
+            return jwt.decode(token, options={"verify_signature": False}).get("jti")
+        except jwt.InvalidTokenError:
+            return None
+
+    @classmethod
+    def invalidate_jti(cls, jti: str) -> None:
+        cls._invalidate(cls._by_jti, jti)
+
+    @classmethod
+    def invalidate_subject(cls, sub: str) -> None:
+        """Elimina todos los tokens del usuario (revocación masiva)"""
+        cls._invalidate(cls._by_sub, sub)
+
+    @classmethod
+    def _invalidate(cls, index: dict, value: Optional[str]) -> None:
+        if not value:
+            return
+        with cls._lock:
+            for key in list(index.get(value, ())):
+                cls._remove(key)
+                cls.invalidations += 1
+
+    @staticmethod
+    def _index(index: dict, value: Optional[str], key: str) -> None:
+        if value:
+            index.setdefault(value, set()).add(key)
+
+    @classmethod
+    def _remove(cls, key: str) -> None:
+        claims, _ = cls._entries.pop(key)
+        for index, value in ((cls._by_jti, claims.get("jti")), (cls._by_sub, claims.get("sub"))):
+            keys = index.get(value)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del index[value]
+
+    @classmethod
+    def stats(cls) -> dict:
+        with cls._lock:
+            lookups = cls.hits + cls.misses
+            return {
+                "size": len(cls._entries),
+                "max_size": Config.JWT_VERIFY_CACHE_SIZE,
+                "ttl_seconds": Config.JWT_VERIFY_CACHE_TTL,
+                "hits": cls.hits,
+                "misses": cls.misses,
+                "hit_ratio": round(cls.hits / lookups, 4) if lookups else 0.0,
+                "evictions": cls.evictions,
+                "invalidations": cls.invalidations
+            }
+
+    @classmethod
+    def clear(cls) -> None:
+        with cls._lock:
+            cls._entries = OrderedDict()
+            cls._by_jti = {}
+            cls._by_sub = {}
+            cls.hits = cls.misses = cls.evictions = cls.invalidations = 0
+
+
+class IntrospectionCache:
+    """
+    Resultados recientes de introspección (RFC 7662), por SHA-256 del token.
+
+    Vida corta (Config.INTROSPECTION_CACHE_TTL) para absorber ráfagas del
+    gateway con el mismo token; cualquier revocación vacía la cache.
+    """
+    _entries: "OrderedDict[str, tuple[dict, float]]" = OrderedDict()
+    _lock = threading.Lock()
+    hits = 0
+    misses = 0
+
+    @classmethod
+    def get(cls, token: str) -> Optional[dict]:
+        key = VerifiedTokenCache.token_key(token)
+        with cls._lock:
+            entry = cls._entries.get(key)
+            if entry is None or entry[1] <= time.time():
+                cls._entries.pop(key, None)
+                cls.misses += 1
+                return None
+            cls.hits += 1
+            return dict(entry[0])
+
+    @classmethod
+    def put(cls, token: str, result: dict) -> None:
+        if Config.INTROSPECTION_CACHE_TTL <= 0 or Config.INTROSPECTION_CACHE_SIZE <= 0:
+            return
+        expires_at = time.time() + Config.INTROSPECTION_CACHE_TTL
+        if result.get("active") and isinstance(result.get("exp"), (int, float)):
+            expires_at = min(expires_at, float(result["exp"]))
+        key = VerifiedTokenCache.token_key(token)
+        with cls._lock:
+            cls._entries[key] = (dict(result), expires_at)
+            cls._entries.move_to_end(key)
+            while len(cls._entries) > Config.INTROSPECTION_CACHE_SIZE:
+                cls._entries.popitem(last=False)
+
+    @classmethod
+    def clear(cls) -> None:
+        with cls._lock:
+            cls._entries = OrderedDict()
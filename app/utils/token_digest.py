@@ -0,0 +1,25 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Digest de tamaño fijo de los refresh tokens.
+
+Un refresh RS256 ocupa ~800 bytes; indexarlo entero infla los índices de
+refresh_tokens y active_sessions. Se indexa y se busca por su SHA-256
+(refresh_token_hash, 64 caracteres hex).
+"""
+import hashlib
+import hmac
+from typing import Optional
+
+
+def token_hash(token: Optional[str]) -> Optional[str]:
+    if token is None:
+        return None
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+def stored_token_matches(doc: dict, token: str) -> bool:
+    """True si el documento guarda este token (los no migrados solo tienen refresh_token)"""
+    if doc.get("refresh_token_hash"):
+        return hmac.compare_digest(doc["refresh_token_hash"], token_hash(token))
+    return doc.get("refresh_token") == token
@@ -0,0 +1,64 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import threading
+import time
+from typing import Callable, Optional
+
+from app.config import Config
+
+
+class TokenEpochCache:
+    """
+    Epoch de tokens por usuario (users.token_epoch), cacheado por proceso.
+
+    Los tokens llevan el claim "epoch" del usuario al emitirse; revocar todo
+    es incrementar ese campo. El proceso que revoca actualiza su cache al
+    instante; los demás ven el nuevo epoch cuando vence su entrada
+    (Config.TOKEN_EPOCH_CACHE_TTL segundos).
+    """
+    _entries: dict[str, tuple[int, float]] = {}
+    _lock = threading.Lock()
+    hits = 0
+    misses = 0
+
+    @classmethod
+    def get(cls, username: str, loader: Callable[[str], int]) -> int:
+        now = time.monotonic()
+        entry = cls._entries.get(username)
+        if entry is not None and entry[1] > now:
+            cls.hits += 1
+            return entry[0]
+        cls.misses += 1
+        epoch = loader(username)
+        cls.set(username, epoch)
+        return epoch
+
+    @classmethod
+    def set(cls, username: str, epoch: int) -> None:
+        with cls._lock:
+            cls._entries[username] = (epoch, time.monotonic() + Config.TOKEN_EPOCH_CACHE_TTL)
+
+    @classmethod
+    def invalidate(cls, username: str) -> None:
+        with cls._lock:
+            cls._entries.pop(username, None)
+
+    @classmethod
+    def clear(cls) -> None:
+        with cls._lock:
+            cls._entries = {}
+            cls.hits = cls.misses = 0
+
+
+def _load_epoch(username: str) -> int:
+    from app.dao.user_dao import UserDAO
+    from app.utils.request_container import provide
+    return provide(UserDAO).get_token_epoch(username)
+
+
+def epoch_is_current(claims: dict, loader: Optional[Callable[[str], int]] = None) -> bool:
+    """False si el token se emitió antes del último "revocar todo" del usuario"""
+    username = claims.get("sub")
+    if not username:
+        return True
+    return claims.get("epoch", 0) >= TokenEpochCache.get(username, loader or _load_epoch)
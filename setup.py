@@ -12,7 +12,7 @@ setup(
     package_dir={"app": "app"},  # raíz de los paquetes
     install_requires=[
         "Flask",
-        "pymongo",
+        "pymongo>=4.13",  # AsyncMongoClient (app.utils.db_mongo_async)
         "python-dotenv",
         "pyjwt",
         "flask-cors",